@@ -0,0 +1,66 @@
+import logging
+import pandas
+
+
+class PortfolioComplexityAnalytics:
+    def __init__(self, multibeggar, windows=(30, 90, 365)):
+        # Analyses the output of multibeggar.plot_portfolio_complexity(), which must have run already. Everything is
+        # computed from the complexity series, a single row per date, and from the proportions in the daywise portfolio,
+        # so nothing of the pipeline is run again.
+        self.logger = logging.getLogger(__name__)
+
+        self.multibeggar = multibeggar
+        self.windows = windows
+        self.complexities = multibeggar.portfolio_complexity_data.set_index('Date')['Complexity'].sort_index()
+
+    def compute_rolling_statistics(self):
+        # The windows are of calendar days, ending on and including each date. The complexity is computed only on the
+        # dates of the transactions, so each window covers those of its dates that have one.
+        rolling_statistics = {}
+        for window in self.windows:
+            window_statistics = self.complexities.rolling(f'{window}D').agg(['mean', 'std', 'min', 'max'])
+            for statistic, values in window_statistics.items():
+                rolling_statistics[f'Complexity {window}D {statistic.capitalize()}'] = values
+
+        self.logger.info('computed rolling statistics for dates: %s windows: %s', len(self.complexities.index), self.windows)
+        return pandas.DataFrame(rolling_statistics, index=self.complexities.index).reset_index()
+
+    def get_period_end_complexities(self, frequency='M'):
+        # the complexity at the end of every month ('M') or quarter ('Q'), which is that of the last date on or before it
+        if self.complexities.empty:
+            return pandas.DataFrame({'Period End': pandas.Series(dtype='datetime64[ns]'), 'Date': pandas.Series(dtype='datetime64[ns]'),
+                                     'Complexity': pandas.Series(dtype=float)})
+
+        period_ends = pandas.period_range(self.complexities.index[0], self.complexities.index[-1], freq=frequency).to_timestamp(how='end').normalize()
+        positions = self.complexities.index.searchsorted(period_ends, side='right') - 1
+        return pandas.DataFrame({
+            'Period End': period_ends,
+            'Date': self.complexities.index[positions],
+            'Complexity': self.complexities.to_numpy()[positions],
+        })
+
+    def get_top_contributors(self, start_date, end_date, count=10):
+        # The change in the complexity from start_date to end_date, split up by company. The contribution of a company
+        # on a date is its proportion weighted by its rank, as in the complexity itself, so the changes of all the
+        # companies add up to the change in the complexity. The dates are moved back to the last date with a complexity.
+        positions = self.complexities.index.searchsorted(pandas.to_datetime([start_date, end_date]), side='right') - 1
+        if (positions < 0).any():
+            raise ValueError(f'no complexity on or before start_date: {start_date} end_date: {end_date}')
+        start_date, end_date = self.complexities.index[positions]
+
+        # the ranks within a date depend only on the rows of that date, so the rows of the two dates suffice
+        daywise_portfolio = self.multibeggar.get_daywise_portfolio_for_dates([start_date, end_date]).reset_index(drop=True)
+        daywise_portfolio = daywise_portfolio.assign(Name=daywise_portfolio['Name'].astype(str),
+                                                     Contribution=self.multibeggar.compute_complexity_contributions(daywise_portfolio).fillna(0))
+
+        contributions = daywise_portfolio.pivot_table(index='Name', columns='Date', values='Contribution', aggfunc='sum', fill_value=0)
+        contributions = contributions.reindex(columns=[start_date, end_date], fill_value=0)
+        top_contributors = pandas.DataFrame({
+            'Start Contribution': contributions[start_date],
+            'End Contribution': contributions[end_date],
+            'Contribution Change': contributions[end_date] - contributions[start_date],
+        })
+
+        self.logger.info('start_date: %s end_date: %s -> contributors: %s', start_date, end_date, len(top_contributors.index))
+        top_contributors = top_contributors.reindex(top_contributors['Contribution Change'].abs().sort_values(ascending=False, kind='stable').index)
+        return top_contributors.head(count).rename_axis('Name').reset_index()
@@ -0,0 +1,117 @@
+import concurrent.futures
+import logging
+import os
+import tempfile
+from multibeggar.dalalstreet import CompaniesInfo, StockPricesDataProvider
+from multibeggar.logconfig import configure_logging
+from multibeggar.multibeggar import Multibeggar
+from multibeggar.refdata import ReferenceData
+from multibeggar.sharedprices import SharedPricePanel, SharedStockPricesDataProvider
+
+
+class MultibeggarBatch:
+    def __init__(self, max_workers=None, price_cache_dir=None, download_function=None, resolution_cache_path=None, logging_profile='debug',
+                 ledger_cache_dir=None, price_provider=None, share_price_panel=False):
+        configure_logging(logging_profile)
+        self.logger = logging.getLogger(__name__)
+
+        self.max_workers = max_workers
+        self.logging_profile = logging_profile
+        self.ledger_cache_dir = ledger_cache_dir
+
+        # With share_price_panel, the fetched prices are exported to a memory mapped file that all the workers read,
+        # instead of each worker unpickling its own copy of them, see multibeggar.sharedprices.
+        self.share_price_panel = share_price_panel
+
+        # the reference data is loaded and the prices are fetched only once, and then shared with all the workers
+        reference_data = ReferenceData()
+        self.companies_info = CompaniesInfo(resolution_cache_path=resolution_cache_path, reference_data=reference_data)
+        self.stock_prices_data_provider = StockPricesDataProvider(download_function=download_function, price_cache_dir=price_cache_dir, price_provider=price_provider,
+                                                                  reference_data=reference_data)
+
+    def plot_portfolio_complexities(self, input_file_paths, image_format='svg'):
+
+        def load_transactions_lists():
+            for input_file_path in input_file_paths:
+                multibeggar = Multibeggar(companies_info=self.companies_info, stock_prices_data_provider=self.stock_prices_data_provider,
+                                          ledger_cache_dir=self.ledger_cache_dir)
+                multibeggar.load_transactions_from_file(input_file_path)
+                multibeggars.append(multibeggar)
+
+        def get_unique_output_file_prefixes():
+            # ledgers with the same file name in different directories must not overwrite each other's output
+            used_output_file_prefixes = set()
+            for multibeggar in multibeggars:
+                output_file_prefix, suffix = multibeggar.output_file_prefix, 0
+                while output_file_prefix in used_output_file_prefixes:
+                    suffix += 1
+                    output_file_prefix = f'{multibeggar.output_file_prefix}_{suffix}'
+
+                used_output_file_prefixes.add(output_file_prefix)
+                multibeggar.output_file_prefix = output_file_prefix
+
+        def fetch_stock_prices_for_all_portfolios():
+            # resolving the union of all the company names also memoizes them in companies_info for the workers
+            all_company_names = [company_name for multibeggar in multibeggars for company_name in multibeggar.fixup_company_names(multibeggar.transactions_list['Name'])]
+            company_name_to_symbol_list_map = self.companies_info.resolve_many(all_company_names)
+
+            all_symbols = list(dict.fromkeys(symbol for symbol_list in company_name_to_symbol_list_map.values() for symbol in symbol_list))
+            start_date = min(multibeggar.transactions_list['Date'].min() for multibeggar in multibeggars)
+            self.logger.info('portfolios: %s symbols: %s start_date: %s', len(multibeggars), len(all_symbols), start_date)
+
+            self.stock_prices_data_provider.fetch_stock_prices(all_symbols, start_date)
+
+        def get_stock_prices_data_provider_for_workers(price_panel_dir):
+            if not self.share_price_panel:
+                return self.stock_prices_data_provider
+
+            price_panel_path = os.path.join(price_panel_dir, 'prices.panel')
+            SharedPricePanel(price_panel_path).export(self.stock_prices_data_provider)
+            return SharedStockPricesDataProvider(price_panel_path)
+
+        multibeggars = []
+
+        load_transactions_lists()
+        get_unique_output_file_prefixes()
+        fetch_stock_prices_for_all_portfolios()
+
+        with tempfile.TemporaryDirectory() as price_panel_dir, \
+             concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, initializer=MultibeggarBatchWorker.initialize,
+                                                    initargs=(self.companies_info, get_stock_prices_data_provider_for_workers(price_panel_dir), self.logging_profile)) as executor:
+            portfolio_complexity_data_list = list(executor.map(MultibeggarBatchWorker.plot_portfolio_complexity,
+                                                               [multibeggar.transactions_list for multibeggar in multibeggars],
+                                                               input_file_paths,
+                                                               [multibeggar.output_file_prefix for multibeggar in multibeggars],
+                                                               [image_format] * len(multibeggars)))
+
+        # all the portfolios together in one more graph, for comparing them
+        from multibeggar.plotting import ComplexityPlotter
+
+        ComplexityPlotter().plot_many({multibeggar.output_file_prefix: portfolio_complexity_data
+                                       for multibeggar, portfolio_complexity_data in zip(multibeggars, portfolio_complexity_data_list)},
+                                      os.path.join(os.getcwd(), 'output', 'all_portfolio_complexity_line_graph.' + image_format))
+        return portfolio_complexity_data_list
+
+
+class MultibeggarBatchWorker:
+    companies_info = None
+    stock_prices_data_provider = None
+
+    @staticmethod
+    def initialize(companies_info, stock_prices_data_provider, logging_profile):
+        # each worker logs to its own file, replacing the handlers inherited from the parent process
+        configure_logging(logging_profile, os.path.join(os.getcwd(), 'output', f'multibeggar_worker_{os.getpid()}.log'), force=True)
+
+        MultibeggarBatchWorker.companies_info = companies_info
+        MultibeggarBatchWorker.stock_prices_data_provider = stock_prices_data_provider
+
+    @staticmethod
+    def plot_portfolio_complexity(transactions_list, input_file_path, output_file_prefix, image_format):
+        multibeggar = Multibeggar(companies_info=MultibeggarBatchWorker.companies_info,
+                                  stock_prices_data_provider=MultibeggarBatchWorker.stock_prices_data_provider)
+        multibeggar.input_file_path = input_file_path
+        multibeggar.output_file_prefix = output_file_prefix
+        multibeggar.transactions_list = transactions_list
+
+        multibeggar.plot_portfolio_complexity(image_format=image_format)
+        return multibeggar.portfolio_complexity_data
@@ -0,0 +1,93 @@
+import logging
+import os
+import pandas
+
+
+class PortfolioCheckpoint:
+    def __init__(self, checkpoint_path):
+        self.logger = logging.getLogger(__name__)
+        self.checkpoint_path = checkpoint_path
+        self.transaction_key_columns = ['Date', 'Name', 'Shares']
+
+        try:
+            checkpoint = pandas.read_pickle(checkpoint_path)
+        except FileNotFoundError:
+            self.logger.info('no checkpoint found at: %s', checkpoint_path)
+            checkpoint = {}
+
+        self.__restore(checkpoint)
+
+    def get_earliest_date_to_recompute(self, transactions_list, prices_until_date):
+        # The complexity of a date can depend on the prices of up to a week after it, through the mean price fallback.
+        # So once the prices extend past the date they were fetched until for the checkpoint, the last week of the
+        # checkpointed dates is recomputed as well, along with any new transactions.
+        earliest_new_date = self.get_earliest_new_date(transactions_list)
+        if self.prices_until_date is None or prices_until_date <= self.prices_until_date:
+            return earliest_new_date
+
+        earliest_stale_date = self.prices_until_date - pandas.Timedelta(days=7)
+        if not (self.transactions_list['Date'] >= earliest_stale_date).any():
+            return earliest_new_date
+
+        self.logger.info('prices extended from: %s to: %s, recomputing from: %s', self.prices_until_date, prices_until_date, earliest_stale_date)
+        return earliest_stale_date if earliest_new_date is None else min(earliest_new_date, earliest_stale_date)
+
+    def get_earliest_new_date(self, transactions_list):
+
+        def with_occurrence_counts(transactions):
+            # identical transactions on the same date are legitimate, so they are told apart by their occurrence count
+            transactions = transactions[self.transaction_key_columns].reset_index(drop=True)
+            transactions['Occurrence'] = transactions.groupby(self.transaction_key_columns).cumcount()
+            return transactions
+
+        if self.transactions_list.empty:
+            return transactions_list['Date'].min()
+
+        merged_transactions = with_occurrence_counts(transactions_list).merge(with_occurrence_counts(self.transactions_list),
+                                                                             how='outer', indicator=True)
+
+        if (merged_transactions['_merge'] == 'right_only').any():
+            # some checkpointed transactions were modified or removed, only a full recompute can handle that
+            self.logger.warning('transactions_list is not an extension of the checkpoint, recomputing from scratch')
+            self.__restore({})
+            return transactions_list['Date'].min()
+
+        new_transactions = merged_transactions[merged_transactions['_merge'] == 'left_only']
+        if new_transactions.empty:
+            self.logger.info('no new transactions since the checkpoint')
+            return None
+
+        earliest_new_date = new_transactions['Date'].min()
+        self.logger.info('new transactions: %s earliest_new_date: %s', len(new_transactions.index), earliest_new_date)
+        return earliest_new_date
+
+    def get_holdings_before(self, date):
+        # walk back from the checkpointed holdings by undoing the checkpointed transactions on or after the date
+        undone_shares = self.transactions_list[self.transactions_list['Date'] >= date].groupby('Name', observed=True)['Shares'].sum()
+        holdings = self.holdings.sub(undone_shares, fill_value=0)
+        return holdings[holdings != 0]
+
+    def get_portfolio_complexity_data_before(self, date):
+        return self.portfolio_complexity_data[self.portfolio_complexity_data['Date'] < date]
+
+    def save(self, transactions_list, holdings, portfolio_complexity_data, prices_until_date):
+        checkpoint = {
+            'transactions_list': transactions_list[self.transaction_key_columns].reset_index(drop=True),
+            'holdings': holdings,
+            'portfolio_complexity_data': portfolio_complexity_data.reset_index(drop=True),
+            'prices_until_date': prices_until_date,
+        }
+
+        # write to a temporary file and then replace, so that an interrupted run cannot leave a corrupt checkpoint behind
+        temporary_checkpoint_path = self.checkpoint_path + '.tmp'
+        pandas.to_pickle(checkpoint, temporary_checkpoint_path)
+        os.replace(temporary_checkpoint_path, self.checkpoint_path)
+
+        self.__restore(checkpoint)
+        self.logger.info('saved checkpoint at: %s', self.checkpoint_path)
+
+    def __restore(self, checkpoint):
+        self.transactions_list = checkpoint.get('transactions_list', pandas.DataFrame(columns=self.transaction_key_columns))
+        self.holdings = checkpoint.get('holdings', pandas.Series(dtype=float, name='Shares'))
+        self.portfolio_complexity_data = checkpoint.get('portfolio_complexity_data', pandas.DataFrame(columns=['Date', 'Complexity']))
+        self.prices_until_date = checkpoint.get('prices_until_date')
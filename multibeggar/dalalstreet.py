@@ -1,9 +1,16 @@
+from collections import OrderedDict, defaultdict
 from enum import Enum
+import hashlib
+import json
 import logging
 import os
+import numpy
 import pandas
-import yfinance
-from fuzzywuzzy import fuzz
+from multibeggar.instrumentation import NullInstrumentation
+from multibeggar.logconfig import LazyString
+from multibeggar.pricecache import StockPricesCache
+from multibeggar.priceproviders import YFinancePriceProvider
+from multibeggar.refdata import ReferenceData
 
 
 class StockExchange(Enum):
@@ -15,36 +22,67 @@ class StockExchange(Enum):
 
 
 class CompaniesInfo:
-    def __init__(self):
-        # todo self: these log files should be managed better, this is a temporary hack to "reuse" the multibeggar.log
-        logging.basicConfig(format='%(levelname)s: %(message)s [%(funcName)s():%(lineno)s - %(asctime)s]',
-                            datefmt='%Y/%m/%d %I:%M:%S %p', 
-                            handlers=[logging.FileHandler(os.path.join(os.getcwd(), 'output', 'multibeggar.log'), mode='w')])
+    def __init__(self, resolution_cache_path=None, reference_data=None, instrumentation=None):
+        # logging is configured by the application, see multibeggar.logconfig
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-
-        script_dir = os.path.dirname(__file__)
-
-        # The column names are repeated below inside the [[]] to rearrange the columns in required order.
-        # This is the officially documented approach in pandas.read_csv to avoid keeping the column order from the input.
-        self.stocks_info_map = {
-            StockExchange.NSE: pandas.read_csv(os.path.join(script_dir, 'data', 'equity_nse.csv'),
-                                               usecols=['NAME OF COMPANY', 'SYMBOL'])[['NAME OF COMPANY', 'SYMBOL']],
-            StockExchange.BSE: pandas.read_csv(os.path.join(script_dir, 'data', 'equity_bse.csv'),
-                                               usecols=['Security Name', 'Security Id'])[['Security Name', 'Security Id']],
+        self.instrumentation = instrumentation if instrumentation is not None else NullInstrumentation()
+
+        # The stocks info of the exchanges and their name matching indexes are loaded only on the first company name that
+        # is not already resolved, see get_stocks_info_map(). With all the names in the resolution cache, they never are.
+        self.reference_data = reference_data if reference_data is not None else ReferenceData()
+        self.exchange_to_reference_table = {
+            StockExchange.NSE: ('equity_nse', 'NAME OF COMPANY'),
+            StockExchange.BSE: ('equity_bse', 'Security Name'),
         }
+        self.stocks_info_map = None
+        self.name_matching_index_map = None
 
         self.company_name_header = 'company_name'
         self.stock_symbol_header = 'stock_symbol'
 
-        # read_csv() does not support renaming the columns while reading in the data, so do it separately below.
-        for __unused, info in self.stocks_info_map.items():
-            info.columns = [self.company_name_header, self.stock_symbol_header]
+        self.match_ratio_threshold = 75
+
+        # The resolutions are persisted along with a hash of the reference data they were resolved from, so that they
+        # are discarded as soon as any of the reference data files changes. Without a cache, nothing is hashed.
+        self.resolution_cache_path = resolution_cache_path
+        self.reference_data_hash = None
+        if self.resolution_cache_path is not None:
+            self.reference_data_hash = self.__compute_reference_data_hash(
+                [os.path.join(self.reference_data.data_dir, file_name) for file_name in ['equity_nse.csv', 'equity_bse.csv', 'fixup_company_names.csv']])
+        self.company_name_to_symbol_list_map = self.__load_resolution_cache()
+
+    def resolve_many(self, company_names):
+        unique_company_names = pandas.unique(pandas.Series(company_names, dtype=object))
+        unseen_company_names = [company_name for company_name in unique_company_names if company_name not in self.company_name_to_symbol_list_map]
+        self.logger.info('company_names: %s unique: %s unseen: %s', len(company_names), len(unique_company_names), len(unseen_company_names))
+        self.instrumentation.increment('resolution_cache_hits', len(unique_company_names) - len(unseen_company_names))
+        self.instrumentation.increment('resolution_cache_misses', len(unseen_company_names))
+
+        for company_name in unseen_company_names:
+            self.company_name_to_symbol_list_map[company_name] = self.get_symbols(company_name)
+
+        if unseen_company_names:
+            self.__save_resolution_cache()
+
+        return {company_name: self.company_name_to_symbol_list_map[company_name] for company_name in unique_company_names}
+
+    def get_stocks_info_map(self):
+        if self.stocks_info_map is None:
+            self.stocks_info_map = {}
+            self.name_matching_index_map = {}
+            for exchange_name, (table_name, company_name_column) in self.exchange_to_reference_table.items():
+                info = self.reference_data.get_table(table_name)
+                info.columns = [self.company_name_header, self.stock_symbol_header]
+                self.stocks_info_map[exchange_name] = info
+                self.name_matching_index_map[exchange_name] = CompanyNameMatchingIndex(
+                    info[self.company_name_header], self.reference_data.get_name_matching_index(table_name, company_name_column))
+
+        return self.stocks_info_map
 
     def get_symbols(self, company_name):
         # return tuples consisting of the stock symbol along with the exchange name
         symbol_list = [(symbol, exchange_name)
-                       for exchange_name, info in self.stocks_info_map.items()
+                       for exchange_name in self.get_stocks_info_map()
                        if (symbol := self.get_symbol(company_name, exchange_name)) is not None]
         self.logger.info('company_name: %s -> symbol_list: %s', company_name, symbol_list)
         return symbol_list
@@ -61,7 +99,7 @@ class CompaniesInfo:
         return symbol
 
     def get_symbols_for_company_name_starting_with(self, company_name, exchange_name):
-        name_to_symbol = self.stocks_info_map[exchange_name]
+        name_to_symbol = self.get_stocks_info_map()[exchange_name]
         matching_mask = name_to_symbol[self.company_name_header].str.startswith(company_name)
         matching_row = name_to_symbol[matching_mask]
         symbol_list = matching_row[self.stock_symbol_header].array
@@ -70,13 +108,23 @@ class CompaniesInfo:
         return symbol_list
 
     def get_symbol_for_company_name_best_matching_with(self, company_name, exchange_name):
-        name_to_symbol = self.stocks_info_map[exchange_name]
-        match_ratios = name_to_symbol.apply(lambda row: fuzz.token_sort_ratio(row[self.company_name_header], company_name), axis=1)
-        qualified_rows = match_ratios[lambda x: x >= 75]
-        self.logger.debug('company_name: %s, exchange_name: %s -> qualified_rows...\n%s', company_name, exchange_name,
-                          pandas.concat([name_to_symbol.loc[qualified_rows.index],
-                                        match_ratios.loc[qualified_rows.index].rename('match_ratio')],
-                                        axis=1).to_string())
+        from fuzzywuzzy import fuzz  # imported here as it is needed only for the names not in the resolution cache
+
+        name_to_symbol = self.get_stocks_info_map()[exchange_name]
+        name_matching_index = self.name_matching_index_map[exchange_name]
+
+        # only the candidates that can possibly reach the threshold are scored, with the same result as
+        # fuzz.token_sort_ratio() because the matching keys are already normalized and token sorted in the same way.
+        matching_key, candidate_positions = name_matching_index.get_candidates(company_name, self.match_ratio_threshold)
+        self.instrumentation.increment('fuzzy_match_candidates_scored', len(candidate_positions))
+        match_ratios = pandas.Series([fuzz.ratio(name_matching_index.matching_keys[position], matching_key) for position in candidate_positions],
+                                     index=name_to_symbol.index[candidate_positions], dtype=int)
+        qualified_rows = match_ratios[lambda x: x >= self.match_ratio_threshold]
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('company_name: %s, exchange_name: %s -> qualified_rows...\n%s', company_name, exchange_name,
+                              pandas.concat([name_to_symbol.loc[qualified_rows.index],
+                                            match_ratios.loc[qualified_rows.index].rename('match_ratio')],
+                                            axis=1).to_string())
 
         try:
             best_matching_row = name_to_symbol.loc[qualified_rows.idxmax()]
@@ -89,48 +137,332 @@ class CompaniesInfo:
             self.logger.info('company_name: %s, exchange_name: %s -> symbol: %s', company_name, exchange_name, symbol)
             return symbol
 
+    @staticmethod
+    def __compute_reference_data_hash(file_paths):
+        reference_data_hash = hashlib.sha256()
+        for file_path in file_paths:
+            with open(file_path, 'rb') as reference_data_file:
+                reference_data_hash.update(reference_data_file.read())
+        return reference_data_hash.hexdigest()
+
+    def __load_resolution_cache(self):
+        if self.resolution_cache_path is None:
+            return {}
+
+        try:
+            with open(self.resolution_cache_path, encoding='utf-8') as resolution_cache_file:
+                resolution_cache = json.load(resolution_cache_file)
+        except FileNotFoundError:
+            return {}
+
+        if resolution_cache['reference_data_hash'] != self.reference_data_hash:
+            self.logger.warning('reference data changed, discarding resolution cache: %s', self.resolution_cache_path)
+            return {}
+
+        return {company_name: [(symbol, StockExchange(exchange_name)) for symbol, exchange_name in symbol_list]
+                for company_name, symbol_list in resolution_cache['resolutions'].items()}
+
+    def __save_resolution_cache(self):
+        if self.resolution_cache_path is None:
+            return
+
+        resolution_cache = {
+            'reference_data_hash': self.reference_data_hash,
+            'resolutions': {company_name: [(symbol, exchange_name.value) for symbol, exchange_name in symbol_list]
+                            for company_name, symbol_list in self.company_name_to_symbol_list_map.items()},
+        }
+
+        temporary_resolution_cache_path = self.resolution_cache_path + '.tmp'
+        with open(temporary_resolution_cache_path, 'w', encoding='utf-8') as resolution_cache_file:
+            json.dump(resolution_cache, resolution_cache_file, indent=4, sort_keys=True)
+        os.replace(temporary_resolution_cache_path, self.resolution_cache_path)
+
+
+class CompanyNameMatchingIndex:
+    def __init__(self, company_names, compiled_index=None):
+        # the compiled index is usually precompiled for the reference data, see multibeggar.refdata
+        if compiled_index is None:
+            compiled_index = self.compile(company_names)
+
+        matching_keys, alphabet, self.character_counts = compiled_index
+        self.matching_keys = numpy.asarray(matching_keys, dtype=str).tolist()
+        self.matching_key_lengths = numpy.array([len(matching_key) for matching_key in self.matching_keys])
+        self.character_to_column = {character: column for column, character in enumerate(numpy.asarray(alphabet, dtype=str).tolist())}
+
+    @staticmethod
+    def compile(company_names):
+        matching_keys = [CompanyNameMatchingIndex.get_matching_key(company_name) for company_name in company_names]
+
+        # character counts of every matching key, one row per key and one column per character of the alphabet
+        alphabet = sorted(set(''.join(matching_keys)))
+        character_to_column = {character: column for column, character in enumerate(alphabet)}
+        character_counts = numpy.zeros((len(matching_keys), len(alphabet)), dtype=numpy.int32)
+        for row, matching_key in enumerate(matching_keys):
+            for character in matching_key:
+                character_counts[row, character_to_column[character]] += 1
+
+        return matching_keys, alphabet, character_counts
+
+    @staticmethod
+    def get_matching_key(company_name):
+        from fuzzywuzzy import utils
+
+        # same normalization as done by fuzz.token_sort_ratio() on each of its inputs
+        return ' '.join(sorted(utils.full_process(company_name, force_ascii=True).split()))
+
+    def get_candidates(self, company_name, match_ratio_threshold):
+        matching_key = self.get_matching_key(company_name)
+
+        query_character_counts = numpy.zeros(len(self.character_to_column), dtype=numpy.int32)
+        for character in matching_key:
+            if (column := self.character_to_column.get(character)) is not None:
+                query_character_counts[column] += 1
+
+        # fuzz.ratio() is 100 * 2 * matching_characters / total_length, rounded. The matching characters can never exceed
+        # the characters common to both keys, so this gives an upper bound that prunes most keys without scoring them.
+        common_character_counts = numpy.minimum(self.character_counts, query_character_counts).sum(axis=1)
+        total_lengths = self.matching_key_lengths + len(matching_key)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            match_ratio_upper_bounds = numpy.where(total_lengths > 0, 200 * common_character_counts / total_lengths, 100)
+
+        candidate_positions = numpy.flatnonzero(match_ratio_upper_bounds >= match_ratio_threshold - 0.5)
+        return matching_key, candidate_positions
+
+
+class InstrumentTable:
+    def __init__(self, exchange_to_suffix):
+        # Every (stock_symbol, exchange) pair gets a small integer id, the index of the instrument in the lists below, along
+        # with its ticker for the price provider. Every symbol list gets an id as well, so that the symbol lists of the
+        # holdings can be looked up as integer arrays rather than by hashing lists of tuples over and over.
+        self.exchange_to_suffix = exchange_to_suffix
+
+        self.instrument_to_id = {}
+        self.ticker_to_id = {}
+        self.symbols = []
+        self.exchanges = []
+        self.tickers = []
+
+        self.instrument_list_to_id = {}
+        self.instrument_lists = []
+        self.instrument_list_matrix = numpy.zeros((0, 0), dtype=int)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def get_instrument_id(self, symbol, exchange):
+        try:
+            return self.instrument_to_id[(symbol, exchange)]
+        except KeyError:
+            instrument_id = self.instrument_to_id[(symbol, exchange)] = len(self.tickers)
+            self.symbols.append(symbol)
+            self.exchanges.append(exchange)
+            self.tickers.append(symbol + self.exchange_to_suffix[exchange])
+            self.ticker_to_id[self.tickers[instrument_id]] = instrument_id
+            return instrument_id
+
+    def get_instrument_ids(self, symbol_list):
+        return [self.get_instrument_id(symbol, exchange) for symbol, exchange in symbol_list]
+
+    def get_instrument_list_id(self, symbol_list):
+        instrument_list = tuple(self.get_instrument_ids(symbol_list))
+        try:
+            return self.instrument_list_to_id[instrument_list]
+        except KeyError:
+            instrument_list_id = self.instrument_list_to_id[instrument_list] = len(self.instrument_lists)
+            self.instrument_lists.append(instrument_list)
+            return instrument_list_id
+
+    def get_symbol_list(self, instrument_list_id):
+        return [(self.symbols[instrument_id], self.exchanges[instrument_id]) for instrument_id in self.instrument_lists[instrument_list_id]]
+
+    def get_instrument_list_matrix(self):
+        # one row per symbol list, with the instrument ids in the order of priority, padded with -1 up to the longest list
+        if len(self.instrument_list_matrix) != len(self.instrument_lists):
+            self.instrument_list_matrix = numpy.full((len(self.instrument_lists), max(map(len, self.instrument_lists), default=0)), -1, dtype=int)
+            for instrument_list_id, instrument_list in enumerate(self.instrument_lists):
+                self.instrument_list_matrix[instrument_list_id, :len(instrument_list)] = instrument_list
+
+        return self.instrument_list_matrix
+
+
+class CorporateActionsTable:
+    def __init__(self, corporate_actions):
+        # The corporate actions (splits, bonuses) are rows of Symbol, Date, Numerator and Denominator, with any number
+        # of them per symbol. The prices from yfinance are adjusted for all of them, so the actual price on a date is the
+        # adjusted price times the factors of all the actions after that date. Each symbol is compiled into a step series
+        # of these cumulative factors, the steps being at the dates of its actions.
+        self.logger = logging.getLogger(__name__)
+
+        self.ticker_to_step_series = {}
+        for ticker, actions in corporate_actions.groupby('Symbol'):
+            factors = (actions['Numerator'] / actions['Denominator']).groupby(actions['Date']).prod()
+            cumulative_factors = numpy.append(factors.to_numpy()[::-1].cumprod()[::-1], 1.0)
+            self.ticker_to_step_series[ticker] = (factors.index.to_numpy(dtype='datetime64[ns]'), cumulative_factors)
+
+    def get_de_adjustment_factors(self, ticker, dates):
+        # the position of a date among the action dates is the number of actions on or before it
+        try:
+            action_dates, cumulative_factors = self.ticker_to_step_series[ticker]
+        except KeyError:
+            return numpy.ones(len(dates))
+
+        return cumulative_factors[numpy.searchsorted(action_dates, pandas.DatetimeIndex(dates).to_numpy(), side='right')]
+
+    def has_actions_after(self, ticker, date):
+        if ticker not in self.ticker_to_step_series:
+            return False
+
+        action_dates = self.ticker_to_step_series[ticker][0]
+        return pandas.to_datetime(date) < action_dates[-1]
+
+
+class ClosingPriceCache:
+    def __init__(self, max_entries=100000):
+        # The closing prices resolved by get_closing_price(), keyed by (instrument ids, date), None included so that a
+        # confirmed miss is not looked for again, along with the counter of the lookup that resolved it. The least
+        # recently used entries are dropped beyond max_entries. Every entry depends on the prices of some instruments,
+        # and is dropped as soon as any of them is fetched again.
+        self.logger = logging.getLogger(__name__)
+
+        self.max_entries = max_entries
+        self.key_to_closing_price = OrderedDict()
+        self.key_to_instrument_ids = {}
+        self.instrument_to_keys = defaultdict(set)
+
+    def __len__(self):
+        return len(self.key_to_closing_price)
+
+    def get(self, key):
+        # raises KeyError when not cached, as the cached closing price itself can be None
+        closing_price = self.key_to_closing_price[key]
+        self.key_to_closing_price.move_to_end(key)
+        return closing_price
+
+    def put(self, key, closing_price, instrument_ids):
+        self.__remove(key)
+        self.key_to_closing_price[key] = closing_price
+        self.key_to_instrument_ids[key] = instrument_ids
+        for instrument_id in instrument_ids:
+            self.instrument_to_keys[instrument_id].add(key)
+
+        while len(self.key_to_closing_price) > self.max_entries:
+            self.__remove(next(iter(self.key_to_closing_price)))
+
+    def invalidate(self, instrument_ids):
+        keys = set().union(*(self.instrument_to_keys.pop(instrument_id, ()) for instrument_id in instrument_ids))
+        for key in keys:
+            self.__remove(key)
+
+        if keys:
+            self.logger.debug('instrument_ids: %s -> invalidated closing prices: %s', instrument_ids, len(keys))
+
+    def __remove(self, key):
+        if key not in self.key_to_closing_price:
+            return
+
+        del self.key_to_closing_price[key]
+        for instrument_id in self.key_to_instrument_ids.pop(key):
+            keys = self.instrument_to_keys.get(instrument_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.instrument_to_keys[instrument_id]
+
 
 # todo: better module management is required here, this should be moved to a separate file
 class StockPricesDataProvider:
-    def __init__(self):
-        # todo self: these log files should be managed better, this is a temporary hack to "reuse" the multibeggar.log
-        logging.basicConfig(format='%(levelname)s: %(message)s [%(funcName)s():%(lineno)s - %(asctime)s]',
-                            datefmt='%Y/%m/%d %I:%M:%S %p',
-                            handlers=[logging.FileHandler(os.path.join(os.getcwd(), 'output', 'multibeggar.log'), mode='w')])
+    def __init__(self, download_function=None, price_cache_dir=None, price_provider=None, reference_data=None, instrumentation=None):
+        # logging is configured by the application, see multibeggar.logconfig
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-
-        script_dir = os.path.dirname(__file__)
+        self.instrumentation = instrumentation if instrumentation is not None else NullInstrumentation()
 
-        self.renamed_symbols_map = pandas.read_csv(os.path.join(script_dir, 'data', 'renamed_symbols.csv')).set_index('Present Symbol').to_dict('index')
-        self.price_adjustment_map = pandas.read_csv(os.path.join(script_dir, 'data', 'price_adjustments.csv'), parse_dates=['Date']).set_index('Symbol').to_dict('index')
+        reference_data = reference_data if reference_data is not None else ReferenceData()
+        self.renamed_symbols_map = reference_data.get_table('renamed_symbols').set_index('Present Symbol').to_dict('index')
+        self.corporate_actions = CorporateActionsTable(reference_data.get_table('price_adjustments'))
         self.today_date = pandas.to_datetime('today').normalize()
 
-        self.symbol_to_stock_data = {}
+        # the prices come from yfinance unless another price provider is given, see multibeggar.priceproviders.
+        # A download function with the same interface as yfinance.download() can stand in for it, to run offline.
+        self.price_provider = price_provider if price_provider is not None else YFinancePriceProvider(download_function=download_function)
+        self.stock_prices_cache = StockPricesCache(price_cache_dir, reference_data.get_table('price_adjustments'), self.today_date) if price_cache_dir is not None else None
 
-        # todo: this implemented is specific to yfinance, to be refactored.
-        # symbol_to_stock_data should map the stock data directly to the (stock_symbol, exchange) tuple
-        # stock data here is mapped to the suffixized symbol for convenience of prototyping, but this approach
-        # doesn't work when using other API which may use a different suffix for the exchange.
+        # the tickers are specific to yfinance, every other place refers to the instruments by their id in the table
         self.exchange_to_suffix = {
             StockExchange.NSE: ".NS",
             StockExchange.BSE: ".BO",
         }
+        self.instrument_table = InstrumentTable(self.exchange_to_suffix)
+
+        self.instrument_to_stock_data = {}
+        self.instrument_to_fetched_date_range = {}
+        self.price_panel = None
+
+        # the weekends, holidays and other misses of the price panel repeat across the portfolios and the reruns
+        self.closing_price_cache = ClosingPriceCache()
 
     def fetch_stock_prices(self, symbol_list, start_date, end_date=None):
-        if end_date is None:
-            end_date = self.today_date
 
-        # todo: this implementation is specific to yfinance, should be refactored to use any API.
-        suffixized_symbol_list = self.__suffixize_symbol_list(symbol_list)
-        adapted_end_date = end_date + pandas.Timedelta(days=1)  # yfinance API requires the end date to be "one after" the actual desired end date.
-        stock_data = yfinance.download(suffixized_symbol_list, group_by='Ticker', start=start_date, end=adapted_end_date)
+        def fetch_from_cache_and_download_missing():
+            # symbols with the same missing date ranges are downloaded together, which is the common case because
+            # all symbols of a portfolio are usually fetched together and hence cached for the same range of dates.
+            missing_date_range_to_tickers = defaultdict(list)
+            for ticker in tickers:
+                for missing_date_range in self.stock_prices_cache.get_missing_date_ranges(ticker, start_date, end_date):
+                    missing_date_range_to_tickers[missing_date_range].append(ticker)
+
+            for (missing_start_date, missing_end_date), missing_tickers in missing_date_range_to_tickers.items():
+                try:
+                    downloaded_ticker_to_stock_data = download(missing_tickers, missing_start_date, missing_end_date)
+                except OSError as error:
+                    self.logger.warning('download failed, serving from cache only! tickers: %s error: %s', missing_tickers, error)
+                else:
+                    # The symbols without any prices come back empty, see StockPricesCache.store() for which of them are cached.
+                    # Those that failed to download are left out, so that their missing date ranges are downloaded next time.
+                    self.stock_prices_cache.store(downloaded_ticker_to_stock_data, missing_start_date, missing_end_date)
+
+            return {ticker: stock_data for ticker in tickers
+                    if (stock_data := self.stock_prices_cache.load(ticker, start_date, end_date)) is not None}
+
+        def download(tickers_to_download, download_start_date, download_end_date):
+            self.instrumentation.increment('downloads')
+            self.instrumentation.increment('downloaded_tickers', len(tickers_to_download))
+            return self.price_provider.download(tickers_to_download, download_start_date, download_end_date)
+
+        def is_already_fetched(instrument_id):
+            try:
+                fetched_start_date, fetched_end_date = self.instrument_to_fetched_date_range[instrument_id]
+            except KeyError:
+                return False
+            else:
+                return fetched_start_date <= start_date and end_date <= fetched_end_date
+
+        start_date = pandas.to_datetime(start_date)
+        end_date = self.today_date if end_date is None else pandas.to_datetime(end_date)
+
+        # the old symbols of the renamed companies are fetched along with the rest, instead of one by one when pricing
+        symbol_list = list(symbol_list) + [(self.renamed_symbols_map[symbol]['Old Symbol'], exchange) for symbol, exchange in symbol_list
+                                           if symbol in self.renamed_symbols_map]
 
-        symbol_to_stock_data = {index: group.xs(index, level=0, axis=1) for index, group in stock_data.groupby(level=0, axis=1)}
-        self.symbol_to_stock_data.update(symbol_to_stock_data)
+        # symbols whose prices are already held for the whole range are skipped, for example when the prices were
+        # prefetched for several portfolios together by a batch run
+        instrument_ids = [instrument_id for instrument_id in self.instrument_table.get_instrument_ids(symbol_list) if not is_already_fetched(instrument_id)]
+        if not instrument_ids:
+            self.logger.debug('already fetched stock data from date: %s to date: %s for symbols: %s', start_date, end_date, symbol_list)
+            return
+
+        tickers = [self.instrument_table.tickers[instrument_id] for instrument_id in instrument_ids]
+        if self.stock_prices_cache is None:
+            ticker_to_stock_data = {ticker: stock_data for ticker, stock_data in download(tickers, start_date, end_date).items() if not stock_data.empty}
+        else:
+            ticker_to_stock_data = fetch_from_cache_and_download_missing()
+
+        self.instrument_to_stock_data.update({self.instrument_table.ticker_to_id[ticker]: stock_data for ticker, stock_data in ticker_to_stock_data.items()})
+        self.instrument_to_fetched_date_range.update({instrument_id: (start_date, end_date) for instrument_id in instrument_ids})
+        self.price_panel = None  # invalidate, it is rebuilt lazily on the next bulk lookup
+        self.closing_price_cache.invalidate(instrument_ids)
+
+        self.logger.debug('fetched stock data from date: %s to date: %s for tickers...\n%s', start_date, end_date, tickers)
 
-        self.logger.debug('downloaded stock data from date: %s to date: %s for symbols...\n%s', start_date, end_date, suffixized_symbol_list)
-        
     def get_renamed_symbol(self, stock_symbol):
         try:
             old_symbol = self.renamed_symbols_map[stock_symbol]['Old Symbol']
@@ -142,106 +474,210 @@ class StockPricesDataProvider:
 
     def get_closing_price(self, symbol_list, date_string):
 
-        def from_single_date():
+        # Each lookup returns the adjusted closing price, along with the instruments whose corporate actions it is to be
+        # de-adjusted for, or None when it finds no price.
+        def from_single_date(lookup_instrument_ids):
             try:
-                adjusted_closing_prices = self.__get_adjusted_closing_prices_for_date_range(suffixized_symbol_list, start_date=date, end_date=date)
+                instrument_id, adjusted_closing_prices = self.__get_adjusted_closing_prices_for_date_range(lookup_instrument_ids, start_date=date, end_date=date)
             except NoClosingPriceError:
                 return None
             else:
                 adjusted_closing_price = adjusted_closing_prices.array[0]
                 self.logger.debug('symbol_list: %s date: %s -> adjusted_closing_price: %s', symbol_list, date, adjusted_closing_price)
-                return adjusted_closing_price
+                return adjusted_closing_price, [instrument_id]
 
-        def from_range_of_dates():
+        def from_range_of_dates(lookup_instrument_ids):
             try:
-                adjusted_closing_prices = self.__get_adjusted_closing_prices_for_date_range(
-                                            suffixized_symbol_list,
-                                            start_date=date - pandas.Timedelta(days=7),
-                                            end_date=date + pandas.Timedelta(days=7))
+                instrument_id, adjusted_closing_prices = self.__get_adjusted_closing_prices_for_date_range(
+                                                            lookup_instrument_ids,
+                                                            start_date=date - pandas.Timedelta(days=7),
+                                                            end_date=date + pandas.Timedelta(days=7))
             except NoClosingPriceError:
                 return None
             else:
                 adjusted_closing_price = adjusted_closing_prices.mean()
                 self.logger.warning('fallback to mean price! symbol_list: %s date: %s -> adjusted_closing_price: %s', symbol_list, date, adjusted_closing_price)
-                return adjusted_closing_price
+                return adjusted_closing_price, [instrument_id]
 
-        def from_renamed_symbol_list():
+        def from_renamed_symbol_list(lookup_instrument_ids):
             renamed_symbol_list = [(renamed_symbol, exchange) for symbol, exchange in symbol_list if (renamed_symbol := self.get_renamed_symbol(symbol))]
             self.logger.debug('symbol_list: %s -> renamed_symbol_list: %s', symbol_list, renamed_symbol_list)
+            if not renamed_symbol_list:
+                return None
 
-            symbol_to_fetch_list = [symbol for symbol in renamed_symbol_list if self.__suffixize_symbol(symbol[0], symbol[1]) not in self.symbol_to_stock_data]
+            # usually prefetched together with the present symbols by fetch_stock_prices(), even if there was no data
+            symbol_to_fetch_list = [symbol for symbol in renamed_symbol_list if self.instrument_table.get_instrument_id(*symbol) not in self.instrument_to_fetched_date_range]
             if symbol_to_fetch_list:
                 self.fetch_stock_prices(symbol_to_fetch_list, date)
 
-            if renamed_symbol_list:
-                adjusted_closing_price = self.get_closing_price(renamed_symbol_list, date)
-                self.logger.debug('symbol_list: %s date: %s -> adjusted_closing_price: %s', symbol_list, date, adjusted_closing_price)
-                return adjusted_closing_price
+            renamed_instrument_ids = self.instrument_table.get_instrument_ids(renamed_symbol_list)
+            renamed_price_lookup = from_single_date(renamed_instrument_ids) or from_range_of_dates(renamed_instrument_ids)
+            if renamed_price_lookup is None:
+                return None
 
-            return None
+            # The actions of the present symbol apply to the prices of its old symbol as well. The price is de-adjusted
+            # only once, for the actions of the present symbols, or for those of the old symbol when they have none.
+            adjusted_closing_price, renamed_price_instrument_ids = renamed_price_lookup
+            return adjusted_closing_price, lookup_instrument_ids + renamed_price_instrument_ids
 
-        def get_de_adjusted_price():
-            for symbol in suffixized_symbol_list:
-                de_adjustment_factor = self.get_de_adjustment_factor(symbol, date)
+        def get_de_adjusted_price(adjusted_closing_price, price_instrument_ids):
+            for instrument_id in price_instrument_ids:
+                ticker = self.instrument_table.tickers[instrument_id]
+                de_adjustment_factor = self.get_de_adjustment_factor(ticker, date)
                 if de_adjustment_factor is not None:
                     de_adjusted_closing_price = adjusted_closing_price * de_adjustment_factor
-                    self.logger.debug('symbol_list: %s date: %s symbol: %s -> de_adjusted_closing_price: %s', symbol_list, date, symbol, de_adjusted_closing_price)
+                    self.logger.debug('symbol_list: %s date: %s symbol: %s -> de_adjusted_closing_price: %s', symbol_list, date, ticker, de_adjusted_closing_price)
                     return de_adjusted_closing_price
 
             self.logger.debug('symbol_list: %s date: %s -> de_adjusted_closing_price: %s', symbol_list, date, adjusted_closing_price)
             return adjusted_closing_price
 
-        suffixized_symbol_list = self.__suffixize_symbol_list(symbol_list)
+        # the cache is keyed by the instruments and the date, however the symbols and the date are passed in
+        instrument_ids = self.instrument_table.get_instrument_ids(symbol_list)
         date = pandas.to_datetime(date_string)
+        cache_key = (tuple(instrument_ids), date)
+        try:
+            closing_price, lookup_counter_name = self.closing_price_cache.get(cache_key)
+        except KeyError:
+            self.instrumentation.increment('closing_price_cache_misses')
+        else:
+            # counted like the lookup that resolved it
+            self.instrumentation.increment('closing_price_cache_hits')
+            self.instrumentation.increment(lookup_counter_name)
+            return closing_price
 
-        adjusted_closing_price = from_single_date() or from_range_of_dates() or from_renamed_symbol_list()
-        if adjusted_closing_price is not None:
-            closing_price = get_de_adjusted_price()
+        # the closing price depends on the prices of the old symbols too, through from_renamed_symbol_list()
+        dependent_instrument_ids = instrument_ids + [self.instrument_table.get_instrument_id(self.renamed_symbols_map[symbol]['Old Symbol'], exchange)
+                                                     for symbol, exchange in symbol_list if symbol in self.renamed_symbols_map]
+
+        closing_price, lookup_counter_name = None, 'price_lookup_misses'
+        for lookup, counter_name in [(from_single_date, 'price_lookup_hits'), (from_range_of_dates, 'price_lookup_mean_fallbacks'),
+                                     (from_renamed_symbol_list, 'price_lookup_renamed_fallbacks')]:
+            price_lookup = lookup(instrument_ids)
+            if price_lookup is not None:
+                closing_price = get_de_adjusted_price(*price_lookup)
+                lookup_counter_name = counter_name
+                break
+
+        self.closing_price_cache.put(cache_key, (closing_price, lookup_counter_name), dependent_instrument_ids)
+        self.instrumentation.increment(lookup_counter_name)
+        if closing_price is not None:
             self.logger.info('symbol_list: %s date: %s -> closing_price: %s', symbol_list, date, closing_price)
             return closing_price
         else:
             self.logger.warning('symbol_list: %s date: %s -> no closing price found!', symbol_list, date)
             return None
 
+    def get_instrument_list_ids(self, symbol_lists):
+        # each distinct symbol list is interned only once, however many times it repeats
+        symbol_list_keys, unique_symbol_lists = pandas.factorize(pandas.Series([tuple(symbol_list) for symbol_list in symbol_lists], dtype=object))
+        unique_instrument_list_ids = numpy.array([self.instrument_table.get_instrument_list_id(symbol_list) for symbol_list in unique_symbol_lists], dtype=int)
+        return unique_instrument_list_ids[symbol_list_keys]
+
+    def get_closing_prices(self, symbol_lists, dates):
+        return self.get_closing_prices_for_instrument_lists(self.get_instrument_list_ids(symbol_lists), dates)
+
+    def get_closing_prices_for_instrument_lists(self, instrument_list_ids, dates):
+
+        def lookup_price_panel(closing_price_panel):
+            # the first symbol in the list with a price in the panel wins, like in get_closing_price
+            is_found = numpy.zeros(len(dates), dtype=bool)
+            for priority in range(instrument_list_matrix.shape[1]):
+                instrument_ids = instrument_list_matrix[:, priority]
+                is_lookup = numpy.isnan(closing_prices) & (date_positions >= 0) & (instrument_ids >= 0) & (instrument_ids < closing_price_panel.shape[1])
+                closing_prices[is_lookup] = closing_price_panel[date_positions[is_lookup], instrument_ids[is_lookup]]
+                is_found |= is_lookup & ~numpy.isnan(closing_prices)
+
+            return is_found
+
+        instrument_list_ids = numpy.asarray(instrument_list_ids, dtype=int)
+        dates = pandas.DatetimeIndex(pandas.to_datetime(numpy.asarray(dates)))
+        instrument_list_matrix = self.instrument_table.get_instrument_list_matrix()[instrument_list_ids]
+        closing_prices = numpy.full(len(instrument_list_ids), numpy.nan)
+
+        # same as from_single_date() and then from_range_of_dates() in get_closing_price, but as array lookups into the
+        # price panel, which is already de-adjusted
+        panel_dates, exact_closing_prices, mean_closing_prices = self.get_price_panel()
+        date_positions = panel_dates.get_indexer(dates)
+        exact_date_hits = lookup_price_panel(exact_closing_prices)
+        mean_price_hits = lookup_price_panel(mean_closing_prices)
+
+        if mean_price_hits.any():
+            self.logger.warning('fallback to mean price! lookups: %s dates: %s', mean_price_hits.sum(), dates[mean_price_hits].unique())
+
+        # only the misses take the slow path through the renamed symbols, each distinct (symbol list, date) pair just once
+        misses = numpy.flatnonzero(numpy.isnan(closing_prices))
+        self.logger.info('exact date hits: %s mean price hits: %s misses: %s', exact_date_hits.sum(), mean_price_hits.sum(), len(misses))
+
+        # The lookups found in the panel are counted per row, like those of get_closing_price(), which counts each of the
+        # distinct (symbol list, date) pairs of the rest.
+        self.instrumentation.increment('price_lookup_hits', exact_date_hits.sum())
+        self.instrumentation.increment('price_lookup_mean_fallbacks', mean_price_hits.sum())
+        self.instrumentation.increment('price_lookup_slow_path_rows', len(misses))
+
+        fallback_closing_prices = {}
+        for position in misses:
+            key = (instrument_list_ids[position], dates[position])
+            if key not in fallback_closing_prices:
+                fallback_closing_prices[key] = self.get_closing_price(self.instrument_table.get_symbol_list(key[0]), key[1])
+
+            closing_price = fallback_closing_prices[key]
+            if closing_price is not None:
+                closing_prices[position] = closing_price
+
+        return closing_prices
+
     def get_de_adjustment_factor(self, stock_symbol, date):
         # todo: this data is directly available from yfinance api, need to check its reliability
-        try:
-            matching_data = self.price_adjustment_map[stock_symbol]
-            adjustment_date = matching_data['Date']
-            numerator = matching_data['Numerator']
-            denominator = matching_data['Denominator']
-        except KeyError:
+        if not self.corporate_actions.has_actions_after(stock_symbol, date):
             self.logger.info('no price adjustment. stock_symbol: %s date: %s', stock_symbol, date)
             return None  # todo: raise exception here? but is this really an exception?
-        else:
-            if pandas.to_datetime(date) >= adjustment_date:
-                self.logger.info('no price adjustment. date: %s on or after adjustment_date: %s stock_symbol: %s', date, adjustment_date, stock_symbol)
-                return None
 
-            adjustment_factor = numerator / denominator
-            self.logger.info('stock_symbol: %s date: %s -> adjustment_factor: %s', stock_symbol, date, adjustment_factor)
-            return adjustment_factor
+        adjustment_factor = self.corporate_actions.get_de_adjustment_factors(stock_symbol, [pandas.to_datetime(date)])[0]
+        self.logger.info('stock_symbol: %s date: %s -> adjustment_factor: %s', stock_symbol, date, adjustment_factor)
+        return adjustment_factor
+
+    def get_price_panel(self):
+        # A single date x instrument matrix of the closing prices, on every calendar day from a week before the earliest
+        # price to a week after the latest one, with NaN where there is no price. Alongside it, the mean of the prices in
+        # the 15 days centered on every date, the same as the ±7 days fallback of get_closing_price, computed once.
+        if self.price_panel is None:
+            closing_prices = pandas.DataFrame({instrument_id: stock_data['Close'] for instrument_id, stock_data in self.instrument_to_stock_data.items()}, dtype=float)
+            if closing_prices.index.empty:
+                panel_dates = pandas.DatetimeIndex([])
+            else:
+                panel_dates = pandas.date_range(closing_prices.index.min() - pandas.Timedelta(days=7), closing_prices.index.max() + pandas.Timedelta(days=7))
+
+            closing_prices = closing_prices.reindex(index=panel_dates, columns=range(len(self.instrument_table)))
+            mean_closing_prices = closing_prices.rolling(15, center=True, min_periods=1).mean()
+
+            # Both are de-adjusted by the corporate actions after each date in a single multiply, the mean prices too,
+            # because get_closing_price de-adjusts the mean of the adjusted prices by the factor on the date itself.
+            de_adjustment_factors = numpy.ones(closing_prices.shape)
+            for instrument_id, ticker in enumerate(self.instrument_table.tickers):
+                if ticker in self.corporate_actions.ticker_to_step_series:
+                    de_adjustment_factors[:, instrument_id] = self.corporate_actions.get_de_adjustment_factors(ticker, panel_dates)
 
-    def __suffixize_symbol(self, symbol, exchange):
-        return symbol + self.exchange_to_suffix[exchange]
+            self.price_panel = (panel_dates, closing_prices.to_numpy() * de_adjustment_factors, mean_closing_prices.to_numpy() * de_adjustment_factors)
+            self.logger.info('built price panel. dates: %s instruments: %s', len(panel_dates), len(closing_prices.columns))
 
-    def __suffixize_symbol_list(self, symbol_list):
-        return [self.__suffixize_symbol(symbol, exchange) for symbol, exchange in symbol_list]
+        return self.price_panel
 
-    def __get_adjusted_closing_prices_for_date_range(self, symbol_list, start_date, end_date):
-        for symbol in symbol_list:
+    def __get_adjusted_closing_prices_for_date_range(self, instrument_ids, start_date, end_date):
+        tickers = [self.instrument_table.tickers[instrument_id] for instrument_id in instrument_ids]
+        for instrument_id in instrument_ids:
             try:
-                adjusted_closing_prices = self.symbol_to_stock_data[symbol].loc[start_date:end_date, 'Close']
+                adjusted_closing_prices = self.instrument_to_stock_data[instrument_id].loc[start_date:end_date, 'Close']
             except KeyError:
-                self.logger.debug('no prefetched data. symbol_list: %s start_date: %s end_date: %s symbol: %s', symbol_list, start_date, end_date, symbol)
+                self.logger.debug('no prefetched data. tickers: %s start_date: %s end_date: %s ticker: %s', tickers, start_date, end_date, self.instrument_table.tickers[instrument_id])
                 continue
             else:
                 if not adjusted_closing_prices.empty and not adjusted_closing_prices.isnull().array.all():
-                    self.logger.info('symbol_list: %s start_date: %s end_date: %s -> closing_prices...\n%s', symbol_list, start_date, end_date, adjusted_closing_prices.to_string())
-                    return adjusted_closing_prices
+                    self.logger.debug('tickers: %s start_date: %s end_date: %s -> closing_prices...\n%s', tickers, start_date, end_date, LazyString(adjusted_closing_prices.to_string))
+                    return instrument_id, adjusted_closing_prices
 
-        self.logger.warning('symbol_list: %s start_date: %s end_date: %s -> no closing_price_found!', symbol_list, start_date, end_date)
-        raise NoClosingPriceError(f'no closing price found for symbol_list: {symbol_list} start_date: {start_date} end_date: {end_date}')
+        self.logger.warning('tickers: %s start_date: %s end_date: %s -> no closing_price_found!', tickers, start_date, end_date)
+        raise NoClosingPriceError(f'no closing price found for tickers: {tickers} start_date: {start_date} end_date: {end_date}')
 
 
 class NoClosingPriceError(Exception):
@@ -0,0 +1,52 @@
+import logging
+import numpy
+import pandas
+
+
+class HoldingsEngine:
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def compute_daywise_holdings(self, transactions_list, initial_holdings=None):
+        # initial_holdings are the holdings just before the first of the transactions, for resuming from a checkpoint
+        if initial_holdings is None:
+            initial_holdings = pandas.DataFrame(columns=['Name', 'Shares', 'Symbol'])
+
+        if transactions_list.empty:
+            return pandas.DataFrame(columns=['Date', 'Name', 'Shares', 'Symbol'])
+
+        # The holdings on any date are the running total of all the transactions up to and including that date.
+        # So the net shares transacted per (date, company) are pivoted into a date x company matrix, and a cumulative
+        # sum down the dates gives the holdings of every company on every transaction date in a single pass.
+        company_names = pandas.unique(pandas.concat([initial_holdings['Name'], transactions_list['Name']]))
+        net_transacted_shares = transactions_list.groupby(['Date', 'Name'], sort=False, observed=True)['Shares'].sum()
+        daywise_shares = net_transacted_shares.unstack('Name').reindex(columns=company_names).fillna(0).sort_index().cumsum()
+        if not initial_holdings.empty:
+            daywise_shares += initial_holdings.set_index('Name')['Shares'].reindex(company_names).fillna(0)
+
+        daywise_holdings = daywise_shares.stack().rename('Shares').reset_index()
+        daywise_holdings = daywise_holdings[daywise_holdings['Shares'] != 0].reset_index(drop=True)
+
+        company_name_to_symbol_list = pandas.concat([initial_holdings, transactions_list]).drop_duplicates(subset='Name').set_index('Name')['Symbol']
+        daywise_holdings['Symbol'] = daywise_holdings['Name'].astype(object).map(company_name_to_symbol_list)
+
+        self.logger.info('computed daywise holdings. dates: %s companies: %s rows: %s',
+                         len(daywise_shares.index), len(company_names), len(daywise_holdings.index))
+        return daywise_holdings
+
+    def iterate_daywise_holdings(self, transactions_list, initial_holdings=None, dates_per_chunk=1):
+        # Same as compute_daywise_holdings(), but yields the daywise holdings of dates_per_chunk transaction dates at a
+        # time, so that only the holdings of those dates are in memory at once. The holdings at the end of every chunk
+        # are the initial holdings of the next one.
+        transactions_list = transactions_list.sort_values(by='Date', kind='stable')
+        transaction_dates = transactions_list['Date'].to_numpy()
+        unique_transaction_dates = numpy.unique(transaction_dates)
+
+        for chunk_start in range(0, len(unique_transaction_dates), dates_per_chunk):
+            chunk_dates = unique_transaction_dates[chunk_start:chunk_start + dates_per_chunk]
+            chunk_start_position = numpy.searchsorted(transaction_dates, chunk_dates[0], side='left')
+            chunk_end_position = numpy.searchsorted(transaction_dates, chunk_dates[-1], side='right')
+            daywise_holdings = self.compute_daywise_holdings(transactions_list.iloc[chunk_start_position:chunk_end_position], initial_holdings)
+
+            initial_holdings = daywise_holdings.loc[daywise_holdings['Date'] == chunk_dates[-1], ['Name', 'Shares', 'Symbol']]
+            yield daywise_holdings
@@ -0,0 +1,86 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+
+class Instrumentation:
+    def __init__(self):
+        # Wall time and call count of every stage, and any number of named counters, all kept in plain dicts so that
+        # recording costs next to nothing. Multibeggar, CompaniesInfo and StockPricesDataProvider record into the
+        # instrumentation given to them, and into a NullInstrumentation otherwise.
+        self.logger = logging.getLogger(__name__)
+
+        self.stage_timings = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def time_stage(self, stage_name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_seconds = time.perf_counter() - start_time
+            with self.lock:
+                self.stage_timings[stage_name] += elapsed_seconds
+                self.stage_calls[stage_name] += 1
+
+    def time_iterations(self, iterable, stage_name):
+        # times only the producing of each item, not what the caller does with it before asking for the next
+        iterator = iter(iterable)
+        while True:
+            with self.time_stage(stage_name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def increment(self, counter_name, count=1):
+        with self.lock:
+            self.counters[counter_name] += int(count)
+
+    def get_report(self):
+        with self.lock:
+            return {
+                'stages': {stage_name: {'seconds': seconds, 'calls': self.stage_calls[stage_name]} for stage_name, seconds in self.stage_timings.items()},
+                'counters': dict(self.counters),
+            }
+
+    def dump_json(self, file_path):
+        with open(file_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.get_report(), report_file, indent=4, sort_keys=True)
+        self.logger.info('file_path: %s -> dumped instrumentation report', file_path)
+
+    def reset(self):
+        with self.lock:
+            self.stage_timings.clear()
+            self.stage_calls.clear()
+            self.counters.clear()
+
+    def __getstate__(self):
+        # the batch runner pickles the instrumented objects into its worker processes, which cannot take the lock along
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+class NullInstrumentation:
+    # records nothing, for when the instrumentation is not asked for
+
+    def time_stage(self, stage_name):
+        return contextlib.nullcontext()
+
+    def time_iterations(self, iterable, stage_name):
+        return iterable
+
+    def increment(self, counter_name, count=1):
+        pass
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import pandas
+import pyarrow
+import pyarrow.parquet
+
+
+class TransactionsLoader:
+    def __init__(self, chunk_size=100000, sidecar_dir=None):
+        self.logger = logging.getLogger(__name__)
+
+        # Every transactions list has exactly these columns, whatever the file format. The company names repeat a lot,
+        # so they are categorical, which also makes the groupby on them much faster.
+        self.schema = {'Date': 'datetime64[ns]', 'Name': 'category', 'Shares': 'float64'}
+        self.chunk_size = chunk_size
+
+        # With a sidecar_dir, an Excel file is parsed only once and saved there as Parquet, for the later runs to read
+        self.sidecar_dir = sidecar_dir
+        if self.sidecar_dir is not None:
+            os.makedirs(self.sidecar_dir, exist_ok=True)
+
+    def load(self, file_path):
+        file_extension = os.path.splitext(file_path)[1].lower()
+        if file_extension == '.csv':
+            # only the header is read first, as read_csv() cannot parse the dates of a missing Date column
+            self.__check_columns(pandas.read_csv(file_path, nrows=0).columns, file_path)
+            transactions_list = pandas.read_csv(file_path, usecols=lambda column: column in self.schema, dtype={'Name': 'category'}, parse_dates=['Date'])
+        elif file_extension == '.parquet':
+            # only the schema is read first, as read_parquet() raises an ArrowInvalid of its own for a missing column
+            self.__check_columns(pyarrow.parquet.read_schema(file_path).names, file_path)
+            transactions_list = pandas.read_parquet(file_path, columns=list(self.schema))
+        elif file_extension in ('.xlsx', '.xls'):
+            return self.__load_excel_file(file_path)
+        else:
+            raise InvalidTransactionsListError(f'unsupported file format: {file_path}')
+
+        transactions_list = self.__validate(transactions_list, file_path)
+        self.logger.info('file_path: %s -> transactions: %s', file_path, len(transactions_list.index))
+        return transactions_list
+
+    def iterate_chunks(self, file_path):
+        # Yields the transactions list in chunks of at most chunk_size rows, without ever reading the whole file at once.
+        # The categories of the company names are those of each chunk, so they can differ between the chunks.
+        file_extension = os.path.splitext(file_path)[1].lower()
+        if file_extension == '.csv':
+            self.__check_columns(pandas.read_csv(file_path, nrows=0).columns, file_path)
+            chunks = pandas.read_csv(file_path, usecols=lambda column: column in self.schema, dtype={'Name': 'category'}, parse_dates=['Date'],
+                                     chunksize=self.chunk_size)
+        elif file_extension == '.parquet':
+            chunks = self.__iterate_parquet_batches(file_path)
+        elif file_extension in ('.xlsx', '.xls') and self.sidecar_dir is not None:
+            # an Excel file cannot be read in parts, but its sidecar can be
+            self.__load_excel_file(file_path)
+            chunks = self.__iterate_parquet_batches(self.__get_sidecar_path(file_path))
+        elif file_extension in ('.xlsx', '.xls'):
+            transactions_list = self.__load_excel_file(file_path)
+            chunks = (transactions_list.iloc[start:start + self.chunk_size] for start in range(0, len(transactions_list.index), self.chunk_size))
+        else:
+            raise InvalidTransactionsListError(f'unsupported file format: {file_path}')
+
+        for chunk in chunks:
+            yield self.__validate(chunk, file_path)
+
+    def __load_excel_file(self, file_path):
+        if self.sidecar_dir is None:
+            return self.__validate(pandas.read_excel(file_path), file_path)
+
+        # the sidecar records the hash of the Excel file it was converted from, so an edited Excel file is parsed again
+        sidecar_path = self.__get_sidecar_path(file_path)
+        excel_file_hash = self.__compute_file_hash(file_path)
+        try:
+            sidecar_metadata = pyarrow.parquet.read_schema(sidecar_path).metadata or {}
+            if sidecar_metadata.get(b'excel_file_hash') == excel_file_hash.encode():
+                self.logger.info('file_path: %s -> reading sidecar: %s', file_path, sidecar_path)
+                return self.__validate(pandas.read_parquet(sidecar_path), file_path)
+        except (OSError, pyarrow.ArrowInvalid):
+            pass
+
+        transactions_list = self.__validate(pandas.read_excel(file_path), file_path)
+
+        table = pyarrow.Table.from_pandas(transactions_list, preserve_index=False)
+        table = table.replace_schema_metadata({**table.schema.metadata, b'excel_file_hash': excel_file_hash.encode()})
+
+        # write to a temporary file and then replace, so that an interrupted run cannot leave a corrupt sidecar behind
+        temporary_sidecar_path = sidecar_path + '.tmp'
+        pyarrow.parquet.write_table(table, temporary_sidecar_path)
+        os.replace(temporary_sidecar_path, sidecar_path)
+
+        self.logger.info('file_path: %s -> saved sidecar: %s', file_path, sidecar_path)
+        return transactions_list
+
+    def __iterate_parquet_batches(self, file_path):
+        parquet_file = pyarrow.parquet.ParquetFile(file_path)
+        self.__check_columns(parquet_file.schema_arrow.names, file_path)
+        for record_batch in parquet_file.iter_batches(batch_size=self.chunk_size, columns=list(self.schema)):
+            yield record_batch.to_pandas()
+
+    def __get_sidecar_path(self, file_path):
+        # Excel files of the same name in different directories get different sidecars
+        file_path_hash = hashlib.sha256(os.path.abspath(file_path).encode()).hexdigest()[:16]
+        return os.path.join(self.sidecar_dir, f'{os.path.splitext(os.path.basename(file_path))[0]}_{file_path_hash}.parquet')
+
+    def __validate(self, transactions_list, file_path):
+        # the dates are converted along with the other columns, so read_excel() does not have to parse them
+        self.__check_columns(transactions_list.columns, file_path)
+
+        transactions_list = transactions_list[list(self.schema)]
+        for column in self.schema:
+            if transactions_list[column].isna().any():
+                raise InvalidTransactionsListError(f'{file_path} has empty values in column: {column}')
+
+        try:
+            transactions_list = transactions_list.astype(self.schema)
+        except (TypeError, ValueError) as error:
+            raise InvalidTransactionsListError(f'{file_path} does not match the schema {self.schema}: {error}') from error
+
+        return transactions_list.reset_index(drop=True)
+
+    def __check_columns(self, columns, file_path):
+        missing_columns = [column for column in self.schema if column not in columns]
+        if missing_columns:
+            raise InvalidTransactionsListError(f'{file_path} has no column: {missing_columns}')
+
+    @staticmethod
+    def __compute_file_hash(file_path):
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+
+class InvalidTransactionsListError(Exception):
+    """Raise when a transactions list does not have the expected columns and types."""
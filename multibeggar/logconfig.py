@@ -0,0 +1,62 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FORMAT = '%(levelname)s: %(message)s [%(funcName)s():%(lineno)s - %(asctime)s]'
+LOG_DATE_FORMAT = '%Y/%m/%d %I:%M:%S %p'
+
+# 'debug' is the original behaviour of logging everything synchronously, useful while developing and troubleshooting.
+# 'production' logs only warnings and above, and hands the records over to a queue so that the file I/O happens on a
+# separate thread instead of the compute thread.
+LOGGING_PROFILES = {
+    'debug': {'level': logging.DEBUG, 'use_queue': False},
+    'production': {'level': logging.WARNING, 'use_queue': True},
+}
+
+
+class LazyString:
+    """Defer an expensive rendering, such as DataFrame.to_string(), until the log record is actually formatted."""
+
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.function(*self.args, **self.kwargs))
+
+
+def configure_logging(profile='debug', log_file_path=None, force=False):
+    # Like logging.basicConfig(), this leaves the handlers alone if logging is already configured, unless forced, but
+    # the level of the profile is applied either way. With the production profile, the queue listener is returned so
+    # that the caller can stop it to flush the log early.
+    logging_profile = LOGGING_PROFILES[profile]
+    logging.getLogger('multibeggar').setLevel(logging_profile['level'])
+
+    root_logger = logging.getLogger()
+    if root_logger.handlers and not force:
+        return None
+
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+
+    if log_file_path is None:
+        log_file_path = os.path.join(os.getcwd(), 'output', 'multibeggar.log')
+
+    file_handler = logging.FileHandler(log_file_path, mode='w')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+
+    if logging_profile['use_queue']:
+        log_queue = queue.SimpleQueue()
+        queue_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        queue_listener.start()
+        atexit.register(queue_listener.stop)  # flushes the remaining records when the process exits
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    else:
+        queue_listener = None
+        root_logger.addHandler(file_handler)
+
+    return queue_listener
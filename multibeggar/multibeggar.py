@@ -1,146 +1,330 @@
 import os
 import logging
 from math import exp
+import numpy
 import pandas
-from matplotlib import pyplot
+from multibeggar.checkpoint import PortfolioCheckpoint
 from multibeggar.dalalstreet import CompaniesInfo, StockPricesDataProvider
+from multibeggar.holdings import HoldingsEngine
+from multibeggar.instrumentation import NullInstrumentation
+from multibeggar.ledger import TransactionsLoader
+from multibeggar.logconfig import configure_logging
+from multibeggar.refdata import ReferenceData
+from multibeggar.writers import CsvDataFrameWriter, ParquetDataFrameWriter
 
 
 class Multibeggar:
-    def __init__(self):
-        logging.basicConfig(format='%(levelname)s: %(message)s [%(funcName)s():%(lineno)s - %(asctime)s]', datefmt='%Y/%m/%d %I:%M:%S %p', handlers=[logging.FileHandler(os.path.join(os.getcwd(), 'output', 'multibeggar.log'), mode='w')])
+    def __init__(self, price_cache_dir=None, download_function=None, resolution_cache_path=None, companies_info=None, stock_prices_data_provider=None,
+                 logging_profile='debug', ledger_cache_dir=None, price_provider=None, instrumentation=None):
+        configure_logging(logging_profile)
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
 
-        script_dir = os.path.dirname(__file__)
+        # the time of each stage and the counts of the price lookups, downloads and name matches are recorded into the
+        # instrumentation when one is given, see multibeggar.instrumentation
+        self.instrumentation = instrumentation if instrumentation is not None else NullInstrumentation()
 
-        self.fixup_company_names_map = pandas.read_csv(os.path.join(script_dir, 'data', 'fixup_company_names.csv')).set_index('Actual Name').to_dict('index')
+        # the reference data is read from its snapshot when there is one, see multibeggar.refdata
+        reference_data = ReferenceData()
+        self.fixup_company_names_map = reference_data.get_table('fixup_company_names').set_index('Actual Name').to_dict('index')
 
-        self.companies_info = CompaniesInfo()
-        self.stock_prices_data_provider = StockPricesDataProvider()
+        # the reference data and the prices can be shared between several instances, for example by a batch run
+        if companies_info is None:
+            companies_info = CompaniesInfo(resolution_cache_path=resolution_cache_path, reference_data=reference_data, instrumentation=instrumentation)
+        if stock_prices_data_provider is None:
+            stock_prices_data_provider = StockPricesDataProvider(download_function=download_function, price_cache_dir=price_cache_dir, price_provider=price_provider,
+                                                                 reference_data=reference_data, instrumentation=instrumentation)
 
-    def load_transactions_from_excel_file(self, excel_file_path):
-        self.input_file_path = excel_file_path
-        self.transactions_list = pandas.read_excel(excel_file_path, parse_dates=['Date'])
+        self.companies_info = companies_info
+        self.stock_prices_data_provider = stock_prices_data_provider
+        self.holdings_engine = HoldingsEngine()
+        self.transactions_loader = TransactionsLoader(sidecar_dir=ledger_cache_dir)
 
-    def plot_portfolio_complexity(self):
-        self.__prepare_for_portfolio_complexity_calculation()
-        self.__compute_daywise_portfolio()
+        self.exponent_tuning_factor = 0.01
 
-        input_file_name = os.path.splitext(os.path.basename(self.input_file_path))[0]
-        self.daywise_full_portfolio.to_excel(os.path.join(os.getcwd(), 'output', input_file_name + '_daywise_full_portfolio.xlsx'))
+        # With the csv and parquet output formats, the daywise portfolio is computed and written this many dates at a
+        # time, so that the memory needed does not grow with the length of the history. A single date at a time needs
+        # the least memory, but about a month at a time is an order of magnitude faster.
+        self.dates_per_chunk = 20
+        self.output_file_extensions = {'excel': '.xlsx', 'csv': '.csv', 'parquet': '.parquet'}
+        self.data_frame_writers = {'csv': CsvDataFrameWriter, 'parquet': ParquetDataFrameWriter}
 
-        self.portfolio_complexity_data = self.daywise_full_portfolio.groupby('Date').apply(lambda group: self.compute_portfolio_complexity(group['Proportion'].dropna())).reset_index(name='Complexity')
-        self.portfolio_complexity_data.to_excel(os.path.join(os.getcwd(), 'output', input_file_name + '_portfolio_complexity_data.xlsx'))
+        # the line graph of a long history is downsampled to this many points, which look the same at any usual size
+        self.plot_max_points = 2000
 
-        self.portfolio_complexity_data.plot.line(x='Date', y='Complexity')
-        pyplot.savefig(os.path.join(os.getcwd(), 'output', input_file_name + '_portfolio_complexity_line_graph.svg'))
+    def load_transactions_from_excel_file(self, excel_file_path):
+        self.load_transactions_from_file(excel_file_path)
+
+    def load_transactions_from_file(self, file_path):
+        # the file can be Excel, CSV or Parquet, see TransactionsLoader for the schema
+        self.input_file_path = file_path
+        self.output_file_prefix = os.path.splitext(os.path.basename(file_path))[0]
+        self.transactions_list = self.transactions_loader.load(file_path)
+
+    def plot_portfolio_complexity(self, checkpoint_path=None, output_format='excel', export_excel=False, image_format='svg'):
+        # With a checkpoint_path, only the dates on or after the earliest transaction added since the last checkpoint
+        # are recomputed, along with the last week before the checkpoint once there are newer prices, and the complexity
+        # of the earlier dates is reused from the checkpoint.
+        # The daywise_full_portfolio then covers only the recomputed dates.
+        # With the csv or parquet output_format, the daywise portfolio is streamed to the output file instead of being
+        # kept in daywise_full_portfolio, and export_excel additionally converts the output files to Excel at the end.
+        # The image_format of the line graph is svg, or a raster format such as png for the long histories.
+        self.output_format = output_format
+        self.__prepare_for_portfolio_complexity_calculation(checkpoint_path)
+
+        if output_format == 'excel':
+            self.__compute_daywise_portfolio()
+            with self.instrumentation.time_stage('export'):
+                self.daywise_full_portfolio.to_excel(self.__get_output_file_path('daywise_full_portfolio', output_format))
+            with self.instrumentation.time_stage('complexity'):
+                self.__compute_portfolio_complexity_data(self.compute_portfolio_complexities(self.daywise_full_portfolio))
+            with self.instrumentation.time_stage('export'):
+                self.portfolio_complexity_data.to_excel(self.__get_output_file_path('portfolio_complexity_data', output_format))
+        else:
+            self.daywise_full_portfolio = None
+            self.__compute_portfolio_complexity_data(self.__stream_daywise_portfolio(output_format))
+            with self.instrumentation.time_stage('export'):
+                self.__write_portfolio_complexity_data(output_format)
+                if export_excel:
+                    self.__export_output_files_to_excel(output_format)
+
+        with self.instrumentation.time_stage('plot'):
+            # matplotlib takes longer to import than all the rest, so it is imported only when the graph is plotted
+            from multibeggar.plotting import ComplexityPlotter
+
+            ComplexityPlotter(max_points=self.plot_max_points).plot(
+                self.portfolio_complexity_data, os.path.join(os.getcwd(), 'output', self.output_file_prefix + '_portfolio_complexity_line_graph.' + image_format))
+
+    def get_daywise_portfolio_for_dates(self, dates):
+        # the rows of the daywise portfolio of the given dates, read back from the output file when it was streamed there
+        dates = pandas.DatetimeIndex(pandas.to_datetime(dates))
+        if self.daywise_full_portfolio is not None:
+            return self.daywise_full_portfolio[self.daywise_full_portfolio['Date'].isin(dates)]
+
+        daywise_portfolio_file_path = self.__get_output_file_path('daywise_full_portfolio', self.output_format)
+        if self.output_format == 'csv':
+            daywise_portfolio_chunks = pandas.read_csv(daywise_portfolio_file_path, parse_dates=['Date'], chunksize=100000)
+            # the file of a run without any dates to compute has the header alone, which reads back as no chunks at all
+            return pandas.concat([pandas.read_csv(daywise_portfolio_file_path, parse_dates=['Date'], nrows=0)]
+                                 + [chunk[chunk['Date'].isin(dates)] for chunk in daywise_portfolio_chunks], ignore_index=True)
+
+        return pandas.read_parquet(daywise_portfolio_file_path, filters=[('Date', 'in', list(dates))])
+
+    def fixup_company_names(self, company_names):
+        # all the fixups are done in a single pass over the company names
+        fixed_company_names = {actual_name: fixup_data['Fixed Name'] for actual_name, fixup_data in self.fixup_company_names_map.items()}
+        if not isinstance(company_names.dtype, pandas.CategoricalDtype):
+            return company_names.replace(fixed_company_names)
+
+        # For categorical company names, only the categories are fixed up. A fixed up category can coincide with an
+        # existing one, so the categories are factorized again and the codes of every row are renumbered accordingly.
+        fixed_categories = company_names.cat.categories.map(lambda company_name: fixed_company_names.get(company_name, company_name))
+        category_codes, unique_fixed_categories = pandas.factorize(fixed_categories)
+        return pandas.Series(pandas.Categorical.from_codes(category_codes[company_names.cat.codes], unique_fixed_categories),
+                             index=company_names.index, name=company_names.name)
 
     def compute_portfolio_complexity(self, proportions):
         sorted_proportions = sorted(proportions)
         self.logger.debug('sorted_proportions: %s', sorted_proportions)
 
-        exponent_tuning_factor = 0.01
-
         portfolio_complexity = 0
-        [portfolio_complexity := portfolio_complexity + value * exp(exponent_tuning_factor * index) for index, value in enumerate(sorted_proportions)]
+        [portfolio_complexity := portfolio_complexity + value * exp(self.exponent_tuning_factor * index) for index, value in enumerate(sorted_proportions)]
 
         self.logger.info('portfolio_complexity: %s', portfolio_complexity)
         return portfolio_complexity
 
-    def __prepare_for_portfolio_complexity_calculation(self):
+    def compute_portfolio_complexities(self, daywise_portfolio):
+        # Same as compute_portfolio_complexity() for each date, but for all the dates at once, as the sum of the
+        # contributions of each date, see __compute_weighted_proportions().
+        dates = numpy.sort(daywise_portfolio['Date'].unique())
+        proportion_dates, group_starts, weighted_proportions = self.__compute_weighted_proportions(daywise_portfolio)
+        if len(weighted_proportions.index) == 0:
+            return pandas.DataFrame({'Date': dates, 'Complexity': numpy.zeros(len(dates))})
+
+        portfolio_complexities = numpy.add.reduceat(weighted_proportions.to_numpy(), group_starts)
+
+        # dates without a single proportion have no value at all, their complexity is zero like that of an empty portfolio
+        portfolio_complexity_data = pandas.Series(portfolio_complexities, index=proportion_dates[group_starts]).reindex(dates, fill_value=0)
+        self.logger.info('computed portfolio_complexities for dates: %s', len(dates))
+        return portfolio_complexity_data.rename_axis('Date').reset_index(name='Complexity')
+
+    def compute_complexity_contributions(self, daywise_portfolio):
+        # the part of the complexity of its date that comes from each row of the daywise portfolio, NaN for the rows
+        # without a proportion. The contributions of a date add up to its complexity.
+        weighted_proportions = self.__compute_weighted_proportions(daywise_portfolio)[2]
+        return weighted_proportions.reindex(daywise_portfolio.index)
+
+    def __compute_weighted_proportions(self, daywise_portfolio):
+        # The proportions are sorted by date and then by value, so the rank of each proportion within its date is its
+        # position from the start of its date, and the weights of all ranks come from a single precomputed table.
+        proportions = daywise_portfolio[['Date', 'Proportion']].dropna().sort_values(by=['Date', 'Proportion'])
+        proportion_dates = proportions['Date'].to_numpy()
+        group_starts = numpy.flatnonzero(numpy.r_[True, proportion_dates[1:] != proportion_dates[:-1]]) if len(proportion_dates) else numpy.array([], dtype=int)
+        group_sizes = numpy.diff(numpy.r_[group_starts, len(proportion_dates)])
+        ranks = numpy.arange(len(proportion_dates)) - numpy.repeat(group_starts, group_sizes)
+
+        weights = numpy.exp(self.exponent_tuning_factor * numpy.arange(group_sizes.max(initial=0)))
+        return proportion_dates, group_starts, pandas.Series(proportions['Proportion'].to_numpy() * weights[ranks], index=proportions.index)
+
+    def __prepare_for_portfolio_complexity_calculation(self, checkpoint_path):
 
         def fixup_company_names():
-            for actual_name, fixup_data in self.fixup_company_names_map.items():
-                self.transactions_list.replace({'Name': actual_name}, fixup_data['Fixed Name'], inplace=True)
-
-        def get_and_collect_stock_symbols(company_name):
-            try:
-                symbol_list = company_name_to_symbol_list_map[company_name]
-            except KeyError:
-                symbol_list = self.companies_info.get_symbols(company_name)
-                company_name_to_symbol_list_map[company_name] = symbol_list
-                self.logger.debug('added to memo. company_name: %s symbol_list: %s', company_name, symbol_list)
-
-                all_symbols.extend(symbol_list)
-            else:
-                self.logger.debug('read from memo. company_name: %s symbol_list: %s', company_name, symbol_list)
-
-            self.logger.info('company_name: %s -> symbol_list: %s', company_name, symbol_list)
-            return symbol_list
+            self.transactions_list['Name'] = self.fixup_company_names(self.transactions_list['Name'])
 
         def append_stock_symbols():
-            self.transactions_list['Symbol'] = self.transactions_list.apply(lambda x: get_and_collect_stock_symbols(x['Name']), axis=1)
+            company_name_to_symbol_list_map = self.companies_info.resolve_many(self.transactions_list['Name'])
+            self.transactions_list['Symbol'] = self.transactions_list['Name'].astype(object).map(company_name_to_symbol_list_map)
+
+            # the prices are looked up by the interned id of the symbol list of each company, see InstrumentTable
+            self.company_name_to_instrument_list_id = {company_name: self.stock_prices_data_provider.instrument_table.get_instrument_list_id(symbol_list)
+                                                       for company_name, symbol_list in company_name_to_symbol_list_map.items()}
+
+            all_symbols.extend(symbol for symbol_list in company_name_to_symbol_list_map.values() for symbol in symbol_list)
 
         def sort_by_date():
             self.transactions_list.sort_values(by='Date', inplace=True)
 
+        def find_earliest_date_to_recompute():
+            if checkpoint_path is None:
+                self.portfolio_checkpoint = None
+                self.earliest_date_to_recompute = self.transactions_list['Date'].iloc[0]
+            else:
+                self.portfolio_checkpoint = PortfolioCheckpoint(checkpoint_path)
+                self.earliest_date_to_recompute = self.portfolio_checkpoint.get_earliest_date_to_recompute(self.transactions_list, self.stock_prices_data_provider.today_date)
+
         def fetch_stock_prices():
-            start_date = self.transactions_list['Date'].iloc[0]
+            if self.earliest_date_to_recompute is None:
+                return
+
+            # the mean price fallback around the earliest date to recompute needs the prices of the week before that date
+            start_date = max(self.transactions_list['Date'].iloc[0], self.earliest_date_to_recompute - pandas.Timedelta(days=7))
             self.stock_prices_data_provider.fetch_stock_prices(all_symbols, start_date)
 
-        def append_sentinel_row():
-            self.transactions_list = self.transactions_list.append({'Date': '0'}, ignore_index=True)
+        def select_transactions_to_process():
+            if self.earliest_date_to_recompute is None:
+                self.transactions_to_process = self.transactions_list.iloc[0:0]
+            else:
+                self.transactions_to_process = self.transactions_list[self.transactions_list['Date'] >= self.earliest_date_to_recompute]
+
+        def compute_initial_holdings():
+            if self.portfolio_checkpoint is None or self.earliest_date_to_recompute is None:
+                self.initial_holdings = None
+                return
+
+            self.initial_holdings = self.portfolio_checkpoint.get_holdings_before(self.earliest_date_to_recompute).rename('Shares').rename_axis('Name').reset_index()
+            self.initial_holdings['Symbol'] = self.initial_holdings['Name'].astype(object).map(self.transactions_list.drop_duplicates(subset='Name').set_index('Name')['Symbol'])
 
         all_symbols = []
-        company_name_to_symbol_list_map = {}
 
-        fixup_company_names()
-        append_stock_symbols()
+        with self.instrumentation.time_stage('name_fixup'):
+            fixup_company_names()
+        with self.instrumentation.time_stage('symbol_resolution'):
+            append_stock_symbols()
         sort_by_date()
-        fetch_stock_prices()
-        append_sentinel_row()
+        find_earliest_date_to_recompute()
+        with self.instrumentation.time_stage('price_fetch'):
+            fetch_stock_prices()
+        select_transactions_to_process()
+        compute_initial_holdings()
 
     def __compute_daywise_portfolio(self):
-
-        def compute_and_append_daily_closing_prices_and_values():
-            daily_portfolio['Closing Price'] = daily_portfolio.apply(lambda row: self.stock_prices_data_provider.get_closing_price(row['Symbol'], row['Date']), axis=1, result_type='reduce')
-            daily_portfolio['Value'] = daily_portfolio['Shares'] * daily_portfolio['Closing Price']
-
-        def compute_and_append_daily_proportions():
-            value_sum = daily_portfolio['Value'].sum()
-            self.logger.debug('ongoing_date: %s value_sum: %s', ongoing_date, value_sum)
-
-            try:
-                daily_portfolio['Proportion'] = daily_portfolio['Value'] / value_sum
-            except ZeroDivisionError:
-                self.logger.warning('value_sum is zero, clearing daily_portfolio! ongoing_date: %s', ongoing_date)
-                # clearing all rows causes strange runtime exception, hence using below workaround which is equivalent
-                daily_portfolio.dropna(subset=['Value'], inplace=True)
-
-        ongoing_date = None
-        daily_portfolio = self.transactions_list.iloc[0:0, :].copy()  # create empty DataFrame with same columns as transactions_list
-        self.daywise_full_portfolio = pandas.DataFrame()
+        with self.instrumentation.time_stage('daywise_holdings'):
+            self.daywise_full_portfolio = self.holdings_engine.compute_daywise_holdings(self.transactions_to_process, self.initial_holdings)
         self.portfolio_complexity_data = pandas.DataFrame()
 
-        for __unused, row in self.transactions_list.iterrows():
-            date = row['Date']
-            self.logger.debug('date: %s', date)
+        self.__append_closing_prices_values_and_proportions(self.daywise_full_portfolio)
 
-            if date != ongoing_date:  # this is a new date, so update current daily_portfolio to daywise_full_portfolio
-                daily_portfolio.drop(daily_portfolio[daily_portfolio['Shares'] == 0].index, inplace=True)
+    def __stream_daywise_portfolio(self, output_format):
+        # The daywise portfolio is computed, written and discarded a chunk of dates at a time. Only the complexity of each
+        # date, a single row per date, is kept and returned.
+        portfolio_complexity_data_chunks = []
 
-                compute_and_append_daily_closing_prices_and_values()
-                compute_and_append_daily_proportions()
+        with self.data_frame_writers[output_format](self.__get_output_file_path('daywise_full_portfolio', output_format),
+                                                    empty_data_frame=self.__get_empty_daywise_portfolio()) as daywise_portfolio_writer:
+            daywise_portfolios = self.holdings_engine.iterate_daywise_holdings(self.transactions_to_process, self.initial_holdings, self.dates_per_chunk)
+            for daywise_portfolio in self.instrumentation.time_iterations(daywise_portfolios, 'daywise_holdings'):
+                self.__append_closing_prices_values_and_proportions(daywise_portfolio)
+                with self.instrumentation.time_stage('complexity'):
+                    portfolio_complexity_data_chunks.append(self.compute_portfolio_complexities(daywise_portfolio))
 
-                self.daywise_full_portfolio = self.daywise_full_portfolio.append(daily_portfolio)
+                # the symbols are written as text, the same as in the Excel output
+                with self.instrumentation.time_stage('export'):
+                    daywise_portfolio_writer.write(daywise_portfolio.astype({'Name': str, 'Symbol': str}))
 
-                daily_portfolio.replace({ongoing_date: date}, inplace=True)
-                self.logger.debug('ongoing_date changing from: %s to: %s', ongoing_date, date)
-                ongoing_date = date
+        if not portfolio_complexity_data_chunks:
+            return pandas.DataFrame({'Date': pandas.Series(dtype='datetime64[ns]'), 'Complexity': pandas.Series(dtype=float)})
+        return pandas.concat(portfolio_complexity_data_chunks, ignore_index=True)
 
-            company_name = row['Name']
-            self.logger.debug('company_name: %s', company_name)
+    def __append_closing_prices_values_and_proportions(self, daywise_portfolio):
 
-            mask = (daily_portfolio['Name'] == company_name)
-            masked_rows = daily_portfolio[mask]
-            self.logger.debug('masked_rows...\n%s', masked_rows.to_string())
+        def compute_and_append_daily_closing_prices_and_values():
+            instrument_list_ids = daywise_portfolio['Name'].astype(object).map(self.company_name_to_instrument_list_id)
+            daywise_portfolio['Closing Price'] = self.stock_prices_data_provider.get_closing_prices_for_instrument_lists(instrument_list_ids, daywise_portfolio['Date'])
+            daywise_portfolio['Value'] = daywise_portfolio['Shares'] * daywise_portfolio['Closing Price']
 
-            if masked_rows.empty:  # this is a new stock name, so append to daily_portfolio
-                daily_portfolio = daily_portfolio.append(row)
-                self.logger.debug('added to daily_portfolio company_name: %s for ongoing_date: %s', company_name, ongoing_date)
-            else:  # this is already known stock, so update shares count in daily_portfolio
-                transacted_shares = row['Shares']
-                self.logger.debug('transacted_shares: %s', transacted_shares)
-                daily_portfolio.loc[mask, 'Shares'] += transacted_shares
-                self.logger.debug('company_name: %s updated shares count: %s', company_name, daily_portfolio.loc[mask, 'Shares'].array[0])
+        def compute_and_append_daily_proportions():
+            value_sums = daywise_portfolio.groupby('Date')['Value'].transform('sum')
+            daywise_portfolio['Proportion'] = daywise_portfolio['Value'] / value_sums
+
+            zero_value_sum_dates = daywise_portfolio.loc[value_sums == 0, 'Date'].unique()
+            if len(zero_value_sum_dates) > 0:
+                self.logger.warning('value_sum is zero, no proportions for dates: %s', zero_value_sum_dates)
+
+        with self.instrumentation.time_stage('pricing'):
+            compute_and_append_daily_closing_prices_and_values()
+            compute_and_append_daily_proportions()
+
+    def __compute_portfolio_complexity_data(self, recomputed_portfolio_complexity_data):
+
+        def save_checkpoint():
+            final_holdings = self.transactions_to_process.groupby('Name', observed=True)['Shares'].sum()
+            if self.initial_holdings is not None:
+                final_holdings = final_holdings.add(self.initial_holdings.set_index('Name')['Shares'], fill_value=0)
+
+            self.portfolio_checkpoint.save(self.transactions_list, final_holdings[final_holdings != 0], self.portfolio_complexity_data,
+                                           self.stock_prices_data_provider.today_date)
+
+        self.portfolio_complexity_data = recomputed_portfolio_complexity_data
+
+        if self.portfolio_checkpoint is None:
+            return
+
+        if self.earliest_date_to_recompute is None:
+            self.portfolio_complexity_data = self.portfolio_checkpoint.portfolio_complexity_data
+            return
+
+        earlier_portfolio_complexity_data = self.portfolio_checkpoint.get_portfolio_complexity_data_before(self.earliest_date_to_recompute)
+        self.portfolio_complexity_data = pandas.concat([earlier_portfolio_complexity_data, self.portfolio_complexity_data], ignore_index=True)
+        save_checkpoint()
+
+    def __write_portfolio_complexity_data(self, output_format):
+        with self.data_frame_writers[output_format](self.__get_output_file_path('portfolio_complexity_data', output_format),
+                                                    empty_data_frame=self.portfolio_complexity_data.iloc[0:0]) as portfolio_complexity_data_writer:
+            portfolio_complexity_data_writer.write(self.portfolio_complexity_data)
+
+    def __export_output_files_to_excel(self, output_format):
+        # An Excel workbook is always built in memory as a whole, so this needs as much memory as the daywise portfolio
+        # of the full history. That is why it is an optional final step, for the histories that fit in an Excel sheet.
+        daywise_portfolio_file_path = self.__get_output_file_path('daywise_full_portfolio', output_format)
+        if output_format == 'csv':
+            daywise_full_portfolio = pandas.read_csv(daywise_portfolio_file_path, parse_dates=['Date'])
+        else:
+            daywise_full_portfolio = pandas.read_parquet(daywise_portfolio_file_path)
+
+        daywise_full_portfolio.to_excel(self.__get_output_file_path('daywise_full_portfolio', 'excel'))
+        self.portfolio_complexity_data.to_excel(self.__get_output_file_path('portfolio_complexity_data', 'excel'))
+
+    @staticmethod
+    def __get_empty_daywise_portfolio():
+        # the columns of the streamed daywise portfolio, for the output file of a run without any dates to compute
+        return pandas.DataFrame({
+            'Date': pandas.Series(dtype='datetime64[ns]'),
+            'Name': pandas.Series(dtype=object),
+            'Shares': pandas.Series(dtype=float),
+            'Symbol': pandas.Series(dtype=object),
+            'Closing Price': pandas.Series(dtype=float),
+            'Value': pandas.Series(dtype=float),
+            'Proportion': pandas.Series(dtype=float),
+        })
+
+    def __get_output_file_path(self, output_name, output_format):
+        return os.path.join(os.getcwd(), 'output', self.output_file_prefix + '_' + output_name + self.output_file_extensions[output_format])
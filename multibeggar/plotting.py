@@ -0,0 +1,87 @@
+import itertools
+import logging
+import os
+import numpy
+import matplotlib
+from matplotlib import dates as matplotlib_dates
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+
+# The graphs are only ever saved to files, so the non-interactive Agg backend is chosen here, unless the MPLBACKEND
+# environment variable asks for another one. This module is imported only when plotting, see Multibeggar.
+if 'MPLBACKEND' not in os.environ:
+    matplotlib.use('Agg')
+
+
+class ComplexityPlotter:
+    def __init__(self, max_points=2000, figure_size=(12, 6), dpi=100):
+        self.logger = logging.getLogger(__name__)
+
+        # series longer than max_points are downsampled to max_points before plotting, None to plot every point
+        self.max_points = max_points
+        self.figure_size = figure_size
+        self.dpi = dpi
+
+    def plot(self, portfolio_complexity_data, output_file_path):
+        self.plot_many({'Complexity': portfolio_complexity_data}, output_file_path)
+
+    def plot_many(self, label_to_portfolio_complexity_data, output_file_path):
+        # All the series are drawn as a single LineCollection, which matplotlib renders in one go, however many there are.
+        # The image format follows the extension of output_file_path, for example .svg for vector or .png for raster.
+        segments = []
+        for label, portfolio_complexity_data in label_to_portfolio_complexity_data.items():
+            dates = matplotlib_dates.date2num(portfolio_complexity_data['Date'].to_numpy())
+            complexities = portfolio_complexity_data['Complexity'].to_numpy(dtype=float)
+            selected_points = get_lttb_indices(dates, complexities, self.max_points)
+            segments.append(numpy.column_stack([dates[selected_points], complexities[selected_points]]))
+            self.logger.debug('label: %s points: %s -> plotted points: %s', label, len(dates), len(selected_points))
+
+        figure = Figure(figsize=self.figure_size, dpi=self.dpi)
+        axes = figure.add_subplot()
+        colors = list(itertools.islice(itertools.cycle(matplotlib.rcParams['axes.prop_cycle'].by_key()['color']), len(segments)))
+        axes.add_collection(LineCollection(segments, colors=colors, linewidths=1))
+        axes.autoscale()
+
+        axes.xaxis.set_major_locator(matplotlib_dates.AutoDateLocator())
+        axes.xaxis.set_major_formatter(matplotlib_dates.ConciseDateFormatter(axes.xaxis.get_major_locator()))
+        axes.set_xlabel('Date')
+        axes.set_ylabel('Complexity')
+
+        # a legend of more than a handful of portfolios would hide the graph
+        if 1 < len(segments) <= 10:
+            axes.legend([Line2D([], [], color=color) for color in colors], list(label_to_portfolio_complexity_data))
+
+        figure.savefig(output_file_path)
+        self.logger.info('output_file_path: %s -> plotted series: %s', output_file_path, len(segments))
+
+
+def get_lttb_indices(x_values, y_values, max_points):
+    # Largest-Triangle-Three-Buckets downsampling: the first and last points are kept, and the rest are split into
+    # max_points - 2 buckets. From each bucket, the point that makes the largest triangle with the previous and the next
+    # buckets is selected, which keeps the peaks and troughs. The previous bucket is taken by its average, like the next
+    # one, instead of by the point selected from it, so that all the buckets are done at once without a Python loop.
+    point_count = len(x_values)
+    if max_points is None or max_points < 3 or point_count <= max_points:
+        return numpy.arange(point_count)
+
+    bucket_starts = (numpy.arange(max_points - 2) * (point_count - 2) / (max_points - 2)).astype(int)
+    bucket_sizes = numpy.diff(numpy.r_[bucket_starts, point_count - 2])
+    bucket_of_points = numpy.repeat(numpy.arange(max_points - 2), bucket_sizes)
+
+    inner_x_values, inner_y_values = x_values[1:-1], y_values[1:-1]
+    average_x_values = numpy.add.reduceat(inner_x_values, bucket_starts) / bucket_sizes
+    average_y_values = numpy.add.reduceat(inner_y_values, bucket_starts) / bucket_sizes
+    previous_x_values, previous_y_values = numpy.r_[x_values[0], average_x_values[:-1]], numpy.r_[y_values[0], average_y_values[:-1]]
+    next_x_values, next_y_values = numpy.r_[average_x_values[1:], x_values[-1]], numpy.r_[average_y_values[1:], y_values[-1]]
+
+    # twice the area of the triangle of every point with the previous and next buckets of its own bucket
+    previous_x, previous_y = previous_x_values[bucket_of_points], previous_y_values[bucket_of_points]
+    areas = numpy.abs((previous_x - next_x_values[bucket_of_points]) * (inner_y_values - previous_y)
+                      - (previous_x - inner_x_values) * (next_y_values[bucket_of_points] - previous_y))
+    areas = numpy.nan_to_num(areas, nan=-1)
+
+    # the first point of each bucket with the largest area of its bucket
+    largest_area_points = numpy.flatnonzero(areas == numpy.maximum.reduceat(areas, bucket_starts)[bucket_of_points])
+    first_largest_area_points = numpy.unique(bucket_of_points[largest_area_points], return_index=True)[1]
+    return numpy.r_[0, largest_area_points[first_largest_area_points] + 1, point_count - 1]
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import pandas
+
+
+class StockPricesCache:
+    def __init__(self, cache_dir, price_adjustments=None, today_date=None):
+        self.logger = logging.getLogger(__name__)
+
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # The prices from yfinance are adjusted for all the corporate actions up to the day they are downloaded, so the
+        # prices cached before an action are on another basis than those downloaded after it. The cached prices of a
+        # symbol are therefore dropped, and downloaded again, whenever its rows in price_adjustments change.
+        price_adjustments = price_adjustments if price_adjustments is not None else pandas.DataFrame(columns=['Symbol'])
+        self.symbol_to_adjustments_hash = {symbol: hashlib.sha256(adjustments.to_csv(index=False).encode()).hexdigest()
+                                           for symbol, adjustments in price_adjustments.groupby('Symbol')}
+
+        # the closing price of today may be missing or not final yet, so today is never recorded as covered
+        self.today_date = today_date if today_date is not None else pandas.to_datetime('today').normalize()
+
+        # The manifest records the range of dates for which each symbol has already been downloaded. The data itself may
+        # have holes in this range (weekends, holidays, suspensions), which must not be mistaken for missing data.
+        self.manifest_path = os.path.join(self.cache_dir, 'manifest.json')
+        try:
+            with open(self.manifest_path, encoding='utf-8') as manifest_file:
+                self.manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            self.manifest = {}
+
+    def get_missing_date_ranges(self, symbol, start_date, end_date):
+        if symbol in self.manifest and self.manifest[symbol].get('adjustments_hash') != self.symbol_to_adjustments_hash.get(symbol):
+            self.logger.warning('symbol: %s -> price adjustments changed, dropping its cached prices', symbol)
+            self.__drop(symbol)
+
+        try:
+            covered_start_date = pandas.to_datetime(self.manifest[symbol]['start'])
+            covered_end_date = pandas.to_datetime(self.manifest[symbol]['end'])
+        except KeyError:
+            return [(start_date, end_date)]
+
+        missing_date_ranges = []
+        if start_date < covered_start_date:
+            missing_date_ranges.append((start_date, covered_start_date - pandas.Timedelta(days=1)))
+        if end_date > covered_end_date:
+            missing_date_ranges.append((covered_end_date + pandas.Timedelta(days=1), end_date))
+
+        self.logger.debug('symbol: %s start_date: %s end_date: %s -> missing_date_ranges: %s', symbol, start_date, end_date, missing_date_ranges)
+        return missing_date_ranges
+
+    def load(self, symbol, start_date, end_date):
+        try:
+            stock_data = pandas.read_parquet(self.__get_stock_data_path(symbol))
+        except FileNotFoundError:
+            self.logger.debug('symbol: %s -> not cached', symbol)
+            return None
+
+        return stock_data.loc[start_date:end_date]
+
+    def store(self, symbol_to_stock_data, start_date, end_date):
+        # symbol_to_stock_data holds only the symbols whose download succeeded, see PriceProvider.download(). A symbol
+        # without any prices from start_date to end_date is recorded as covered only when it already has some prices
+        # cached, like over a weekend or a holiday, and not before it is listed, which a later download may well fill.
+        covered_until_date = min(end_date, self.today_date - pandas.Timedelta(days=1))
+        for symbol, stock_data in symbol_to_stock_data.items():
+            stock_data_path = self.__get_stock_data_path(symbol)
+            if stock_data.empty and symbol not in self.manifest:
+                self.logger.debug('symbol: %s -> no stock data to cache', symbol)
+                continue
+
+            if not stock_data.empty:
+                if os.path.exists(stock_data_path):
+                    stock_data = pandas.concat([pandas.read_parquet(stock_data_path), stock_data])
+                    stock_data = stock_data[~stock_data.index.duplicated(keep='last')].sort_index()
+
+                stock_data.to_parquet(stock_data_path)
+
+            if covered_until_date < start_date:
+                continue
+
+            # the missing date ranges are always adjacent to the covered range, so their union is still a single range
+            try:
+                covered_start_date = min(start_date, pandas.to_datetime(self.manifest[symbol]['start']))
+                covered_end_date = max(covered_until_date, pandas.to_datetime(self.manifest[symbol]['end']))
+            except KeyError:
+                covered_start_date, covered_end_date = start_date, covered_until_date
+
+            self.manifest[symbol] = {'start': covered_start_date.strftime('%Y-%m-%d'), 'end': covered_end_date.strftime('%Y-%m-%d'),
+                                     'adjustments_hash': self.symbol_to_adjustments_hash.get(symbol)}
+            self.logger.debug('symbol: %s -> cached from date: %s to date: %s', symbol, covered_start_date, covered_end_date)
+
+        self.__write_manifest()
+
+    def __drop(self, symbol):
+        del self.manifest[symbol]
+        try:
+            os.remove(self.__get_stock_data_path(symbol))
+        except FileNotFoundError:
+            pass
+        self.__write_manifest()
+
+    def __get_stock_data_path(self, symbol):
+        return os.path.join(self.cache_dir, symbol + '.parquet')
+
+    def __write_manifest(self):
+        # write to a temporary file and then replace, so that an interrupted run cannot leave a corrupt manifest behind
+        temporary_manifest_path = self.manifest_path + '.tmp'
+        with open(temporary_manifest_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=4, sort_keys=True)
+        os.replace(temporary_manifest_path, self.manifest_path)
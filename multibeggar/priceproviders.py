@@ -0,0 +1,165 @@
+import abc
+import functools
+import logging
+import threading
+import time
+import pandas
+
+
+class PriceProvider(abc.ABC):
+    # The source of the stock prices for StockPricesDataProvider. download() returns a map of every ticker that it could
+    # download to a data frame indexed by Date with at least a Close column, for the dates from start_date to end_date
+    # both inclusive. The frame is empty for a ticker without any prices in the range, while the tickers that failed to
+    # download are left out. An OSError is raised when nothing could be downloaded.
+    @abc.abstractmethod
+    def download(self, tickers, start_date, end_date):
+        pass
+
+
+class YFinancePriceProvider(PriceProvider):
+    def __init__(self, download_function=None, download_errors_function=None, batch_size=50, threads=4, max_retries=3, backoff_seconds=1.0,
+                 downloads_per_second=2.0):
+        self.logger = logging.getLogger(__name__)
+
+        # the download function is pluggable so that tests and benchmarks can run offline against a local stub.
+        # It must have the same interface as yfinance.download(), which is the default and imported only when needed.
+        # The download errors function returns the errors of the last download by ticker, like yfinance.shared does
+        # for yfinance.download(), which it defaults to along with it. A stub without one reports its errors by
+        # leaving the tickers out of its result.
+        self.download_function = download_function
+        self.download_errors_function = download_errors_function
+
+        # The tickers are downloaded batch_size at a time, one batch after the other, as yfinance.download() keeps its
+        # results in module globals and cannot be called concurrently. It downloads the tickers of a batch with as many
+        # threads itself. The tickers that fail are retried max_retries times, waiting backoff_seconds and then twice
+        # as long after every failure. No more than downloads_per_second calls of the download function are started
+        # per second, None meaning no limit. That is batches and their retries, not HTTP requests, of which yfinance
+        # makes one for every ticker of a batch.
+        self.batch_size = batch_size
+        self.threads = threads
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = RateLimiter(downloads_per_second)
+
+    def download(self, tickers, start_date, end_date):
+
+        def download_batch(batch_tickers):
+            # yfinance reports most failures by leaving the tickers out of its result rather than by raising, so those
+            # are retried as well, but only the tickers that failed. Raises only when every attempt raised.
+            batch_ticker_to_stock_data = {}
+            failed_tickers = batch_tickers
+            for attempt in range(self.max_retries + 1):
+                self.rate_limiter.wait()
+                try:
+                    downloaded_ticker_to_stock_data, failed_tickers = self.__download_batch(failed_tickers, start_date, end_date)
+                except OSError as error:
+                    download_error = error
+                else:
+                    batch_ticker_to_stock_data.update(downloaded_ticker_to_stock_data)
+                    download_error = None
+                    if not failed_tickers:
+                        break
+
+                if attempt < self.max_retries:
+                    backoff_seconds = self.backoff_seconds * 2 ** attempt
+                    self.logger.warning('download failed, retrying in %s seconds! tickers: %s error: %s', backoff_seconds, failed_tickers, download_error)
+                    time.sleep(backoff_seconds)
+                elif download_error is not None and not batch_ticker_to_stock_data:
+                    raise download_error
+                else:
+                    self.logger.warning('download failed after %s retries! tickers: %s error: %s', self.max_retries, failed_tickers, download_error)
+
+            return batch_ticker_to_stock_data, failed_tickers
+
+        batches = [tickers[start:start + self.batch_size] for start in range(0, len(tickers), self.batch_size)]
+        ticker_to_stock_data = {}
+        failed_tickers = []
+        download_errors = []
+        for batch in batches:
+            try:
+                batch_ticker_to_stock_data, batch_failed_tickers = download_batch(batch)
+            except OSError as error:
+                self.logger.warning('download failed after %s retries! tickers: %s error: %s', self.max_retries, batch, error)
+                download_errors.append(error)
+                failed_tickers.extend(batch)
+            else:
+                ticker_to_stock_data.update(batch_ticker_to_stock_data)
+                failed_tickers.extend(batch_failed_tickers)
+
+        # With only some of the tickers failed, they are simply left out, like the tickers yfinance does not know. With
+        # none of them downloaded, an offline run for example, the caller must not take the range for one without prices.
+        if failed_tickers and all(stock_data.empty for stock_data in ticker_to_stock_data.values()):
+            raise download_errors[0] if download_errors else OSError(f'no stock data downloaded for tickers: {failed_tickers}')
+
+        self.logger.debug('start_date: %s end_date: %s batches: %s -> downloaded tickers: %s failed tickers: %s', start_date, end_date, len(batches),
+                          len(ticker_to_stock_data), len(failed_tickers))
+        return ticker_to_stock_data
+
+    def __download_batch(self, tickers, start_date, end_date):
+        # returns the stock data of the tickers that could be downloaded, along with the tickers whose download failed
+        if self.download_function is None:
+            import yfinance
+            self.download_function = functools.partial(yfinance.download, threads=self.threads, progress=False)
+            if self.download_errors_function is None:
+                self.download_errors_function = get_yfinance_download_errors
+
+        adapted_end_date = end_date + pandas.Timedelta(days=1)  # yfinance API requires the end date to be "one after" the actual desired end date.
+        with yfinance_lock:
+            stock_data = self.download_function(tickers, group_by='Ticker', start=start_date, end=adapted_end_date)
+            ticker_to_error = dict(self.download_errors_function()) if self.download_errors_function is not None else {}
+
+        if stock_data.empty:
+            self.logger.warning('no stock data downloaded from date: %s to date: %s for tickers: %s errors: %s', start_date, end_date, tickers, ticker_to_error)
+
+            # a network failure looks the same as a range of dates without any trading, which is not retried
+            has_trading_dates = len(pandas.bdate_range(start_date, end_date)) > 0
+            if has_trading_dates or ticker_to_error:
+                return {}, list(tickers)
+            return {ticker: pandas.DataFrame() for ticker in tickers}, []
+
+        if not isinstance(stock_data.columns, pandas.MultiIndex):  # yfinance does not group by ticker when downloading a single symbol
+            stock_data = pandas.concat({tickers[0]: stock_data}, axis=1)
+
+        # the tickers left out of the result, or without any prices along with an error, failed to download
+        ticker_to_stock_data = {ticker: group.xs(ticker, level=0, axis=1).dropna(how='all') for ticker, group in stock_data.groupby(level=0, axis=1)}
+        failed_tickers = [ticker for ticker in tickers
+                          if ticker not in ticker_to_stock_data or (ticker_to_stock_data[ticker].empty and ticker.upper() in ticker_to_error)]
+        return {ticker: ticker_to_stock_data[ticker] for ticker in tickers if ticker not in failed_tickers}, failed_tickers
+
+
+def get_yfinance_download_errors():
+    # yfinance.download() records the errors of its last call by ticker in yfinance.shared, instead of raising them
+    import yfinance
+    return getattr(getattr(yfinance, 'shared', None), '_ERRORS', {})
+
+
+# yfinance.download() is not safe to call concurrently, not even from different price providers
+yfinance_lock = threading.Lock()
+
+
+class LocalPriceProvider(PriceProvider):
+    def __init__(self, ticker_to_stock_data):
+        # serves the prices from memory, for running offline. Every download is recorded, for the tests to check.
+        self.logger = logging.getLogger(__name__)
+        self.ticker_to_stock_data = ticker_to_stock_data
+        self.downloads = []
+
+    def download(self, tickers, start_date, end_date):
+        self.downloads.append((tuple(tickers), start_date, end_date))
+        return {ticker: self.ticker_to_stock_data[ticker].loc[start_date:end_date] if ticker in self.ticker_to_stock_data else pandas.DataFrame()
+                for ticker in tickers}
+
+
+class RateLimiter:
+    def __init__(self, calls_per_second):
+        # hands out start times at least 1 / calls_per_second apart
+        self.interval_seconds = 1 / calls_per_second if calls_per_second else 0
+        self.next_start_time = time.monotonic()
+
+    def wait(self):
+        if not self.interval_seconds:
+            return
+
+        start_time = max(self.next_start_time, time.monotonic())
+        self.next_start_time = start_time + self.interval_seconds
+        time.sleep(max(0, start_time - time.monotonic()))
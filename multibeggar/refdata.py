@@ -0,0 +1,168 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import numpy
+import pandas
+
+# The reference data is a handful of CSV files, which take a while to parse and to build the name matching indexes from,
+# on every construction of a Multibeggar. This compiles all of it once into a single binary snapshot, which is then only
+# memory mapped, for example:
+#   python -m multibeggar.refdata
+# The snapshot records the hash of the CSV files it was compiled from. A missing or stale snapshot is not an error,
+# the CSV files are then parsed as before.
+
+
+class ReferenceData:
+    def __init__(self, data_dir=None, snapshot_path=None):
+        self.logger = logging.getLogger(__name__)
+
+        self.data_dir = data_dir if data_dir is not None else os.path.join(os.path.dirname(__file__), 'data')
+        self.snapshot_path = snapshot_path if snapshot_path is not None else os.path.join(self.data_dir, 'reference_data.snapshot')
+
+        # the columns of every reference data file that are used, in the order they are used in
+        self.table_to_columns = {
+            'equity_nse': ['NAME OF COMPANY', 'SYMBOL'],
+            'equity_bse': ['Security Name', 'Security Id'],
+            'fixup_company_names': ['Actual Name', 'Fixed Name'],
+            'renamed_symbols': ['Present Symbol', 'Old Symbol'],
+            'price_adjustments': ['Symbol', 'Date', 'Numerator', 'Denominator'],
+        }
+        self.table_to_date_columns = {'price_adjustments': ['Date']}
+
+        # the snapshot is opened on the first lookup, so that a construction that needs no reference data costs nothing
+        self.snapshot_arrays = None
+
+    def get_table(self, table_name):
+        snapshot_arrays = self.__get_snapshot_arrays()
+        if snapshot_arrays is None:
+            return self.__read_table(table_name)
+
+        return pandas.DataFrame({column: snapshot_arrays[f'{table_name}/{column}'] for column in self.table_to_columns[table_name]})
+
+    def get_name_matching_index(self, table_name, column):
+        # the matching keys, alphabet and character counts of CompanyNameMatchingIndex, precompiled for the company names
+        snapshot_arrays = self.__get_snapshot_arrays()
+        if snapshot_arrays is None:
+            return None
+
+        return tuple(snapshot_arrays[f'{table_name}/{column}/{part}'] for part in ('matching_keys', 'alphabet', 'character_counts'))
+
+    def compute_source_hash(self):
+        source_hash = hashlib.sha256()
+        for table_name in self.table_to_columns:
+            with open(self.__get_table_path(table_name), 'rb') as table_file:
+                source_hash.update(table_file.read())
+        return source_hash.hexdigest()
+
+    def build_snapshot(self, name_matching_index_compiler):
+        arrays = {}
+        for table_name, columns in self.table_to_columns.items():
+            table = self.__read_table(table_name)
+            for column in columns:
+                arrays[f'{table_name}/{column}'] = self.__to_snapshot_array(table[column])
+
+        for table_name, column in [('equity_nse', 'NAME OF COMPANY'), ('equity_bse', 'Security Name')]:
+            matching_keys, alphabet, character_counts = name_matching_index_compiler(arrays[f'{table_name}/{column}'].tolist())
+            arrays[f'{table_name}/{column}/matching_keys'] = self.__to_snapshot_array(pandas.Series(matching_keys, dtype=object))
+            arrays[f'{table_name}/{column}/alphabet'] = self.__to_snapshot_array(pandas.Series(alphabet, dtype=object))
+            arrays[f'{table_name}/{column}/character_counts'] = character_counts
+
+        # The header describes every array by its dtype, shape and offset, and the arrays follow it, each aligned to 64
+        # bytes so that they can be used straight from the memory map.
+        array_offset = 0
+        array_headers = {}
+        for array_name, array in arrays.items():
+            array_headers[array_name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': array_offset}
+            array_offset += -(-array.nbytes // 64) * 64
+
+        header = json.dumps({'version': SNAPSHOT_VERSION, 'source_hash': self.compute_source_hash(), 'arrays': array_headers}).encode()
+        data_offset = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header)) // 64) * 64
+
+        # write to a temporary file and then replace, so that a process mapping the old snapshot is not disturbed
+        temporary_snapshot_path = self.snapshot_path + '.tmp'
+        with open(temporary_snapshot_path, 'wb') as snapshot_file:
+            snapshot_file.write(SNAPSHOT_MAGIC + len(header).to_bytes(8, 'little') + header)
+            for array_name, array in arrays.items():
+                snapshot_file.seek(data_offset + array_headers[array_name]['offset'])
+                snapshot_file.write(numpy.ascontiguousarray(array).tobytes())
+            snapshot_file.truncate(data_offset + array_offset)
+        os.replace(temporary_snapshot_path, self.snapshot_path)
+
+        self.logger.info('snapshot_path: %s -> arrays: %s bytes: %s', self.snapshot_path, len(arrays), data_offset + array_offset)
+        self.snapshot_arrays = None
+
+    def __get_snapshot_arrays(self):
+        if self.snapshot_arrays is None:
+            self.snapshot_arrays = self.__load_snapshot()
+
+        return self.snapshot_arrays or None
+
+    def __load_snapshot(self):
+        # an empty map stands for no usable snapshot, so that it is not looked for again
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot_file:
+                snapshot_buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            self.logger.info('no reference data snapshot: %s, reading the csv files', self.snapshot_path)
+            return {}
+
+        header_offset = len(SNAPSHOT_MAGIC) + 8
+        if snapshot_buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            self.logger.warning('not a reference data snapshot: %s, reading the csv files', self.snapshot_path)
+            return {}
+
+        header_length = int.from_bytes(snapshot_buffer[len(SNAPSHOT_MAGIC):header_offset], 'little')
+        header = json.loads(snapshot_buffer[header_offset:header_offset + header_length])
+        if header['version'] != SNAPSHOT_VERSION or header['source_hash'] != self.compute_source_hash():
+            self.logger.warning('stale reference data snapshot: %s, reading the csv files. Rebuild it with: python -m multibeggar.refdata',
+                                self.snapshot_path)
+            return {}
+
+        data_offset = -(-(header_offset + header_length) // 64) * 64
+        snapshot_arrays = {}
+        for array_name, array_header in header['arrays'].items():
+            dtype = numpy.dtype(array_header['dtype'])
+            count = int(numpy.prod(array_header['shape']))
+            snapshot_arrays[array_name] = numpy.frombuffer(snapshot_buffer, dtype=dtype, count=count,
+                                                           offset=data_offset + array_header['offset']).reshape(array_header['shape'])
+
+        self.logger.info('snapshot_path: %s -> arrays: %s', self.snapshot_path, len(snapshot_arrays))
+        return snapshot_arrays
+
+    def __read_table(self, table_name):
+        columns = self.table_to_columns[table_name]
+        return pandas.read_csv(self.__get_table_path(table_name), usecols=columns, parse_dates=self.table_to_date_columns.get(table_name, False))[columns]
+
+    def __get_table_path(self, table_name):
+        return os.path.join(self.data_dir, table_name + '.csv')
+
+    @staticmethod
+    def __to_snapshot_array(column):
+        # strings are stored as fixed width unicode, which numpy can use without decoding
+        if column.dtype == object:
+            return column.to_numpy(dtype=str)
+        return column.to_numpy()
+
+
+SNAPSHOT_MAGIC = b'MBREFDAT'
+SNAPSHOT_VERSION = 1
+
+
+def main():
+    from multibeggar.dalalstreet import CompanyNameMatchingIndex
+
+    argument_parser = argparse.ArgumentParser(description='Compile the reference data csv files into a binary snapshot.')
+    argument_parser.add_argument('--data-dir', help='directory of the csv files, defaults to the data directory of the package')
+    argument_parser.add_argument('--output', help='path of the snapshot, defaults to reference_data.snapshot in the data directory')
+    arguments = argument_parser.parse_args()
+
+    reference_data = ReferenceData(data_dir=arguments.data_dir, snapshot_path=arguments.output)
+    reference_data.build_snapshot(CompanyNameMatchingIndex.compile)
+    print('snapshot written to:', reference_data.snapshot_path)
+
+
+if __name__ == '__main__':
+    main()
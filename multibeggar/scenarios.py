@@ -0,0 +1,141 @@
+import logging
+import numpy
+import pandas
+
+
+class PortfolioScenarios:
+    def __init__(self, multibeggar, max_elements_per_batch=10000000):
+        # Answers what the complexity would have been with some hypothetical transactions on top of the ledger of
+        # multibeggar, whose plot_portfolio_complexity() must have run already. The symbols, the prices and the
+        # complexity of the ledger are reused from that run, only the names not in the ledger are resolved and fetched.
+        self.logger = logging.getLogger(__name__)
+
+        self.multibeggar = multibeggar
+
+        # the scenarios are evaluated together, as many at a time as keep the scenarios x dates x companies arrays
+        # within this many elements each
+        self.max_elements_per_batch = max_elements_per_batch
+
+    def compute_portfolio_complexity(self, transactions):
+        return self.compute_portfolio_complexities({'Scenario': transactions})['Scenario']
+
+    def compute_portfolio_complexities(self, scenario_to_transactions):
+        # Each scenario is a list of hypothetical transactions, anything pandas.DataFrame() takes with the Date, Name and
+        # Shares columns of the ledger. Returns the complexity data of every scenario, in the same form as the
+        # portfolio_complexity_data of the multibeggar, on the dates of the ledger and of the scenario.
+        #
+        # Only the dates on or after the earliest of all the hypothetical transactions are recomputed. On those dates,
+        # the holdings of all the scenarios are a single scenarios x dates x companies array, the running total of the
+        # transactions of the ledger and of each scenario added on top of the holdings just before that earliest date.
+        mb = self.multibeggar
+        scenario_names = list(scenario_to_transactions)
+        scenario_transactions_list = self.__get_scenario_transactions_list(scenario_to_transactions)
+        if scenario_transactions_list.empty:
+            return {scenario_name: mb.portfolio_complexity_data.copy() for scenario_name in scenario_names}
+
+        earliest_affected_date = scenario_transactions_list['Date'].min()
+        transactions_list = mb.transactions_list.assign(Name=mb.transactions_list['Name'].astype(object))
+        earlier_transactions_list = transactions_list[transactions_list['Date'] < earliest_affected_date]
+        later_transactions_list = transactions_list[transactions_list['Date'] >= earliest_affected_date]
+
+        # the companies held on the earliest affected date or transacted since, in the ledger or in any of the scenarios
+        initial_shares = earlier_transactions_list.groupby('Name')['Shares'].sum()
+        company_names = pandas.Index(pandas.unique(numpy.r_[initial_shares.index[initial_shares != 0], later_transactions_list['Name'].unique(),
+                                                            scenario_transactions_list['Name'].unique()]))
+        dates = pandas.DatetimeIndex(numpy.union1d(later_transactions_list['Date'].unique(), scenario_transactions_list['Date'].unique()))
+        instrument_list_ids = self.__get_instrument_list_ids(company_names, earliest_affected_date)
+
+        ledger_net_shares = later_transactions_list.groupby(['Date', 'Name'])['Shares'].sum().unstack('Name').reindex(index=dates, columns=company_names).fillna(0)
+        ledger_net_shares = ledger_net_shares.to_numpy()
+        initial_company_shares = initial_shares.reindex(company_names).fillna(0).to_numpy()
+        ledger_shares = numpy.cumsum(ledger_net_shares, axis=0) + initial_company_shares
+
+        # a scenario is on the dates of the ledger and on those of its own transactions
+        scenario_positions = scenario_transactions_list['Scenario'].to_numpy()
+        date_positions = dates.get_indexer(scenario_transactions_list['Date'])
+        company_positions = company_names.get_indexer(scenario_transactions_list['Name'])
+        is_scenario_date = numpy.zeros((len(scenario_names), len(dates)), dtype=bool)
+        is_scenario_date[:, dates.isin(later_transactions_list['Date'])] = True
+        is_scenario_date[scenario_positions, date_positions] = True
+
+        # The prices are looked up once for all the scenarios, wherever the ledger holds the company or any scenario
+        # may, which is from the first hypothetical transaction of the company onwards.
+        first_scenario_date_positions = pandas.Series(date_positions).groupby(company_positions).min().reindex(range(len(company_names)), fill_value=len(dates))
+        is_held = (ledger_shares != 0) | (numpy.arange(len(dates))[:, numpy.newaxis] >= first_scenario_date_positions.to_numpy())
+        closing_prices = self.__get_closing_prices(instrument_list_ids, dates, is_held)
+
+        scenario_complexities = numpy.zeros((len(scenario_names), len(dates)))
+        scenarios_per_batch = max(1, self.max_elements_per_batch // max(1, len(dates) * len(company_names)))
+        for batch_start in range(0, len(scenario_names), scenarios_per_batch):
+            batch_end = min(batch_start + scenarios_per_batch, len(scenario_names))
+            is_batch_transaction = (scenario_positions >= batch_start) & (scenario_positions < batch_end)
+
+            scenario_net_shares = numpy.zeros((batch_end - batch_start, len(dates), len(company_names)))
+            numpy.add.at(scenario_net_shares, (scenario_positions[is_batch_transaction] - batch_start, date_positions[is_batch_transaction],
+                                               company_positions[is_batch_transaction]), scenario_transactions_list['Shares'].to_numpy()[is_batch_transaction])
+            shares = numpy.cumsum(ledger_net_shares + scenario_net_shares, axis=1) + initial_company_shares
+            scenario_complexities[batch_start:batch_end] = self.__compute_complexities(shares, closing_prices)
+
+        self.logger.info('scenarios: %s earliest_affected_date: %s -> recomputed dates: %s companies: %s',
+                         len(scenario_names), earliest_affected_date, len(dates), len(company_names))
+
+        earlier_portfolio_complexity_data = mb.portfolio_complexity_data[mb.portfolio_complexity_data['Date'] < earliest_affected_date]
+        return {scenario_name: pandas.concat([earlier_portfolio_complexity_data,
+                                              pandas.DataFrame({'Date': dates[is_scenario_date[position]],
+                                                                'Complexity': scenario_complexities[position, is_scenario_date[position]]})],
+                                             ignore_index=True)
+                for position, scenario_name in enumerate(scenario_names)}
+
+    def __get_scenario_transactions_list(self, scenario_to_transactions):
+        scenario_transactions_lists = []
+        for position, transactions in enumerate(scenario_to_transactions.values()):
+            scenario_transactions_list = pandas.DataFrame(transactions, columns=['Date', 'Name', 'Shares'])
+            scenario_transactions_lists.append(scenario_transactions_list.astype({'Date': 'datetime64[ns]', 'Name': object, 'Shares': float})
+                                                                         .assign(Scenario=position))
+
+        if not scenario_transactions_lists:
+            return pandas.DataFrame({'Date': pandas.Series(dtype='datetime64[ns]'), 'Name': pandas.Series(dtype=object),
+                                     'Shares': pandas.Series(dtype=float), 'Scenario': pandas.Series(dtype=int)})
+
+        scenario_transactions_list = pandas.concat(scenario_transactions_lists, ignore_index=True)
+        scenario_transactions_list['Name'] = self.multibeggar.fixup_company_names(scenario_transactions_list['Name'])
+        return scenario_transactions_list
+
+    def __get_instrument_list_ids(self, company_names, earliest_affected_date):
+        # The companies of the ledger are already resolved, and their prices fetched, but maybe not from as early as the
+        # earliest affected date. The prices are fetched only for what is missing, see fetch_stock_prices().
+        mb = self.multibeggar
+        stock_prices_data_provider = mb.stock_prices_data_provider
+
+        new_company_names = [company_name for company_name in company_names if company_name not in mb.company_name_to_instrument_list_id]
+        company_name_to_instrument_list_id = dict(mb.company_name_to_instrument_list_id)
+        if new_company_names:
+            company_name_to_symbol_list = mb.companies_info.resolve_many(new_company_names)
+            company_name_to_instrument_list_id.update({company_name: stock_prices_data_provider.instrument_table.get_instrument_list_id(symbol_list)
+                                                       for company_name, symbol_list in company_name_to_symbol_list.items()})
+
+        instrument_list_ids = numpy.array([company_name_to_instrument_list_id[company_name] for company_name in company_names], dtype=int)
+        symbol_list = [symbol for instrument_list_id in numpy.unique(instrument_list_ids)
+                       for symbol in stock_prices_data_provider.instrument_table.get_symbol_list(instrument_list_id)]
+        stock_prices_data_provider.fetch_stock_prices(symbol_list, earliest_affected_date - pandas.Timedelta(days=7))
+        return instrument_list_ids
+
+    def __get_closing_prices(self, instrument_list_ids, dates, is_held):
+        # a dates x companies array of the closing prices, NaN where not held or where there is no price, the same as in
+        # the daywise portfolio of the multibeggar
+        closing_prices = numpy.full(is_held.shape, numpy.nan)
+        held_date_positions, held_company_positions = numpy.nonzero(is_held)
+        closing_prices[held_date_positions, held_company_positions] = self.multibeggar.stock_prices_data_provider.get_closing_prices_for_instrument_lists(
+            instrument_list_ids[held_company_positions], dates[held_date_positions])
+        return closing_prices
+
+    def __compute_complexities(self, shares, closing_prices):
+        # Same as compute_portfolio_complexities() of the multibeggar, for every scenario and date at once. The companies
+        # not held have no proportion, the same as those without a price. Sorted in ascending order, the proportions come
+        # first and the missing ones, NaN, last, so the rank of each proportion is its position along the companies.
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            values = numpy.where(shares != 0, shares * closing_prices, numpy.nan)
+            proportions = values / numpy.nansum(values, axis=2, keepdims=True)
+
+        weights = numpy.exp(self.multibeggar.exponent_tuning_factor * numpy.arange(proportions.shape[2]))
+        return numpy.nansum(numpy.sort(proportions, axis=2) * weights, axis=2)
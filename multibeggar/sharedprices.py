@@ -0,0 +1,134 @@
+import json
+import logging
+import mmap
+import os
+import numpy
+import pandas
+from multibeggar.dalalstreet import StockExchange, StockPricesDataProvider
+
+# The prices fetched by a StockPricesDataProvider, exported into a single memory mapped file, for the worker processes of
+# a batch run to read without each of them holding a copy. The file is laid out like the reference data snapshot, see
+# multibeggar.refdata: a header that indexes the instruments and the dates, followed by the date x instrument arrays,
+# each aligned to 64 bytes. The pages of the file are shared by all the processes that map it.
+
+
+class SharedPricePanel:
+    def __init__(self, file_path):
+        self.logger = logging.getLogger(__name__)
+
+        self.file_path = file_path
+
+    def export(self, stock_prices_data_provider):
+        # The adjusted closing prices of every instrument, and the de-adjusted price panel of the bulk lookups, all on the
+        # calendar days of the price panel. The instruments fetched without any prices are recorded as fetched as well.
+        panel_dates, exact_closing_prices, mean_closing_prices = stock_prices_data_provider.get_price_panel()
+        instrument_table = stock_prices_data_provider.instrument_table
+        closing_prices = pandas.DataFrame({instrument_id: stock_data['Close'] for instrument_id, stock_data in stock_prices_data_provider.instrument_to_stock_data.items()},
+                                          dtype=float).reindex(index=panel_dates, columns=range(exact_closing_prices.shape[1]))
+        arrays = {
+            'closing_prices': closing_prices.to_numpy(),
+            'exact_closing_prices': exact_closing_prices,
+            'mean_closing_prices': mean_closing_prices,
+        }
+
+        array_offset = 0
+        array_headers = {}
+        for array_name, array in arrays.items():
+            array_headers[array_name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': array_offset}
+            array_offset += -(-array.nbytes // 64) * 64
+
+        header = json.dumps({
+            'version': PRICE_PANEL_VERSION,
+            'today_date': str(stock_prices_data_provider.today_date),
+            'start_date': str(panel_dates[0]) if len(panel_dates) else None,
+            'dates': len(panel_dates),
+            'instruments': [[symbol, str(exchange)] for symbol, exchange in zip(instrument_table.symbols, instrument_table.exchanges)],
+            'instruments_with_data': sorted(int(instrument_id) for instrument_id in stock_prices_data_provider.instrument_to_stock_data),
+            'fetched_date_ranges': {str(instrument_id): [str(start_date), str(end_date)]
+                                    for instrument_id, (start_date, end_date) in stock_prices_data_provider.instrument_to_fetched_date_range.items()},
+            'arrays': array_headers,
+        }).encode()
+        data_offset = -(-(len(PRICE_PANEL_MAGIC) + 8 + len(header)) // 64) * 64
+
+        # write to a temporary file and then replace, so that a process mapping the old prices is not disturbed
+        temporary_file_path = self.file_path + '.tmp'
+        with open(temporary_file_path, 'wb') as price_panel_file:
+            price_panel_file.write(PRICE_PANEL_MAGIC + len(header).to_bytes(8, 'little') + header)
+            for array_name, array in arrays.items():
+                price_panel_file.seek(data_offset + array_headers[array_name]['offset'])
+                price_panel_file.write(numpy.ascontiguousarray(array).tobytes())
+            price_panel_file.truncate(data_offset + array_offset)
+        os.replace(temporary_file_path, self.file_path)
+
+        self.logger.info('file_path: %s -> dates: %s instruments: %s bytes: %s', self.file_path, len(panel_dates), len(instrument_table), data_offset + array_offset)
+
+    def load(self):
+        # the arrays are read-only views of the memory map, nothing is copied
+        with open(self.file_path, 'rb') as price_panel_file:
+            price_panel_buffer = mmap.mmap(price_panel_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header_offset = len(PRICE_PANEL_MAGIC) + 8
+        if price_panel_buffer[:len(PRICE_PANEL_MAGIC)] != PRICE_PANEL_MAGIC:
+            raise ValueError(f'not a price panel: {self.file_path}')
+
+        header_length = int.from_bytes(price_panel_buffer[len(PRICE_PANEL_MAGIC):header_offset], 'little')
+        header = json.loads(price_panel_buffer[header_offset:header_offset + header_length])
+        if header['version'] != PRICE_PANEL_VERSION:
+            raise ValueError(f'unsupported price panel version: {header["version"]} file_path: {self.file_path}')
+
+        data_offset = -(-(header_offset + header_length) // 64) * 64
+        arrays = {}
+        for array_name, array_header in header['arrays'].items():
+            dtype = numpy.dtype(array_header['dtype'])
+            count = int(numpy.prod(array_header['shape']))
+            arrays[array_name] = numpy.frombuffer(price_panel_buffer, dtype=dtype, count=count,
+                                                  offset=data_offset + array_header['offset']).reshape(array_header['shape'])
+
+        self.logger.info('file_path: %s -> dates: %s instruments: %s', self.file_path, header['dates'], len(header['instruments']))
+        return header, arrays
+
+
+PRICE_PANEL_MAGIC = b'MBPRICES'
+PRICE_PANEL_VERSION = 1
+
+
+class SharedStockPricesDataProvider(StockPricesDataProvider):
+    def __init__(self, price_panel_path, reference_data=None, instrumentation=None):
+        # Serves the prices exported by SharedPricePanel.export(), with the same get_closing_price() and
+        # get_closing_prices() as the provider they were exported from. It never downloads anything, the prices not in
+        # the file are missing, like those that failed to download. Pickling it only passes the path of the file along,
+        # so that every process maps the same file instead of receiving a copy of the prices.
+        super().__init__(reference_data=reference_data, instrumentation=instrumentation)
+        self.price_panel_path = price_panel_path
+        self.reference_data = reference_data
+
+        header, arrays = SharedPricePanel(price_panel_path).load()
+        for symbol, exchange in header['instruments']:
+            self.instrument_table.get_instrument_id(symbol, StockExchange(exchange))
+
+        # the prices are complete up to the day they were fetched on, however long the workers run
+        self.today_date = pandas.to_datetime(header['today_date'])
+        panel_dates = pandas.date_range(header['start_date'], periods=header['dates']) if header['dates'] else pandas.DatetimeIndex([])
+
+        closing_prices = arrays['closing_prices']
+        self.instrument_to_stock_data = {instrument_id: pandas.DataFrame(closing_prices[:, instrument_id:instrument_id + 1], index=panel_dates, columns=['Close'], copy=False)
+                                         for instrument_id in header['instruments_with_data']}
+        self.instrument_to_fetched_date_range = {int(instrument_id): (pandas.to_datetime(start_date), pandas.to_datetime(end_date))
+                                                 for instrument_id, (start_date, end_date) in header['fetched_date_ranges'].items()}
+        self.price_panel = (panel_dates, arrays['exact_closing_prices'], arrays['mean_closing_prices'])
+
+    def __reduce__(self):
+        return self.__class__, (self.price_panel_path, self.reference_data, self.instrumentation)
+
+    def fetch_stock_prices(self, symbol_list, start_date, end_date=None):
+        start_date = pandas.to_datetime(start_date)
+        end_date = self.today_date if end_date is None else pandas.to_datetime(end_date)
+
+        missing_symbol_list = []
+        for symbol, exchange in symbol_list:
+            fetched_start_date, fetched_end_date = self.instrument_to_fetched_date_range.get(self.instrument_table.get_instrument_id(symbol, exchange), (None, None))
+            if fetched_start_date is None or start_date < fetched_start_date or fetched_end_date < end_date:
+                missing_symbol_list.append((symbol, exchange))
+
+        if missing_symbol_list:
+            self.logger.warning('read-only prices, not fetching from date: %s to date: %s symbols: %s', start_date, end_date, missing_symbol_list)
@@ -0,0 +1,73 @@
+import pytest
+from multibeggar.analytics import PortfolioComplexityAnalytics
+from multibeggar.multibeggar import Multibeggar
+from multibeggar.tests.stubs import StubDownload
+
+import pandas
+import numpy
+import os
+
+
+@pytest.fixture(scope='module')
+def get_multibeggars(tmp_path_factory):
+    # the same ledger run once with each output format, shared by all the tests as the analytics only read the output
+    output_dir = tmp_path_factory.mktemp('analytics')
+    (output_dir / 'output').mkdir()
+    current_dir = os.getcwd()
+    os.chdir(output_dir)
+
+    multibeggars = {}
+    for output_format in ['excel', 'parquet', 'csv']:
+        mb = Multibeggar(download_function=StubDownload())
+        mb.load_transactions_from_excel_file(os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_medium.xlsx'))
+        mb.plot_portfolio_complexity(output_format=output_format)
+        multibeggars[output_format] = mb
+
+    yield multibeggars
+    os.chdir(current_dir)
+
+
+def test_compute_rolling_statistics_matches_brute_force(get_multibeggars):
+    rolling_statistics = PortfolioComplexityAnalytics(get_multibeggars['excel'], windows=(30, 365)).compute_rolling_statistics()
+    complexities = get_multibeggars['excel'].portfolio_complexity_data.set_index('Date')['Complexity']
+
+    for date in complexities.index[::25]:
+        row = rolling_statistics.set_index('Date').loc[date]
+        for window in (30, 365):
+            window_complexities = complexities[(complexities.index > date - pandas.Timedelta(days=window)) & (complexities.index <= date)]
+            assert row[f'Complexity {window}D Mean'] == pytest.approx(window_complexities.mean())
+            assert row[f'Complexity {window}D Max'] == window_complexities.max()
+            assert numpy.isnan(row[f'Complexity {window}D Std']) if len(window_complexities.index) == 1 else \
+                row[f'Complexity {window}D Std'] == pytest.approx(window_complexities.std())
+
+
+@pytest.mark.parametrize(
+'input_frequency', [
+'M',
+'Q',
+])
+def test_get_period_end_complexities(get_multibeggars, input_frequency):
+    period_end_complexities = PortfolioComplexityAnalytics(get_multibeggars['excel']).get_period_end_complexities(input_frequency)
+    complexities = get_multibeggars['excel'].portfolio_complexity_data.set_index('Date')['Complexity']
+
+    assert period_end_complexities['Period End'].is_monotonic_increasing
+    assert period_end_complexities['Complexity'].tolist() == [complexities.asof(period_end) for period_end in period_end_complexities['Period End']]
+
+
+@pytest.mark.parametrize(
+'input_output_format', [
+'excel',
+'parquet',
+'csv',
+])
+def test_get_top_contributors_add_up_to_complexity_change(get_multibeggars, input_output_format):
+    mb = get_multibeggars[input_output_format]
+    complexities = mb.portfolio_complexity_data.set_index('Date')['Complexity']
+    start_date, end_date = complexities.index[len(complexities.index) // 3], complexities.index[-1]
+
+    top_contributors = PortfolioComplexityAnalytics(mb).get_top_contributors(start_date, end_date + pandas.Timedelta(days=3), count=1000)
+    assert top_contributors['Contribution Change'].sum() == pytest.approx(complexities[end_date] - complexities[start_date])
+    assert top_contributors['End Contribution'].sum() == pytest.approx(complexities[end_date])
+    assert top_contributors['Contribution Change'].abs().is_monotonic_decreasing
+
+    assert PortfolioComplexityAnalytics(mb).get_top_contributors(start_date, end_date, count=3).equals(top_contributors.head(3))
@@ -0,0 +1,35 @@
+import pytest
+from multibeggar.batch import MultibeggarBatch
+from multibeggar.multibeggar import Multibeggar
+
+import pandas
+import os
+import shutil
+
+
+@pytest.mark.parametrize(
+'input_share_price_panel', [
+False,
+True,
+])
+def test_plot_portfolio_complexities(get_output_dir, input_share_price_panel, get_stub_download):
+    input_dir = os.path.join(os.path.dirname(__file__), 'input')
+    input_file_paths = [os.path.join(input_dir, 'test_transactions_list_small.xlsx'), os.path.join(input_dir, 'test_uppercase_mismatches.xlsx')]
+
+    # same file name in another directory, whose output must not overwrite the output of the first one
+    (get_output_dir / 'copy').mkdir()
+    input_file_paths.append(shutil.copy(input_file_paths[0], get_output_dir / 'copy'))
+
+    mb_batch = MultibeggarBatch(max_workers=2, download_function=get_stub_download, share_price_panel=input_share_price_panel)
+    portfolio_complexity_data_list = mb_batch.plot_portfolio_complexities(input_file_paths)
+
+    for input_file_path, portfolio_complexity_data in zip(input_file_paths, portfolio_complexity_data_list):
+        mb = Multibeggar(download_function=get_stub_download)
+        mb.load_transactions_from_excel_file(input_file_path)
+        mb.plot_portfolio_complexity()
+        pandas.testing.assert_frame_equal(portfolio_complexity_data, mb.portfolio_complexity_data)
+
+    for output_file_prefix in ['test_transactions_list_small', 'test_transactions_list_small_1', 'test_uppercase_mismatches']:
+        assert (get_output_dir / 'output' / (output_file_prefix + '_portfolio_complexity_data.xlsx')).exists()
+    assert list((get_output_dir / 'output').glob('multibeggar_worker_*.log'))
+    assert (get_output_dir / 'output' / 'all_portfolio_complexity_line_graph.svg').exists()
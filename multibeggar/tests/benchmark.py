@@ -0,0 +1,125 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import numpy
+import pandas
+from multibeggar.instrumentation import Instrumentation
+from multibeggar.multibeggar import Multibeggar
+from multibeggar.priceproviders import YFinancePriceProvider
+from multibeggar.tests.stubs import StubDownload
+
+# Benchmarks the full portfolio complexity pipeline on synthetic transaction ledgers, completely offline.
+# Run from this directory, like multibeggar_use.py, for example:
+#   python benchmark.py --rows 10 1000 100000 --symbols 10 100
+# The timings of every stage are written as JSON to the output directory, so that runs on different commits can be compared.
+
+
+def generate_transactions_list(row_count, symbol_count, seed=0, start_date='2012/01/01', end_date='2021/12/31'):
+    # A ledger of row_count transactions in symbol_count companies, with the company names as they appear in the NSE
+    # reference data. The transactions are mostly buys, and no sell of more shares than held.
+    random_generator = numpy.random.default_rng(seed)
+    nse_companies = pandas.read_csv(os.path.join(os.path.dirname(__file__), '..', 'data', 'equity_nse.csv'))
+    company_names = nse_companies['NAME OF COMPANY'].drop_duplicates().sample(n=symbol_count, random_state=seed).to_numpy()
+
+    business_dates = pandas.bdate_range(start_date, end_date)
+    transactions_list = pandas.DataFrame({
+        'Date': business_dates[numpy.sort(random_generator.integers(0, len(business_dates), row_count))],
+        'Name': company_names[random_generator.integers(0, symbol_count, row_count)],
+        'Shares': random_generator.integers(1, 100, row_count).astype(float),
+    })
+
+    # the sells that would take a holding below zero are trimmed, by lifting the running holdings above their lowest point
+    transactions_list.loc[random_generator.random(row_count) < 0.2, 'Shares'] *= -1
+    running_holdings = transactions_list.groupby('Name')['Shares'].cumsum()
+    running_holdings -= running_holdings.clip(upper=0).groupby(transactions_list['Name']).cummin()
+    transactions_list['Shares'] = running_holdings.groupby(transactions_list['Name']).diff().fillna(running_holdings)
+    transactions_list = transactions_list[transactions_list['Shares'] != 0]
+
+    # ledgers are not necessarily in date order
+    return transactions_list.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def run_benchmark_case(row_count, symbol_count, seed=0, output_format='excel', image_format='svg'):
+    transactions_list = generate_transactions_list(row_count, symbol_count, seed)
+    instrumentation = Instrumentation()
+
+    with instrumentation.time_stage('setup'):
+        # without the rate limit, which is only for the real yfinance
+        mb = Multibeggar(price_provider=YFinancePriceProvider(download_function=StubDownload(), downloads_per_second=None), logging_profile='production',
+                         instrumentation=instrumentation)
+
+    mb.input_file_path = None
+    mb.output_file_prefix = f'benchmark_{row_count}_rows_{symbol_count}_symbols'
+    mb.transactions_list = transactions_list
+
+    # the stages are timed by the pipeline itself, see Multibeggar
+    benchmark_case = {'rows': len(transactions_list.index), 'symbols': symbol_count, 'seed': seed, 'output_format': output_format, 'image_format': image_format}
+    try:
+        with instrumentation.time_stage('total'):
+            mb.plot_portfolio_complexity(output_format=output_format, image_format=image_format)
+    except ValueError as error:
+        # for example, the daywise portfolio of the largest ledgers does not fit in an Excel sheet
+        benchmark_case['error'] = str(error)
+
+    instrumentation_report = instrumentation.get_report()
+    stage_timings = {stage_name: stage_report['seconds'] for stage_name, stage_report in instrumentation_report['stages'].items()}
+    if 'error' not in benchmark_case:
+        if mb.daywise_full_portfolio is not None:
+            benchmark_case['daywise_rows'] = len(mb.daywise_full_portfolio.index)
+        benchmark_case['dates'] = len(mb.portfolio_complexity_data.index)
+        stage_timings['other'] = stage_timings['total'] - sum(seconds for stage_name, seconds in stage_timings.items()
+                                                              if stage_name not in ('setup', 'total'))
+
+    benchmark_case['stage_timings'] = stage_timings
+    benchmark_case['counters'] = instrumentation_report['counters']
+    return benchmark_case
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description='Benchmark the portfolio complexity pipeline on synthetic ledgers.')
+    argument_parser.add_argument('--rows', type=int, nargs='+', default=[10, 1000, 100000], help='transactions per ledger')
+    argument_parser.add_argument('--symbols', type=int, nargs='+', default=[10, 100], help='distinct companies per ledger')
+    argument_parser.add_argument('--seed', type=int, default=0)
+    argument_parser.add_argument('--output-format', choices=['excel', 'csv', 'parquet'], default='excel')
+    argument_parser.add_argument('--image-format', choices=['svg', 'png'], default='svg')
+    argument_parser.add_argument('--output', help='path of the JSON results, defaults to output/benchmark_<timestamp>.json')
+    arguments = argument_parser.parse_args()
+
+    os.makedirs(os.path.join(os.getcwd(), 'output'), exist_ok=True)
+    timestamp = datetime.datetime.now()
+    output_file_path = arguments.output or os.path.join(os.getcwd(), 'output', f'benchmark_{timestamp:%Y%m%d_%H%M%S}.json')
+
+    benchmark_results = {
+        'timestamp': timestamp.isoformat(timespec='seconds'),
+        'git_commit': get_git_commit(),
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'cases': [],
+    }
+
+    for row_count in arguments.rows:
+        for symbol_count in arguments.symbols:
+            benchmark_case = run_benchmark_case(row_count, symbol_count, arguments.seed, arguments.output_format, arguments.image_format)
+            benchmark_results['cases'].append(benchmark_case)
+            print(json.dumps(benchmark_case))
+
+    with open(output_file_path, 'w', encoding='utf-8') as output_file:
+        json.dump(benchmark_results, output_file, indent=4)
+    print('results written to:', output_file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+from multibeggar.tests.benchmark import generate_transactions_list, run_benchmark_case
+
+
+def test_generate_transactions_list_never_sells_more_than_held():
+    transactions_list = generate_transactions_list(1000, 20, seed=1)
+    assert transactions_list['Name'].nunique() <= 20
+
+    running_holdings = transactions_list.groupby(['Name', 'Date'])['Shares'].sum().groupby('Name').cumsum()
+    assert (running_holdings >= 0).all()
+
+
+def test_run_benchmark_case_times_every_stage(get_output_dir):
+    benchmark_case = run_benchmark_case(50, 5)
+
+    assert 'error' not in benchmark_case
+    assert set(benchmark_case['stage_timings']) == {'setup', 'name_fixup', 'symbol_resolution', 'price_fetch', 'daywise_holdings',
+                                                    'pricing', 'complexity', 'export', 'plot', 'total', 'other'}
+    assert benchmark_case['counters']['downloads'] >= 1
+    assert benchmark_case['counters']['price_lookup_hits'] > 0
+    assert (get_output_dir / 'output' / 'benchmark_50_rows_5_symbols_portfolio_complexity_data.xlsx').exists()
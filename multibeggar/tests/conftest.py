@@ -0,0 +1,48 @@
+import pytest
+from multibeggar.dalalstreet import StockPricesDataProvider, StockExchange
+from multibeggar.priceproviders import LocalPriceProvider
+from multibeggar.tests.stubs import StubDownload
+
+import pandas
+
+
+@pytest.fixture
+def get_stub_download():
+    yield StubDownload()
+
+
+@pytest.fixture
+def get_stock_prices_data_provider():
+    # A few days of prices of a few instruments, fetched from memory: a missing price, a company listed on both the
+    # exchanges, and a renamed company whose present symbol has prices only after the rename.
+    all_data = pandas.DataFrame([
+        ['TITAN.NS', '2020/03/12', 650.25],
+        ['TITAN.NS', '2020/03/13', 648.00],
+        ['TITAN.NS', '2020/03/16', 652.75],
+        ['TITAN.NS', '2020/03/17', 660.80],
+        ['RELAXO.NS', '2019/06/24', 1600.0],
+        ['RELAXO.NS', '2019/06/25', None],
+        ['RELAXO.BO', '2019/06/25', 1610.0],
+        ['RELAXO.NS', '2019/06/26', 810.0],
+        ['ASIANPAINT.BO', '2020/03/25', 2480],
+        ['ASIANPAINT.NS', '2020/03/25', 2480.5],
+        ['ASIANPAINT.BO', '2020/03/26', 2485],
+        ['N100.NS', '2021/06/10', 900.0],
+        ['N100.NS', '2021/06/11', 905.0],
+        ['MON100.NS', '2021/06/14', 100.0],
+        ['MON100.NS', '2021/06/15', 101.0],
+    ], columns=['Ticker', 'Date', 'Close']).astype({'Date': 'datetime64[ns]'})
+
+    price_provider = LocalPriceProvider({ticker: stock_data.set_index('Date')[['Close']] for ticker, stock_data in all_data.groupby('Ticker', sort=False)})
+    stock_prices_data_provider = StockPricesDataProvider(price_provider=price_provider)
+    stock_prices_data_provider.fetch_stock_prices([('TITAN', StockExchange.NSE), ('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE),
+                                                   ('ASIANPAINT', StockExchange.BSE), ('ASIANPAINT', StockExchange.NSE), ('MON100', StockExchange.NSE)],
+                                                  '2019/01/01', '2021/12/31')
+    yield stock_prices_data_provider
+
+
+@pytest.fixture
+def get_output_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'output').mkdir()
+    yield tmp_path
@@ -0,0 +1,299 @@
+import pytest
+from multibeggar.dalalstreet import ClosingPriceCache, CompaniesInfo, CorporateActionsTable, InstrumentTable, StockPricesDataProvider, StockExchange
+from multibeggar.instrumentation import Instrumentation
+from multibeggar.priceproviders import LocalPriceProvider, YFinancePriceProvider
+from fuzzywuzzy import fuzz
+
+import pandas
+import numpy
+import json
+
+
+@pytest.fixture(scope='module')
+def get_companies_info():
+    yield CompaniesInfo()
+
+
+@pytest.mark.parametrize(
+'input_company_name, input_exchange_name', [
+('Relaxo Footwear', StockExchange.NSE),
+('Relaxo Footwear', StockExchange.BSE),
+('Housing Development Finance Corp', StockExchange.NSE),
+('Larsen & Toubro Infotech Ltd', StockExchange.BSE),
+('Motilal Oswal NASDAQ 100 ETF', StockExchange.NSE),
+('JFrog', StockExchange.NSE),
+])
+def test_get_symbol_for_company_name_best_matching_with(get_companies_info, input_company_name, input_exchange_name):
+    companies_info = get_companies_info
+    name_to_symbol = companies_info.get_stocks_info_map()[input_exchange_name]
+
+    # brute force scoring of every company name, as the name matching index is expected to give the same result
+    match_ratios = name_to_symbol[companies_info.company_name_header].map(lambda company_name: fuzz.token_sort_ratio(company_name, input_company_name))
+    qualified_rows = match_ratios[match_ratios >= 75]
+    output_symbol = name_to_symbol.loc[qualified_rows.idxmax(), companies_info.stock_symbol_header] if not qualified_rows.empty else None
+
+    assert companies_info.get_symbol_for_company_name_best_matching_with(input_company_name, input_exchange_name) == output_symbol
+
+
+def test_resolve_many_uses_persistent_resolution_cache(tmp_path, mocker):
+    resolution_cache_path = str(tmp_path / 'resolutions.json')
+    company_names = ['Relaxo Footwears', 'Titan Company', 'Relaxo Footwears', 'JFrog', 'Titan Company']
+
+    companies_info = CompaniesInfo(resolution_cache_path=resolution_cache_path)
+    get_symbols_spy = mocker.spy(companies_info, 'get_symbols')
+    company_name_to_symbol_list_map = companies_info.resolve_many(company_names)
+    assert get_symbols_spy.call_count == 3
+    assert company_name_to_symbol_list_map['Relaxo Footwears'] == [('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)]
+    assert company_name_to_symbol_list_map['JFrog'] == []
+
+    companies_info = CompaniesInfo(resolution_cache_path=resolution_cache_path)
+    get_symbols_spy = mocker.spy(companies_info, 'get_symbols')
+    assert companies_info.resolve_many(company_names + ['Asian Paints']) == {**company_name_to_symbol_list_map,
+                                                                             'Asian Paints': companies_info.get_symbols('Asian Paints')}
+    assert get_symbols_spy.call_count == 2  # once by resolve_many() for the unseen name, once more by the assert above
+
+    with open(resolution_cache_path, encoding='utf-8') as resolution_cache_file:
+        resolution_cache = json.load(resolution_cache_file)
+    resolution_cache['reference_data_hash'] = 'stale'
+    with open(resolution_cache_path, 'w', encoding='utf-8') as resolution_cache_file:
+        json.dump(resolution_cache, resolution_cache_file)
+
+    companies_info = CompaniesInfo(resolution_cache_path=resolution_cache_path)
+    get_symbols_spy = mocker.spy(companies_info, 'get_symbols')
+    companies_info.resolve_many(company_names)
+    assert get_symbols_spy.call_count == 3
+
+    # without a resolution cache, the reference data is not even hashed
+    assert CompaniesInfo().reference_data_hash is None
+
+
+@pytest.mark.parametrize(
+'input_symbol_list, input_date, output_closing_price', [
+([('TITAN', StockExchange.NSE)], '2020/03/13', 648.00),
+([('TITAN', StockExchange.NSE)], '2020/03/14', 652.95),
+([('TITAN', StockExchange.NSE)], '2021/03/14', None),
+([('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)], '2020/03/25', 2480.5),
+([('ASIANPAINT', StockExchange.BSE), ('ASIANPAINT', StockExchange.NSE)], '2020/03/25', 2480),
+([('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)], '2020/03/26', 2485),
+([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)], '2019/06/24', 3200.0),
+([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)], '2019/06/25', 3220.0),
+([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)], '2019/06/26', 810.0),
+([], '2020/03/13', None),
+])
+def test_get_closing_prices_matches_get_closing_price(get_stock_prices_data_provider, input_symbol_list, input_date, output_closing_price):
+    provider = get_stock_prices_data_provider
+    closing_prices = provider.get_closing_prices([input_symbol_list], [input_date])
+
+    assert provider.get_closing_price(input_symbol_list, input_date) == pytest.approx(output_closing_price)
+    if output_closing_price is None:
+        assert numpy.isnan(closing_prices[0])
+    else:
+        assert closing_prices[0] == pytest.approx(output_closing_price)
+
+
+def test_get_price_panel_spans_a_week_around_the_prices(get_stock_prices_data_provider):
+    provider = get_stock_prices_data_provider
+    panel_dates, exact_closing_prices, mean_closing_prices = provider.get_price_panel()
+    assert (panel_dates[0], panel_dates[-1]) == (pandas.to_datetime('2019/06/17'), pandas.to_datetime('2021/06/22'))
+    assert exact_closing_prices.shape == mean_closing_prices.shape == (len(panel_dates), len(provider.instrument_table))
+
+    # the exact prices only on the dates with a price, the mean prices of the 15 days centered on every date
+    titan_id = provider.instrument_table.get_instrument_id('TITAN', StockExchange.NSE)
+    date_positions = panel_dates.get_indexer(pandas.to_datetime(['2020/03/13', '2020/03/14', '2020/03/24', '2020/03/25']))
+    assert exact_closing_prices[date_positions, titan_id].tolist() == pytest.approx([648.00, numpy.nan, numpy.nan, numpy.nan], nan_ok=True)
+    assert mean_closing_prices[date_positions, titan_id].tolist() == pytest.approx([652.95, 652.95, 660.80, numpy.nan], nan_ok=True)
+
+    # de-adjusted like get_closing_price() does
+    relaxo_id = provider.instrument_table.get_instrument_id('RELAXO', StockExchange.NSE)
+    assert exact_closing_prices[panel_dates.get_loc(pandas.to_datetime('2019/06/24')), relaxo_id] == 3200.0
+    assert provider.get_price_panel() is provider.get_price_panel()
+
+
+@pytest.mark.parametrize(
+'input_symbol_list, input_date, output_closing_price, output_counter_name', [
+([('TITAN', StockExchange.NSE)], '2020/03/13', 648.00, 'price_lookup_hits'),
+([('TITAN', StockExchange.NSE)], '2020/03/14', 652.95, 'price_lookup_mean_fallbacks'),
+([('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)], '2020/03/26', 2485, 'price_lookup_hits'),
+([('ASIANPAINT', StockExchange.BSE), ('ASIANPAINT', StockExchange.NSE)], '2020/03/25', 2480, 'price_lookup_hits'),
+([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)], '2019/06/25', 3220.0, 'price_lookup_hits'),
+([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)], '2019/06/17', 3200.0, 'price_lookup_mean_fallbacks'),
+([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)], '2019/06/16', None, 'price_lookup_slow_path_rows'),
+([('MON100', StockExchange.NSE)], '2021/06/22', 101.0, 'price_lookup_mean_fallbacks'),
+([('MON100', StockExchange.NSE)], '2021/06/23', None, 'price_lookup_slow_path_rows'),
+([('MON100', StockExchange.NSE)], '2021/06/04', 9025.0, 'price_lookup_slow_path_rows'),
+])
+def test_get_closing_prices_for_instrument_lists_looks_up_price_panel(get_stock_prices_data_provider, input_symbol_list, input_date, output_closing_price,
+                                                                      output_counter_name):
+    # exact prices first, in the order of the symbol list, then mean prices, and outside of the price panel or without
+    # any price in it, the slow path of get_closing_price(), which also prices the renamed symbols
+    provider = get_stock_prices_data_provider
+    provider.instrumentation = Instrumentation()
+    instrument_list_id = provider.instrument_table.get_instrument_list_id(input_symbol_list)
+    closing_prices = provider.get_closing_prices_for_instrument_lists([instrument_list_id], [input_date])
+
+    if output_closing_price is None:
+        assert numpy.isnan(closing_prices[0])
+    else:
+        assert closing_prices[0] == pytest.approx(output_closing_price)
+    assert provider.instrumentation.get_report()['counters'][output_counter_name] == 1
+    assert provider.get_closing_price(input_symbol_list, input_date) == pytest.approx(output_closing_price)
+
+
+def test_corporate_actions_table_compiles_multiple_actions_per_symbol():
+    corporate_actions = CorporateActionsTable(pandas.DataFrame([
+        ['TITAN.NS', '2020/03/16', 3, 2],
+        ['TITAN.NS', '2020/03/13', 2, 1],
+        ['RELAXO.NS', '2019/06/26', 2, 1],
+    ], columns=['Symbol', 'Date', 'Numerator', 'Denominator']).astype({'Date': 'datetime64[ns]'}))
+
+    dates = pandas.to_datetime(['2020/03/12', '2020/03/13', '2020/03/14', '2020/03/16', '2020/03/17'])
+    assert corporate_actions.get_de_adjustment_factors('TITAN.NS', dates).tolist() == [3.0, 1.5, 1.5, 1.0, 1.0]
+    assert corporate_actions.get_de_adjustment_factors('TITAN.BO', dates).tolist() == [1.0] * 5
+    assert corporate_actions.has_actions_after('TITAN.NS', '2020/03/13')
+    assert not corporate_actions.has_actions_after('TITAN.NS', '2020/03/16')
+
+
+def test_get_closing_prices_de_adjusts_for_multiple_actions(get_stock_prices_data_provider):
+    provider = get_stock_prices_data_provider
+    provider.corporate_actions = CorporateActionsTable(pandas.DataFrame([
+        ['TITAN.NS', '2020/03/16', 3, 2],
+        ['TITAN.NS', '2020/03/13', 2, 1],
+    ], columns=['Symbol', 'Date', 'Numerator', 'Denominator']).astype({'Date': 'datetime64[ns]'}))
+
+    symbol_list = [('TITAN', StockExchange.NSE)]
+    dates = ['2020/03/12', '2020/03/13', '2020/03/14', '2020/03/17']
+    closing_prices = provider.get_closing_prices([symbol_list] * len(dates), dates)
+    assert closing_prices.tolist() == pytest.approx([650.25 * 3, 648.00 * 1.5, 652.95 * 1.5, 660.80])
+    assert [provider.get_closing_price(symbol_list, date) for date in dates] == pytest.approx(closing_prices.tolist())
+
+
+@pytest.mark.parametrize(
+'input_corporate_actions, output_closing_price', [
+([['MON100.NS', '2021/06/17', 10, 1]], 9025.0),
+([['MON100.NS', '2021/06/17', 10, 1], ['N100.NS', '2021/06/08', 3, 1]], 9025.0),
+([['MON100.NS', '2021/06/02', 10, 1], ['N100.NS', '2021/06/08', 3, 1]], 2707.5),
+([], 902.5),
+])
+def test_get_closing_price_de_adjusts_renamed_symbol_once(get_stock_prices_data_provider, input_corporate_actions, output_closing_price):
+    # by the actions of the present symbol after the date if any, or else by those of the old symbol
+    provider = get_stock_prices_data_provider
+    provider.corporate_actions = CorporateActionsTable(pandas.DataFrame(input_corporate_actions, columns=['Symbol', 'Date', 'Numerator', 'Denominator']).astype({'Date': 'datetime64[ns]'}))
+
+    symbol_list = [('MON100', StockExchange.NSE)]
+    assert provider.get_closing_price(symbol_list, '2021/06/04') == pytest.approx(output_closing_price)
+    assert provider.get_closing_prices([symbol_list], ['2021/06/04']).tolist() == pytest.approx([output_closing_price])
+
+
+def test_get_closing_price_caches_misses_until_fetched(mocker):
+    titan_stock_data = pandas.DataFrame({'Close': [650.25, 648.00, 652.75, 660.80]}, index=pandas.to_datetime(['2020/03/12', '2020/03/13', '2020/03/16', '2020/03/17']).rename('Date'))
+    relaxo_stock_data = pandas.DataFrame({'Close': [810.0]}, index=pandas.to_datetime(['2021/03/15']).rename('Date'))
+    price_provider = LocalPriceProvider({'TITAN.NS': titan_stock_data, 'RELAXO.NS': relaxo_stock_data})
+
+    instrumentation = Instrumentation()
+    provider = StockPricesDataProvider(price_provider=price_provider, instrumentation=instrumentation)
+    symbol_list = [('TITAN', StockExchange.NSE)]
+    provider.fetch_stock_prices(symbol_list, '2020/03/01', '2021/03/31')
+    get_adjusted_closing_prices_spy = mocker.spy(provider, '_StockPricesDataProvider__get_adjusted_closing_prices_for_date_range')
+
+    assert provider.get_closing_price(symbol_list, '2020/03/14') == pytest.approx(652.95)
+    assert provider.get_closing_price(symbol_list, '2021/03/14') is None
+    call_count = get_adjusted_closing_prices_spy.call_count
+    assert provider.get_closing_price(list(symbol_list), pandas.to_datetime('2020/03/14')) == pytest.approx(652.95)
+    assert provider.get_closing_price(symbol_list, '2021-03-14') is None
+    assert get_adjusted_closing_prices_spy.call_count == call_count
+
+    # the cached lookups are counted the same as the ones they repeat
+    counters = instrumentation.get_report()['counters']
+    assert (counters['closing_price_cache_hits'], counters['closing_price_cache_misses']) == (2, 2)
+    assert (counters['price_lookup_mean_fallbacks'], counters['price_lookup_misses']) == (2, 2)
+
+    # new prices of any instrument of the symbol list drop its cached closing prices, the others are kept
+    price_provider.ticker_to_stock_data['TITAN.NS'] = pandas.concat([titan_stock_data, pandas.DataFrame({'Close': [700.0]}, index=relaxo_stock_data.index)])
+    provider.fetch_stock_prices([('RELAXO', StockExchange.NSE)], '2020/03/01', '2021/03/31')
+    assert provider.get_closing_price(symbol_list, '2021/03/14') is None
+    assert len(provider.closing_price_cache) == 2
+
+    provider.fetch_stock_prices(symbol_list, '2020/03/01', '2021/04/30')
+    assert len(provider.closing_price_cache) == 0
+    assert provider.get_closing_price(symbol_list, '2021/03/14') == 700.0
+
+
+def test_closing_price_cache_drops_least_recently_used():
+    closing_price_cache = ClosingPriceCache(max_entries=2)
+    closing_price_cache.put((0, 'a'), 1.0, [0])
+    closing_price_cache.put((0, 'b'), None, [0])
+    assert closing_price_cache.get((0, 'a')) == 1.0
+    closing_price_cache.put((1, 'c'), 3.0, [1, 2])
+
+    assert closing_price_cache.get((0, 'a')) == 1.0
+    assert closing_price_cache.get((1, 'c')) == 3.0
+    with pytest.raises(KeyError):
+        closing_price_cache.get((0, 'b'))
+
+    closing_price_cache.invalidate([2])
+    assert len(closing_price_cache) == 1
+    assert closing_price_cache.instrument_to_keys == {0: {(0, 'a')}}
+
+
+def test_fetch_stock_prices_downloads_only_missing_dates(tmp_path, get_stub_download):
+    symbol_list = [('TITAN', StockExchange.NSE), ('TITAN', StockExchange.BSE)]
+    get_stub_download.sequential_prices = True
+
+    provider = StockPricesDataProvider(download_function=get_stub_download, price_cache_dir=tmp_path)
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/13'))
+    assert get_stub_download.calls == [(('TITAN.NS', 'TITAN.BO'), pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/14'))]
+
+    provider = StockPricesDataProvider(download_function=get_stub_download, price_cache_dir=tmp_path)
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/02/24'), pandas.to_datetime('2020/03/20'))
+    assert get_stub_download.calls[1:] == [
+        (('TITAN.NS', 'TITAN.BO'), pandas.to_datetime('2020/02/24'), pandas.to_datetime('2020/03/02')),
+        (('TITAN.NS', 'TITAN.BO'), pandas.to_datetime('2020/03/14'), pandas.to_datetime('2020/03/21')),
+    ]
+    assert len(provider.instrument_to_stock_data[provider.instrument_table.ticker_to_id['TITAN.NS']].index) == 20
+
+
+def test_fetch_stock_prices_serves_from_cache_when_offline(tmp_path, get_stub_download):
+    symbol_list = [('TITAN', StockExchange.NSE)]
+    get_stub_download.sequential_prices = True
+
+    provider = StockPricesDataProvider(download_function=get_stub_download, price_cache_dir=tmp_path)
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/13'))
+
+    get_stub_download.offline = True
+    provider = StockPricesDataProvider(price_cache_dir=tmp_path, price_provider=YFinancePriceProvider(download_function=get_stub_download, backoff_seconds=0))
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/20'))
+    assert provider.get_closing_price(symbol_list, '2020/03/13') == 109.0
+
+
+def test_fetch_stock_prices_does_not_cover_empty_downloads_when_offline(tmp_path, get_stub_download):
+    symbol_list = [('TITAN', StockExchange.NSE)]
+    get_stub_download.sequential_prices = True
+
+    provider = StockPricesDataProvider(download_function=get_stub_download, price_cache_dir=tmp_path)
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/13'))
+
+    # offline, yfinance.download() returns empty results instead of raising
+    def download_offline(tickers, group_by, start, end):
+        return pandas.DataFrame()
+
+    provider = StockPricesDataProvider(price_cache_dir=tmp_path, price_provider=YFinancePriceProvider(download_function=download_offline, backoff_seconds=0))
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/20'))
+    assert provider.get_closing_price(symbol_list, '2020/03/13') == 109.0
+
+    provider = StockPricesDataProvider(download_function=get_stub_download, price_cache_dir=tmp_path)
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/20'))
+    assert get_stub_download.calls[1:] == [(('TITAN.NS',), pandas.to_datetime('2020/03/14'), pandas.to_datetime('2020/03/21'))]
+
+
+def test_instrument_table_interns_instruments_and_symbol_lists():
+    instrument_table = InstrumentTable({StockExchange.NSE: '.NS', StockExchange.BSE: '.BO'})
+
+    relaxo_list_id = instrument_table.get_instrument_list_id([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)])
+    titan_list_id = instrument_table.get_instrument_list_id([('TITAN', StockExchange.NSE)])
+    assert instrument_table.get_instrument_list_id([('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)]) == relaxo_list_id
+    assert instrument_table.get_instrument_list_id([]) == 2
+
+    assert instrument_table.tickers == ['RELAXO.NS', 'RELAXO.BO', 'TITAN.NS']
+    assert instrument_table.get_instrument_id('TITAN', StockExchange.NSE) == instrument_table.ticker_to_id['TITAN.NS'] == 2
+    assert instrument_table.get_symbol_list(titan_list_id) == [('TITAN', StockExchange.NSE)]
+    assert instrument_table.get_instrument_list_matrix().tolist() == [[0, 1], [2, -1], [-1, -1]]
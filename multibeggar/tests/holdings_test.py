@@ -0,0 +1,60 @@
+import pytest
+from multibeggar.holdings import HoldingsEngine
+from multibeggar.dalalstreet import StockExchange
+
+import pandas
+
+
+@pytest.fixture(scope='module')
+def get_holdings_engine():
+    yield HoldingsEngine()
+
+
+@pytest.fixture
+def get_transactions_list():
+    yield pandas.DataFrame([
+        ['2020/03/12', 'Titan Company', 10, [('TITAN', StockExchange.NSE)]],
+        ['2020/03/12', 'Asian Paints', 5, [('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)]],
+        ['2020/03/13', 'Titan Company', -4, [('TITAN', StockExchange.NSE)]],
+        ['2020/03/16', 'Asian Paints', -5, [('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)]],
+        ['2020/03/16', 'Titan Company', 2, [('TITAN', StockExchange.NSE)]],
+        ['2020/03/18', 'Asian Paints', 1, [('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)]],
+        ['2020/03/18', 'Asian Paints', -1, [('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)]],
+    ], columns=['Date', 'Name', 'Shares', 'Symbol']).astype({'Date': 'datetime64[ns]'})
+
+
+@pytest.mark.parametrize(
+'input_date, output_holdings', [
+('2020/03/12', {'Titan Company': 10, 'Asian Paints': 5}),
+('2020/03/13', {'Titan Company': 6, 'Asian Paints': 5}),
+('2020/03/16', {'Titan Company': 8}),
+('2020/03/18', {'Titan Company': 8}),
+])
+def test_compute_daywise_holdings(get_holdings_engine, get_transactions_list, input_date, output_holdings):
+    daywise_holdings = get_holdings_engine.compute_daywise_holdings(get_transactions_list)
+    daily_holdings = daywise_holdings[daywise_holdings['Date'] == pandas.to_datetime(input_date)]
+    assert daily_holdings.set_index('Name')['Shares'].to_dict() == output_holdings
+
+
+def test_compute_daywise_holdings_keeps_symbol_list(get_holdings_engine, get_transactions_list):
+    daywise_holdings = get_holdings_engine.compute_daywise_holdings(get_transactions_list)
+    assert list(daywise_holdings.columns) == ['Date', 'Name', 'Shares', 'Symbol']
+    assert (daywise_holdings['Symbol'] == daywise_holdings['Name'].map({
+        'Titan Company': [('TITAN', StockExchange.NSE)],
+        'Asian Paints': [('ASIANPAINT', StockExchange.NSE), ('ASIANPAINT', StockExchange.BSE)],
+    })).all()
+
+
+@pytest.mark.parametrize(
+'input_dates_per_chunk, output_chunk_dates', [
+(1, [['2020/03/12'], ['2020/03/13'], ['2020/03/16'], ['2020/03/18']]),
+(3, [['2020/03/12', '2020/03/13', '2020/03/16'], ['2020/03/18']]),
+(10, [['2020/03/12', '2020/03/13', '2020/03/16', '2020/03/18']]),
+])
+def test_iterate_daywise_holdings_matches_compute_daywise_holdings(get_holdings_engine, get_transactions_list, input_dates_per_chunk, output_chunk_dates):
+    chunks = list(get_holdings_engine.iterate_daywise_holdings(get_transactions_list.sample(frac=1, random_state=0), dates_per_chunk=input_dates_per_chunk))
+    assert [list(chunk['Date'].unique()) for chunk in chunks] == [list(pandas.to_datetime(chunk_dates)) for chunk_dates in output_chunk_dates]
+
+    daywise_holdings = get_holdings_engine.compute_daywise_holdings(get_transactions_list)
+    pandas.testing.assert_frame_equal(pandas.concat(chunks).sort_values(by=['Date', 'Name'], ignore_index=True),
+                                      daywise_holdings.sort_values(by=['Date', 'Name'], ignore_index=True))
@@ -0,0 +1,55 @@
+import pytest
+from multibeggar.instrumentation import Instrumentation, NullInstrumentation
+from multibeggar.multibeggar import Multibeggar
+
+import json
+import os
+import pickle
+
+
+@pytest.mark.parametrize(
+'input_output_format', [
+'excel',
+'parquet',
+])
+def test_plot_portfolio_complexity_records_stages_and_counters(get_output_dir, input_output_format, get_stub_download):
+    instrumentation = Instrumentation()
+    mb = Multibeggar(download_function=get_stub_download, instrumentation=instrumentation)
+    mb.load_transactions_from_excel_file(os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx'))
+    mb.plot_portfolio_complexity(output_format=input_output_format)
+
+    report = instrumentation.get_report()
+    assert set(report['stages']) == {'name_fixup', 'symbol_resolution', 'price_fetch', 'daywise_holdings', 'pricing', 'complexity', 'export', 'plot'}
+    assert all(stage_report['seconds'] >= 0 and stage_report['calls'] >= 1 for stage_report in report['stages'].values())
+
+    counters = report['counters']
+    assert counters['downloads'] >= 1
+    assert counters['price_lookup_hits'] + counters['price_lookup_mean_fallbacks'] > 0
+    assert counters['resolution_cache_hits'] + counters['resolution_cache_misses'] == mb.transactions_list['Name'].nunique()
+
+    report_file_path = str(get_output_dir / 'instrumentation.json')
+    instrumentation.dump_json(report_file_path)
+    with open(report_file_path, encoding='utf-8') as report_file:
+        assert json.load(report_file) == report
+
+
+def test_instrumentation_is_picklable_and_resettable():
+    instrumentation = Instrumentation()
+    with instrumentation.time_stage('pricing'):
+        instrumentation.increment('price_lookup_hits', 3)
+    assert list(instrumentation.time_iterations(range(3), 'daywise_holdings')) == [0, 1, 2]
+
+    unpickled_instrumentation = pickle.loads(pickle.dumps(instrumentation))
+    unpickled_instrumentation.increment('price_lookup_hits')
+    assert unpickled_instrumentation.get_report()['counters'] == {'price_lookup_hits': 4}
+    assert unpickled_instrumentation.get_report()['stages']['daywise_holdings']['calls'] == 4
+
+    instrumentation.reset()
+    assert instrumentation.get_report() == {'stages': {}, 'counters': {}}
+
+
+def test_multibeggar_records_nothing_by_default(get_stub_download):
+    mb = Multibeggar(download_function=get_stub_download)
+    assert isinstance(mb.instrumentation, NullInstrumentation)
+    assert isinstance(mb.companies_info.instrumentation, NullInstrumentation)
+    assert isinstance(mb.stock_prices_data_provider.instrumentation, NullInstrumentation)
@@ -0,0 +1,75 @@
+import pytest
+from multibeggar.ledger import TransactionsLoader, InvalidTransactionsListError
+
+import pandas
+import os
+
+
+@pytest.fixture
+def get_excel_file_path():
+    yield os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_medium.xlsx')
+
+
+@pytest.mark.parametrize(
+'input_file_extension', [
+'.csv',
+'.parquet',
+])
+def test_load_matches_read_excel(tmp_path, get_excel_file_path, input_file_extension):
+    expected_transactions_list = pandas.read_excel(get_excel_file_path, parse_dates=['Date'])
+    file_path = str(tmp_path / ('transactions' + input_file_extension))
+    if input_file_extension == '.csv':
+        expected_transactions_list.to_csv(file_path, index=False)
+    else:
+        expected_transactions_list.to_parquet(file_path, index=False)
+
+    transactions_loader = TransactionsLoader(chunk_size=100)
+    transactions_list = transactions_loader.load(file_path)
+    assert dict(transactions_list.dtypes.astype(str)) == {'Date': 'datetime64[ns]', 'Name': 'category', 'Shares': 'float64'}
+    pandas.testing.assert_frame_equal(transactions_list, expected_transactions_list, check_dtype=False, check_categorical=False)
+
+    chunks = list(transactions_loader.iterate_chunks(file_path))
+    assert [len(chunk.index) for chunk in chunks] == [100] * 5 + [9]
+    pandas.testing.assert_frame_equal(pandas.concat(chunks, ignore_index=True), expected_transactions_list, check_dtype=False, check_categorical=False)
+
+
+def test_load_excel_file_reads_sidecar_until_excel_file_changes(tmp_path, get_excel_file_path, mocker):
+    excel_file_path = str(tmp_path / 'transactions.xlsx')
+    pandas.read_excel(get_excel_file_path).iloc[:50].to_excel(excel_file_path, index=False)
+    sidecar_dir = str(tmp_path / 'sidecars')
+
+    read_excel_spy = mocker.spy(pandas, 'read_excel')
+    transactions_list = TransactionsLoader(sidecar_dir=sidecar_dir).load(excel_file_path)
+    assert read_excel_spy.call_count == 1
+    assert len(os.listdir(sidecar_dir)) == 1
+
+    pandas.testing.assert_frame_equal(TransactionsLoader(sidecar_dir=sidecar_dir).load(excel_file_path), transactions_list)
+    assert [len(chunk.index) for chunk in TransactionsLoader(chunk_size=20, sidecar_dir=sidecar_dir).iterate_chunks(excel_file_path)] == [20, 20, 10]
+    assert read_excel_spy.call_count == 1
+
+    pandas.read_excel(get_excel_file_path).iloc[:60].to_excel(excel_file_path, index=False)
+    read_excel_spy.reset_mock()
+    assert len(TransactionsLoader(sidecar_dir=sidecar_dir).load(excel_file_path).index) == 60
+    assert read_excel_spy.call_count == 1
+
+
+@pytest.mark.parametrize(
+'input_transactions_list, output_error_message', [
+(pandas.DataFrame({'Date': ['2020/03/12'], 'Name': ['Titan Company']}), 'has no column'),
+(pandas.DataFrame({'Name': ['Titan Company'], 'Shares': [10]}), 'has no column'),
+(pandas.DataFrame({'Date': ['2020/03/12'], 'Name': [None], 'Shares': [10]}), 'has empty values in column: Name'),
+(pandas.DataFrame({'Date': ['2020/03/12'], 'Name': ['Titan Company'], 'Shares': ['ten']}), 'does not match the schema'),
+])
+def test_load_rejects_invalid_transactions_list(tmp_path, input_transactions_list, output_error_message):
+    csv_file_path = str(tmp_path / 'transactions.csv')
+    input_transactions_list.to_csv(csv_file_path, index=False)
+    excel_file_path = str(tmp_path / 'transactions.xlsx')
+    input_transactions_list.to_excel(excel_file_path, index=False)
+    parquet_file_path = str(tmp_path / 'transactions.parquet')
+    input_transactions_list.to_parquet(parquet_file_path, index=False)
+
+    for file_path in [csv_file_path, excel_file_path, parquet_file_path]:
+        with pytest.raises(InvalidTransactionsListError, match=output_error_message):
+            TransactionsLoader().load(file_path)
+        with pytest.raises(InvalidTransactionsListError, match=output_error_message):
+            list(TransactionsLoader().iterate_chunks(file_path))
@@ -0,0 +1,48 @@
+import pytest
+from multibeggar.logconfig import configure_logging, LazyString
+
+import atexit
+import logging
+
+
+@pytest.fixture
+def get_log_file_path(tmp_path):
+    root_logger = logging.getLogger()
+    original_handlers = list(root_logger.handlers)
+    original_level = logging.getLogger('multibeggar').level
+
+    yield tmp_path / 'multibeggar.log'
+
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+    for handler in original_handlers:
+        root_logger.addHandler(handler)
+    logging.getLogger('multibeggar').setLevel(original_level)
+
+
+def test_production_profile_defers_debug_rendering(get_log_file_path):
+    def render():
+        rendered.append(True)
+        return 'rendered'
+
+    rendered = []
+    queue_listener = configure_logging('production', str(get_log_file_path), force=True)
+    logger = logging.getLogger('multibeggar.test')
+
+    logger.debug('frame...\n%s', LazyString(render))
+    logger.warning('warning: %s', LazyString(render))
+
+    queue_listener.stop()  # flushes the queued records to the file
+    atexit.unregister(queue_listener.stop)
+
+    assert rendered == [True]
+    assert get_log_file_path.read_text().startswith('WARNING: warning: rendered')
+
+
+def test_configure_logging_applies_profile_level_to_configured_logging(get_log_file_path):
+    logging.getLogger().addHandler(logging.NullHandler())
+
+    assert configure_logging('production', str(get_log_file_path)) is None
+    assert logging.getLogger('multibeggar').level == logging.WARNING
+    assert not get_log_file_path.exists()
@@ -4,6 +4,7 @@ from multibeggar.multibeggar import Multibeggar
 import pandas
 import math
 import os
+import shutil
 
 @pytest.fixture(scope='module')
 def get_multibeggar():
@@ -168,3 +169,126 @@ def test_get_closing_price_by_symbol_list(get_multibeggar, mocker, get_mock_tick
     mb = get_multibeggar
     assert mb.get_closing_price_by_symbol_list(input_symbol_list, input_date) == output_closing_price
 
+
+def test_plot_portfolio_complexity_incremental_matches_full_recompute(get_output_dir, get_stub_download):
+    input_file_path = os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx')
+    ledger_file_path = str(get_output_dir / 'ledger.xlsx')
+    checkpoint_path = str(get_output_dir / 'ledger.checkpoint')
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity()
+    full_portfolio_complexity_data = mb.portfolio_complexity_data
+
+    transactions_list = pandas.read_excel(input_file_path, parse_dates=['Date']).sort_values(by='Date', kind='stable')
+    appended_transactions_mask = transactions_list.index.isin(transactions_list.index[[5, -4, -3, -1]])
+
+    transactions_list[~appended_transactions_mask].to_excel(ledger_file_path, index=False)
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(ledger_file_path)
+    mb.plot_portfolio_complexity(checkpoint_path)
+
+    pandas.concat([transactions_list[~appended_transactions_mask], transactions_list[appended_transactions_mask]]).to_excel(ledger_file_path, index=False)
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(ledger_file_path)
+    mb.plot_portfolio_complexity(checkpoint_path)
+
+    assert mb.transactions_to_process['Date'].min() == transactions_list['Date'].iloc[5]
+    assert len(mb.transactions_to_process.index) < len(transactions_list.index)
+    pandas.testing.assert_frame_equal(mb.portfolio_complexity_data, full_portfolio_complexity_data)
+
+
+def test_plot_portfolio_complexity_incremental_matches_full_recompute_after_prices_extended(get_output_dir, get_stub_download):
+    input_file_path = os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx')
+    checkpoint_path = str(get_output_dir / 'ledger.checkpoint')
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity()
+    full_portfolio_complexity_data = mb.portfolio_complexity_data
+
+    # checkpointed before the prices of the last transaction date, and of the week after the one before it, were out
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.stock_prices_data_provider.today_date = pandas.to_datetime('2020/03/09')
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity(checkpoint_path)
+    assert not mb.portfolio_complexity_data['Complexity'].equals(full_portfolio_complexity_data['Complexity'])
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity(checkpoint_path)
+
+    assert mb.transactions_to_process['Date'].min() == pandas.to_datetime('2020/03/04')
+    pandas.testing.assert_frame_equal(mb.portfolio_complexity_data, full_portfolio_complexity_data)
+
+
+def test_compute_portfolio_complexities_matches_compute_portfolio_complexity(get_output_dir):
+    mb = Multibeggar()
+    daywise_portfolio = pandas.DataFrame([
+        ['2020/03/12', 0.25], ['2020/03/12', 0.5], ['2020/03/12', 0.25],
+        ['2020/03/13', None],
+        ['2020/03/16', 0.1], ['2020/03/16', None], ['2020/03/16', 0.9],
+        ['2020/03/17', 1.0],
+    ], columns=['Date', 'Proportion']).astype({'Date': 'datetime64[ns]'})
+
+    portfolio_complexity_data = mb.compute_portfolio_complexities(daywise_portfolio)
+    expected_portfolio_complexity_data = daywise_portfolio.groupby('Date').apply(lambda group: mb.compute_portfolio_complexity(group['Proportion'].dropna())).reset_index(name='Complexity')
+    pandas.testing.assert_frame_equal(portfolio_complexity_data, expected_portfolio_complexity_data)
+
+
+@pytest.mark.parametrize(
+'input_output_format, input_dates_per_chunk', [
+('csv', 1),
+('parquet', 1),
+('parquet', 4),
+])
+def test_plot_portfolio_complexity_streaming_matches_excel_output(get_output_dir, input_output_format, input_dates_per_chunk, get_stub_download):
+    input_file_path = os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx')
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity()
+    daywise_full_portfolio = mb.daywise_full_portfolio.astype({'Name': str, 'Symbol': str}).sort_values(by=['Date', 'Name'], ignore_index=True)
+    portfolio_complexity_data = mb.portfolio_complexity_data
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.dates_per_chunk = input_dates_per_chunk
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.output_file_prefix = 'streamed'
+    mb.plot_portfolio_complexity(output_format=input_output_format, export_excel=True)
+    pandas.testing.assert_frame_equal(mb.portfolio_complexity_data, portfolio_complexity_data)
+
+    if input_output_format == 'csv':
+        streamed_daywise_full_portfolio = pandas.read_csv(get_output_dir / 'output' / 'streamed_daywise_full_portfolio.csv', parse_dates=['Date'])
+    else:
+        streamed_daywise_full_portfolio = pandas.read_parquet(get_output_dir / 'output' / 'streamed_daywise_full_portfolio.parquet')
+    pandas.testing.assert_frame_equal(streamed_daywise_full_portfolio.sort_values(by=['Date', 'Name'], ignore_index=True), daywise_full_portfolio)
+    assert (get_output_dir / 'output' / 'streamed_daywise_full_portfolio.xlsx').exists()
+
+
+@pytest.mark.parametrize(
+'input_output_format', [
+'csv',
+'parquet',
+])
+def test_plot_portfolio_complexity_streaming_without_new_transactions(get_output_dir, input_output_format, get_stub_download):
+    input_file_path = os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx')
+    checkpoint_path = str(get_output_dir / 'ledger.checkpoint')
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity(checkpoint_path, output_format=input_output_format)
+    portfolio_complexity_data = mb.portfolio_complexity_data
+
+    # nothing left of the previous run to read back by mistake
+    shutil.rmtree(get_output_dir / 'output')
+    (get_output_dir / 'output').mkdir()
+
+    mb = Multibeggar(download_function=get_stub_download)
+    mb.load_transactions_from_excel_file(input_file_path)
+    mb.plot_portfolio_complexity(checkpoint_path, output_format=input_output_format, export_excel=True)
+
+    pandas.testing.assert_frame_equal(mb.portfolio_complexity_data, portfolio_complexity_data)
+    assert mb.get_daywise_portfolio_for_dates(portfolio_complexity_data['Date']).empty
+    assert list(pandas.read_excel(get_output_dir / 'output' / 'test_transactions_list_small_daywise_full_portfolio.xlsx', index_col=0).columns) == \
+        ['Date', 'Name', 'Shares', 'Symbol', 'Closing Price', 'Value', 'Proportion']
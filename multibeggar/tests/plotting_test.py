@@ -0,0 +1,43 @@
+import pytest
+from multibeggar.plotting import ComplexityPlotter, get_lttb_indices
+
+import pandas
+import numpy
+
+
+@pytest.mark.parametrize(
+'input_point_count, input_max_points', [
+(10, 2000),
+(10, 10),
+(10000, 500),
+(10001, 3),
+])
+def test_get_lttb_indices_keeps_end_points_and_extremes(input_point_count, input_max_points):
+    random_generator = numpy.random.default_rng(0)
+    x_values = numpy.arange(input_point_count, dtype=float)
+    y_values = numpy.cumsum(random_generator.normal(size=input_point_count))
+    y_values[input_point_count // 3] = y_values.max() + 10
+    y_values[2 * input_point_count // 3] = y_values.min() - 10
+
+    selected_points = get_lttb_indices(x_values, y_values, input_max_points)
+    assert len(selected_points) == min(input_point_count, input_max_points)
+    assert selected_points[0] == 0 and selected_points[-1] == input_point_count - 1
+    assert (numpy.diff(selected_points) > 0).all()
+    if input_max_points > 3:
+        assert {y_values.argmax(), y_values.argmin()} <= set(selected_points)
+
+
+@pytest.mark.parametrize(
+'input_image_format', [
+'svg',
+'png',
+])
+def test_plot_many_draws_every_portfolio_into_one_file(tmp_path, input_image_format):
+    dates = pandas.date_range('1990/01/01', '2021/12/31')
+    label_to_portfolio_complexity_data = {f'portfolio_{index}': pandas.DataFrame({'Date': dates, 'Complexity': numpy.sin(numpy.arange(len(dates)) / 100) + index})
+                                          for index in range(25)}
+    label_to_portfolio_complexity_data['empty'] = pandas.DataFrame({'Date': pandas.Series(dtype='datetime64[ns]'), 'Complexity': pandas.Series(dtype=float)})
+
+    output_file_path = tmp_path / ('all.' + input_image_format)
+    ComplexityPlotter(max_points=500).plot_many(label_to_portfolio_complexity_data, output_file_path)
+    assert output_file_path.stat().st_size > 0
@@ -0,0 +1,45 @@
+from multibeggar.pricecache import StockPricesCache
+
+import pandas
+
+
+def get_stock_data(start_date, end_date):
+    dates = pandas.bdate_range(start_date, end_date, name='Date')
+    return pandas.DataFrame({'Close': range(len(dates))}, index=dates, dtype=float)
+
+
+def test_store_never_covers_today(tmp_path):
+    today_date = pandas.to_datetime('2020/03/13')
+    stock_prices_cache = StockPricesCache(tmp_path, today_date=today_date)
+    stock_prices_cache.store({'TITAN.NS': get_stock_data('2020/03/02', today_date)}, pandas.to_datetime('2020/03/02'), today_date)
+
+    assert stock_prices_cache.get_missing_date_ranges('TITAN.NS', pandas.to_datetime('2020/03/02'), today_date) == [(today_date, today_date)]
+    assert len(stock_prices_cache.load('TITAN.NS', '2020/03/02', today_date).index) == 10
+
+
+def test_store_covers_empty_ranges_of_cached_symbols_only(tmp_path):
+    stock_prices_cache = StockPricesCache(tmp_path, today_date=pandas.to_datetime('2021/01/01'))
+    stock_prices_cache.store({'TITAN.NS': get_stock_data('2020/03/02', '2020/03/13')}, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/13'))
+
+    # a weekend without any prices, and a symbol that may have failed to download
+    stock_prices_cache.store({'TITAN.NS': pandas.DataFrame(), 'RELAXO.NS': pandas.DataFrame()}, pandas.to_datetime('2020/03/14'), pandas.to_datetime('2020/03/15'))
+    assert stock_prices_cache.get_missing_date_ranges('TITAN.NS', pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/15')) == []
+    assert stock_prices_cache.get_missing_date_ranges('RELAXO.NS', pandas.to_datetime('2020/03/14'), pandas.to_datetime('2020/03/15')) == \
+        [(pandas.to_datetime('2020/03/14'), pandas.to_datetime('2020/03/15'))]
+
+
+def test_changed_price_adjustments_drop_cached_prices(tmp_path):
+    start_date, end_date = pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/13')
+    price_adjustments = pandas.DataFrame([['TITAN.NS', '2019/06/01', 2, 1]], columns=['Symbol', 'Date', 'Numerator', 'Denominator'])
+
+    stock_prices_cache = StockPricesCache(tmp_path, price_adjustments=price_adjustments, today_date=pandas.to_datetime('2021/01/01'))
+    stock_prices_cache.store({'TITAN.NS': get_stock_data(start_date, end_date), 'RELAXO.NS': get_stock_data(start_date, end_date)}, start_date, end_date)
+
+    stock_prices_cache = StockPricesCache(tmp_path, price_adjustments=price_adjustments, today_date=pandas.to_datetime('2021/01/01'))
+    assert stock_prices_cache.get_missing_date_ranges('TITAN.NS', start_date, end_date) == []
+
+    price_adjustments.loc[1] = ['TITAN.NS', '2020/03/10', 5, 1]
+    stock_prices_cache = StockPricesCache(tmp_path, price_adjustments=price_adjustments, today_date=pandas.to_datetime('2021/01/01'))
+    assert stock_prices_cache.get_missing_date_ranges('TITAN.NS', start_date, end_date) == [(start_date, end_date)]
+    assert stock_prices_cache.load('TITAN.NS', start_date, end_date) is None
+    assert stock_prices_cache.get_missing_date_ranges('RELAXO.NS', start_date, end_date) == []
@@ -0,0 +1,129 @@
+import pytest
+from multibeggar.dalalstreet import StockPricesDataProvider, StockExchange
+from multibeggar.priceproviders import LocalPriceProvider, YFinancePriceProvider
+
+import pandas
+import pickle
+import types
+import yfinance
+
+
+def test_yfinance_price_provider_downloads_in_batches_and_retries(get_stub_download):
+    tickers = [f'SYMBOL{index}.NS' for index in range(7)]
+    get_stub_download.ticker_to_failures = {'SYMBOL3.NS': 2, 'SYMBOL6.NS': 10}
+    get_stub_download.sequential_prices = True
+
+    price_provider = YFinancePriceProvider(download_function=get_stub_download, batch_size=3, max_retries=2,
+                                           backoff_seconds=0, downloads_per_second=None)
+    ticker_to_stock_data = price_provider.download(tickers, pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+
+    # the batch of SYMBOL3 succeeds on its last retry, the batch of SYMBOL6 fails every time and is left out
+    assert sorted(ticker_to_stock_data) == tickers[:6]
+    assert ticker_to_stock_data['SYMBOL0.NS']['Close'].tolist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+    assert [call[0] for call in get_stub_download.calls] == [tuple(tickers[:3])] + [tuple(tickers[3:6])] * 3 + [tuple(tickers[6:])] * 3
+
+    with pytest.raises(ConnectionError):
+        price_provider.download(tickers[6:], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+
+
+def test_yfinance_price_provider_retries_empty_results(get_stub_download):
+    get_stub_download.ticker_to_missing_results = {'TITAN.NS': 1, 'TITAN.BO': 1, 'RELAXO.NS': 10, 'INFY.NS': 10}
+    price_provider = YFinancePriceProvider(download_function=get_stub_download, batch_size=2, max_retries=1, backoff_seconds=0, downloads_per_second=None)
+    ticker_to_stock_data = price_provider.download(['TITAN.NS', 'TITAN.BO', 'RELAXO.NS', 'INFY.NS'], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+
+    # an empty result is retried like an error, up to max_retries times
+    assert sorted(ticker_to_stock_data) == ['TITAN.BO', 'TITAN.NS']
+    assert [call[0] for call in get_stub_download.calls] == [('TITAN.NS', 'TITAN.BO'), ('TITAN.NS', 'TITAN.BO'), ('RELAXO.NS', 'INFY.NS'), ('RELAXO.NS', 'INFY.NS')]
+
+    # without any trading days, the empty result is not a failure, but a ticker without prices
+    get_stub_download.calls = []
+    ticker_to_stock_data = price_provider.download(['INFY.NS'], pandas.to_datetime('2020/03/07'), pandas.to_datetime('2020/03/08'))
+    assert list(ticker_to_stock_data) == ['INFY.NS'] and ticker_to_stock_data['INFY.NS'].empty
+    assert [call[0] for call in get_stub_download.calls] == [('INFY.NS',)]
+
+
+def test_yfinance_price_provider_raises_when_every_ticker_fails():
+    # offline, yfinance.download() returns empty results instead of raising
+    download_calls = []
+
+    def download(tickers, group_by, start, end):
+        download_calls.append(tuple(tickers))
+        return pandas.DataFrame()
+
+    price_provider = YFinancePriceProvider(download_function=download, batch_size=1, max_retries=1, backoff_seconds=0, downloads_per_second=None)
+    with pytest.raises(OSError):
+        price_provider.download(['TITAN.NS', 'RELAXO.NS'], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+    assert download_calls == [('TITAN.NS',)] * 2 + [('RELAXO.NS',)] * 2
+
+
+def test_yfinance_price_provider_retries_tickers_with_errors(get_stub_download, monkeypatch):
+    # yfinance.download() leaves the tickers it failed to download out of its result, with the errors in yfinance.shared
+    shared = types.SimpleNamespace(_ERRORS={})
+
+    def download(tickers, group_by, start, end, threads, progress):
+        shared._ERRORS = {ticker.upper(): 'JSONDecodeError' for ticker in tickers if get_stub_download.ticker_to_missing_results.get(ticker, 0) > 0}
+        return get_stub_download(tickers, group_by, start, end)
+
+    monkeypatch.setattr(yfinance, 'download', download)
+    monkeypatch.setattr(yfinance, 'shared', shared, raising=False)
+    get_stub_download.ticker_to_missing_results = {'RELAXO.NS': 1}
+
+    price_provider = YFinancePriceProvider(batch_size=3, backoff_seconds=0, downloads_per_second=None)
+    ticker_to_stock_data = price_provider.download(['TITAN.NS', 'RELAXO.NS', 'INFY.NS'], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+    assert sorted(ticker_to_stock_data) == ['INFY.NS', 'RELAXO.NS', 'TITAN.NS']
+    assert [call[0] for call in get_stub_download.calls] == [('TITAN.NS', 'RELAXO.NS', 'INFY.NS'), ('RELAXO.NS',)]
+
+
+def test_yfinance_price_provider_takes_download_errors_function(get_stub_download):
+    # INFY has no prices at all, like a symbol listed later, while RELAXO fails to download once
+    ticker_to_error = {}
+
+    def download(tickers, group_by, start, end):
+        ticker_to_error.clear()
+        ticker_to_error.update({ticker: 'JSONDecodeError' for ticker in tickers
+                                if ticker != 'INFY.NS' and get_stub_download.ticker_to_missing_results.get(ticker, 0) > 0})
+        stock_data = get_stub_download(tickers, group_by, start, end)
+        return stock_data.reindex(columns=pandas.MultiIndex.from_product([tickers, ['Close']]))
+
+    get_stub_download.ticker_to_missing_results = {'RELAXO.NS': 1, 'INFY.NS': 10}
+    price_provider = YFinancePriceProvider(download_function=download, download_errors_function=lambda: ticker_to_error, backoff_seconds=0,
+                                           downloads_per_second=None)
+    ticker_to_stock_data = price_provider.download(['TITAN.NS', 'RELAXO.NS', 'INFY.NS'], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+
+    assert sorted(ticker_to_stock_data) == ['INFY.NS', 'RELAXO.NS', 'TITAN.NS']
+    assert ticker_to_stock_data['INFY.NS'].empty and not ticker_to_stock_data['RELAXO.NS'].empty
+    assert [call[0] for call in get_stub_download.calls] == [('TITAN.NS', 'RELAXO.NS', 'INFY.NS'), ('RELAXO.NS',)]
+
+
+def test_yfinance_price_provider_respects_rate_limit(get_stub_download, mocker):
+    sleep_spy = mocker.patch('multibeggar.priceproviders.time.sleep')
+    price_provider = YFinancePriceProvider(download_function=get_stub_download, batch_size=1, downloads_per_second=4)
+    price_provider.download(['TITAN.NS', 'TITAN.BO', 'RELAXO.NS'], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))
+
+    # the sleep is mocked, so the second and third downloads have to wait about a quarter and a half of a second
+    assert [call.args[0] for call in sleep_spy.call_args_list][1:] == [pytest.approx(0.25, abs=0.05), pytest.approx(0.5, abs=0.05)]
+
+
+def test_fetch_stock_prices_prefetches_renamed_symbols():
+    dates = pandas.bdate_range('2021/06/01', '2021/06/30', name='Date')
+    price_provider = LocalPriceProvider({
+        'MON100.NS': pandas.DataFrame({'Close': 100.0}, index=dates[dates >= '2021/06/14']),
+        'N100.NS': pandas.DataFrame({'Close': 900.0}, index=dates[dates < '2021/06/14']),
+    })
+
+    provider = StockPricesDataProvider(price_provider=price_provider)
+    symbol_list = [('MON100', StockExchange.NSE)]
+    provider.fetch_stock_prices(symbol_list, pandas.to_datetime('2021/06/01'), pandas.to_datetime('2021/06/30'))
+    assert price_provider.downloads == [(('MON100.NS', 'N100.NS'), pandas.to_datetime('2021/06/01'), pandas.to_datetime('2021/06/30'))]
+
+    # the old symbol is priced without any further download, and de-adjusted by the split of the present symbol
+    assert provider.get_closing_price(symbol_list, '2021/06/02') == 9000.0
+    assert provider.get_closing_prices([symbol_list, symbol_list], ['2021/06/02', '2021/06/21']).tolist() == [9000.0, 100.0]
+    assert len(price_provider.downloads) == 1
+
+
+def test_yfinance_price_provider_can_be_pickled(get_stub_download):
+    # as the batch runner does on platforms that spawn its worker processes
+    price_provider = pickle.loads(pickle.dumps(YFinancePriceProvider(downloads_per_second=4)))
+    price_provider.download_function = get_stub_download
+    assert sorted(price_provider.download(['TITAN.NS'], pandas.to_datetime('2020/03/02'), pandas.to_datetime('2020/03/06'))) == ['TITAN.NS']
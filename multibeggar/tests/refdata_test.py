@@ -0,0 +1,62 @@
+import pytest
+from multibeggar.dalalstreet import CompaniesInfo, CompanyNameMatchingIndex, StockExchange
+from multibeggar.refdata import ReferenceData
+
+import pandas
+import numpy
+import os
+import shutil
+
+
+@pytest.fixture
+def get_data_dir(tmp_path):
+    # a copy of the reference data, so that the snapshot is built next to it and the files can be edited
+    data_dir = tmp_path / 'data'
+    shutil.copytree(os.path.join(os.path.dirname(__file__), '..', 'data'), data_dir, ignore=shutil.ignore_patterns('*.snapshot'))
+    yield str(data_dir)
+
+
+def test_snapshot_matches_csv_files(get_data_dir, mocker):
+    csv_reference_data = ReferenceData(data_dir=get_data_dir)
+    csv_tables = {table_name: csv_reference_data.get_table(table_name) for table_name in csv_reference_data.table_to_columns}
+    ReferenceData(data_dir=get_data_dir).build_snapshot(CompanyNameMatchingIndex.compile)
+
+    read_csv_spy = mocker.spy(pandas, 'read_csv')
+    reference_data = ReferenceData(data_dir=get_data_dir)
+    for table_name, csv_table in csv_tables.items():
+        pandas.testing.assert_frame_equal(reference_data.get_table(table_name), csv_table)
+    assert read_csv_spy.call_count == 0
+
+    matching_keys, alphabet, character_counts = reference_data.get_name_matching_index('equity_nse', 'NAME OF COMPANY')
+    compiled_matching_keys, compiled_alphabet, compiled_character_counts = CompanyNameMatchingIndex.compile(csv_tables['equity_nse']['NAME OF COMPANY'])
+    assert matching_keys.tolist() == compiled_matching_keys
+    assert alphabet.tolist() == compiled_alphabet
+    numpy.testing.assert_array_equal(character_counts, compiled_character_counts)
+
+
+def test_stale_snapshot_falls_back_to_csv_files(get_data_dir):
+    ReferenceData(data_dir=get_data_dir).build_snapshot(CompanyNameMatchingIndex.compile)
+    with open(os.path.join(get_data_dir, 'renamed_symbols.csv'), 'a', encoding='utf-8') as renamed_symbols_file:
+        renamed_symbols_file.write('LTI,LTINFOTECH\n')
+
+    reference_data = ReferenceData(data_dir=get_data_dir)
+    assert reference_data.get_table('renamed_symbols')['Present Symbol'].tolist() == ['MON100', 'LTI']
+    assert reference_data.get_name_matching_index('equity_nse', 'NAME OF COMPANY') is None
+
+
+@pytest.mark.parametrize(
+'input_company_name', [
+'Relaxo Footwear',
+'Housing Development Finance Corp',
+'Larsen & Toubro Infotech Ltd',
+'JFrog',
+])
+def test_companies_info_resolves_the_same_from_snapshot(get_data_dir, input_company_name):
+    csv_companies_info = CompaniesInfo(reference_data=ReferenceData(data_dir=get_data_dir))
+    csv_companies_info.get_stocks_info_map()
+    ReferenceData(data_dir=get_data_dir).build_snapshot(CompanyNameMatchingIndex.compile)
+    companies_info = CompaniesInfo(reference_data=ReferenceData(data_dir=get_data_dir))
+
+    assert companies_info.get_symbols(input_company_name) == csv_companies_info.get_symbols(input_company_name)
+    assert companies_info.get_symbol_for_company_name_best_matching_with(input_company_name, StockExchange.BSE) == \
+        csv_companies_info.get_symbol_for_company_name_best_matching_with(input_company_name, StockExchange.BSE)
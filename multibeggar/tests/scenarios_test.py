@@ -0,0 +1,46 @@
+import pytest
+from multibeggar.multibeggar import Multibeggar
+from multibeggar.scenarios import PortfolioScenarios
+
+import pandas
+import os
+
+
+def get_multibeggar(file_path, download_function):
+    mb = Multibeggar(download_function=download_function)
+    mb.load_transactions_from_file(file_path)
+    mb.plot_portfolio_complexity(output_format='parquet')
+    return mb
+
+
+def get_scenarios():
+    return {
+        'trim': [['2020/01/14', 'Aditya Birla Capital', -10], ['2020/02/08', 'Black Rose Industries', -5]],
+        'add': pandas.DataFrame({'Date': pandas.to_datetime(['2020/01/06', '2020/01/20']), 'Name': ['Titan Company', 'Titan Company'], 'Shares': [5, -2]}),
+        'empty': [],
+    }
+
+
+def test_compute_portfolio_complexities_matches_rerun_with_transactions(get_output_dir, get_stub_download):
+    input_file_path = os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx')
+    mb = get_multibeggar(input_file_path, get_stub_download)
+    scenario_to_portfolio_complexity_data = PortfolioScenarios(mb).compute_portfolio_complexities(get_scenarios())
+
+    for scenario_name, transactions in get_scenarios().items():
+        ledger_file_path = str(get_output_dir / f'{scenario_name}.csv')
+        pandas.concat([pandas.read_excel(input_file_path),
+                       pandas.DataFrame(transactions, columns=['Date', 'Name', 'Shares']).astype({'Date': 'datetime64[ns]'})]).to_csv(ledger_file_path, index=False)
+
+        expected_portfolio_complexity_data = get_multibeggar(ledger_file_path, get_stub_download).portfolio_complexity_data
+        portfolio_complexity_data = scenario_to_portfolio_complexity_data[scenario_name]
+        assert portfolio_complexity_data['Date'].tolist() == expected_portfolio_complexity_data['Date'].tolist()
+        assert portfolio_complexity_data['Complexity'].tolist() == pytest.approx(expected_portfolio_complexity_data['Complexity'].tolist())
+
+
+def test_compute_portfolio_complexities_in_batches_matches_one_by_one(get_output_dir, get_stub_download):
+    mb = get_multibeggar(os.path.join(os.path.dirname(__file__), 'input', 'test_transactions_list_small.xlsx'), get_stub_download)
+    scenario_to_portfolio_complexity_data = PortfolioScenarios(mb, max_elements_per_batch=1).compute_portfolio_complexities(get_scenarios())
+
+    for scenario_name, transactions in get_scenarios().items():
+        portfolio_complexity_data = PortfolioScenarios(mb).compute_portfolio_complexity(transactions)
+        pandas.testing.assert_frame_equal(scenario_to_portfolio_complexity_data[scenario_name], portfolio_complexity_data)
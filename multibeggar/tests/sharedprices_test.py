@@ -0,0 +1,49 @@
+import pytest
+from multibeggar.dalalstreet import StockExchange
+from multibeggar.sharedprices import SharedPricePanel, SharedStockPricesDataProvider
+
+import pandas
+import numpy
+import pickle
+
+
+def test_shared_provider_matches_exporting_provider(tmp_path, get_stock_prices_data_provider):
+    provider = get_stock_prices_data_provider
+    price_panel_path = str(tmp_path / 'prices.panel')
+    SharedPricePanel(price_panel_path).export(provider)
+    shared_provider = SharedStockPricesDataProvider(price_panel_path)
+
+    # the prices of the present symbol before the rename come from the old symbol
+    symbol_lists = [
+        [('MON100', StockExchange.NSE)],
+        [('RELAXO', StockExchange.NSE), ('RELAXO', StockExchange.BSE)],
+        [('ASIANPAINT', StockExchange.BSE), ('ASIANPAINT', StockExchange.NSE)],
+        [('TITAN', StockExchange.NSE)],
+        [('INFY', StockExchange.NSE)],
+    ]
+    dates = pandas.date_range('2019/06/15', '2019/07/05').append(pandas.date_range('2020/03/05', '2020/04/05')).append(pandas.date_range('2021/06/01', '2021/06/25'))
+    for symbol_list in symbol_lists:
+        closing_prices = [provider.get_closing_price(symbol_list, date) for date in dates]
+        assert [shared_provider.get_closing_price(symbol_list, date) for date in dates] == pytest.approx(closing_prices, nan_ok=True)
+
+        numpy.testing.assert_allclose(shared_provider.get_closing_prices([symbol_list] * len(dates), dates),
+                                      provider.get_closing_prices([symbol_list] * len(dates), dates))
+
+
+def test_shared_provider_maps_prices_without_copying(tmp_path, get_stock_prices_data_provider, mocker):
+    price_panel_path = str(tmp_path / 'prices.panel')
+    SharedPricePanel(price_panel_path).export(get_stock_prices_data_provider)
+
+    shared_provider = pickle.loads(pickle.dumps(SharedStockPricesDataProvider(price_panel_path)))
+    header, arrays = SharedPricePanel(price_panel_path).load()
+    assert len(header['instruments']) == len(shared_provider.instrument_table) == 7
+
+    titan_id = shared_provider.instrument_table.get_instrument_id('TITAN', StockExchange.NSE)
+    relaxo_id = shared_provider.instrument_table.get_instrument_id('RELAXO', StockExchange.NSE)
+    assert not shared_provider.price_panel[1].flags.writeable
+    assert not shared_provider.instrument_to_stock_data[titan_id]['Close'].to_numpy().flags.writeable
+    assert numpy.may_share_memory(shared_provider.instrument_to_stock_data[titan_id]['Close'].to_numpy(), shared_provider.instrument_to_stock_data[relaxo_id]['Close'].to_numpy())
+
+    download_spy = mocker.spy(shared_provider.price_provider, 'download')
+    shared_provider.fetch_stock_prices([('TITAN', StockExchange.NSE), ('INFY', StockExchange.NSE)], '2019/01/01', '2021/12/31')
+    assert download_spy.call_count == 0
@@ -0,0 +1,45 @@
+import pandas
+import numpy
+
+
+class StubDownload:
+    def __init__(self, sequential_prices=False):
+        # Stands in for yfinance.download(), completely offline. The closing prices depend only on the ticker and the
+        # date, with a few holes to exercise the fallbacks. With sequential_prices, they are 100, 101, ... over the
+        # business days of each download instead, without any holes.
+        # Every call is recorded. The tickers in ticker_to_failures make that many calls raise, and those in
+        # ticker_to_missing_results are left out of that many results, like yfinance does. Offline, every call raises.
+        self.sequential_prices = sequential_prices
+        self.calls = []
+        self.ticker_to_failures = {}
+        self.ticker_to_missing_results = {}
+        self.offline = False
+
+    def __call__(self, tickers, group_by, start, end):
+        if self.offline:
+            raise ConnectionError('no network')
+
+        self.calls.append((tuple(tickers), start, end))
+        if any(self.ticker_to_failures.get(ticker, 0) > 0 for ticker in tickers):
+            for ticker in tickers:
+                self.ticker_to_failures[ticker] = self.ticker_to_failures.get(ticker, 0) - 1
+            raise ConnectionError('connection reset')
+
+        returned_tickers = [ticker for ticker in tickers if self.ticker_to_missing_results.get(ticker, 0) <= 0]
+        for ticker in tickers:
+            self.ticker_to_missing_results[ticker] = self.ticker_to_missing_results.get(ticker, 0) - 1
+
+        if not returned_tickers:
+            return pandas.DataFrame()
+
+        dates = pandas.bdate_range(start, end - pandas.Timedelta(days=1), name='Date')
+        return pandas.concat({ticker: pandas.DataFrame({'Close': self.get_closing_prices(ticker, dates)}) for ticker in returned_tickers}, axis=1)
+
+    def get_closing_prices(self, ticker, dates):
+        if self.sequential_prices:
+            return pandas.Series(numpy.arange(len(dates), dtype=float) + 100, index=dates)
+
+        ticker_seed = sum(map(ord, ticker))
+        closing_prices = pandas.Series(100 + ticker_seed % 500 + (dates.dayofyear + ticker_seed) % 37, index=dates, dtype=float)
+        closing_prices[(dates.day + ticker_seed) % 11 == 0] = None
+        return closing_prices
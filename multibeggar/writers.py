@@ -0,0 +1,90 @@
+import logging
+import pandas
+import pyarrow
+import pyarrow.parquet
+
+
+class CsvDataFrameWriter:
+    def __init__(self, file_path, empty_data_frame=None):
+        self.logger = logging.getLogger(__name__)
+        self.file_path = file_path
+        self.file = open(file_path, 'w', encoding='utf-8', newline='')
+        self.written_rows = 0
+
+        # with the columns of empty_data_frame, the header is written up front, so that a file of no rows has it as well
+        if empty_data_frame is not None:
+            empty_data_frame.to_csv(self.file, index=False)
+
+    def write(self, data_frame):
+        # the header is written only with the first of the data frames, the rest are appended below it
+        data_frame.to_csv(self.file, header=self.file.tell() == 0, index=False)
+        self.written_rows += len(data_frame.index)
+
+    def close(self):
+        self.file.close()
+        self.logger.info('file_path: %s -> written rows: %s', self.file_path, self.written_rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ParquetDataFrameWriter:
+    def __init__(self, file_path, row_group_size=65536, empty_data_frame=None):
+        self.logger = logging.getLogger(__name__)
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+
+        # the schema of the file when not a single data frame is written, so that there is a file of no rows to read back
+        self.empty_data_frame = empty_data_frame
+
+        # The data frames are buffered until they fill a row group, as row groups of a single day would be too small to
+        # compress or read efficiently. The schema is taken from the first data frame and every later one must match it.
+        self.buffered_data_frames = []
+        self.buffered_rows = 0
+        self.parquet_writer = None
+        self.written_rows = 0
+
+    def write(self, data_frame):
+        self.buffered_data_frames.append(data_frame)
+        self.buffered_rows += len(data_frame.index)
+        if self.buffered_rows >= self.row_group_size:
+            self.__write_row_group()
+
+    def close(self):
+        self.__write_row_group()
+        if self.parquet_writer is None and self.empty_data_frame is not None:
+            # an empty column of text has no type of its own in pyarrow, so it is given the type of text
+            table = pyarrow.Table.from_pandas(self.empty_data_frame, preserve_index=False)
+            schema = pyarrow.schema([field.with_type(pyarrow.string()) if pyarrow.types.is_null(field.type) else field for field in table.schema],
+                                    metadata=table.schema.metadata)
+            self.parquet_writer = pyarrow.parquet.ParquetWriter(self.file_path, schema)
+            self.parquet_writer.write_table(table.cast(schema))
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        self.logger.info('file_path: %s -> written rows: %s', self.file_path, self.written_rows)
+
+    def __write_row_group(self):
+        if not self.buffered_data_frames:
+            return
+
+        data_frame = pandas.concat(self.buffered_data_frames, ignore_index=True)
+        if self.parquet_writer is None:
+            table = pyarrow.Table.from_pandas(data_frame, preserve_index=False)
+            self.parquet_writer = pyarrow.parquet.ParquetWriter(self.file_path, table.schema)
+        else:
+            table = pyarrow.Table.from_pandas(data_frame, schema=self.parquet_writer.schema, preserve_index=False)
+
+        self.parquet_writer.write_table(table, row_group_size=len(data_frame.index))
+        self.written_rows += len(data_frame.index)
+        self.buffered_data_frames = []
+        self.buffered_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+